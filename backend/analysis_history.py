@@ -0,0 +1,63 @@
+import os
+from cache import TTLCache
+from analysis_store import analysis_store
+
+# Camada em memória do histórico: as análises mais recentes, limitadas por quantidade e por bytes
+ANALYSIS_HISTORY_MAX_ENTRIES = int(os.getenv("ANALYSIS_HISTORY_MAX_ENTRIES", "1000"))
+ANALYSIS_HISTORY_MAX_BYTES = int(os.getenv("ANALYSIS_HISTORY_MAX_BYTES", str(32 * 1024 * 1024)))
+ANALYSIS_HISTORY_TTL = int(os.getenv("ANALYSIS_HISTORY_TTL", str(24 * 3600)))
+
+
+class AnalysisHistory:
+    """Histórico das análises (consulta, resultado e análises intermediárias).
+
+    As análises mais recentes ficam em memória, em um cache LRU limitado
+    por `max_entries` e `max_bytes`; as demais são lidas do banco de
+    análises, onde cada análise é gravada pelo `AnalysisWriter` junto com o
+    resultado. `get_async` consulta as duas camadas e devolve à memória as
+    análises lidas do disco.
+    """
+
+    def __init__(self, store=analysis_store, max_entries=ANALYSIS_HISTORY_MAX_ENTRIES,
+                 max_bytes=ANALYSIS_HISTORY_MAX_BYTES, ttl=ANALYSIS_HISTORY_TTL):
+        self.store = store
+        self.entries = TTLCache("analysis_history", ttl, max_entries=max_entries, max_bytes=max_bytes)
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+        }
+
+    def add(self, analysis_id, entry):
+        """Guarda `entry` ({query, result, message_analysis, link_analyses}) em memória."""
+        self.entries.set(analysis_id, entry)
+
+    async def get_async(self, analysis_id):
+        """Análise completa pelo id, da memória ou do disco; None se não existir."""
+        entry = self.entries.get(analysis_id)
+        if entry is not None:
+            self.stats["memory_hits"] += 1
+            return entry
+        entry = await self.store.get_details_async(analysis_id)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self.entries.set(analysis_id, entry)
+        return entry
+
+    def get_stats(self):
+        """Contadores por camada e ocupação da memória (entradas e bytes estimados)."""
+        memory = self.entries.get_stats()
+        return dict(
+            self.stats,
+            entries=memory["entries"],
+            memory_bytes=memory["bytes"],
+            max_entries=self.entries.max_entries,
+            max_bytes=self.entries.max_bytes,
+            evictions=memory["evictions"] + memory["expired"],
+        )
+
+
+# Instância única do processo
+analysis_history = AnalysisHistory()
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import asyncio
+import threading
+from utils import safe_print
+
+ANALYSIS_DB_PATH = os.getenv("ANALYSIS_DB_PATH", "data/analyses.db")
+ANALYSIS_LIST_MAX_LIMIT = int(os.getenv("ANALYSIS_LIST_MAX_LIMIT", "500"))
+
+
+def encode_cursor(record):
+    """Cursor opaco da posição de `record` na listagem: (created_at, analysis_id)."""
+    position = json.dumps([record["created_at"], record["analysis_id"]])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(created_at, analysis_id) de um cursor de `encode_cursor`; ValueError se inválido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, analysis_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+    if not isinstance(created_at, (int, float)) or not isinstance(analysis_id, str):
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return float(created_at), analysis_id
+
+
+class AnalysisStore:
+    """Resultados das análises em SQLite, indexados por id, usuário, data e veredito.
+
+    Substitui o arquivo JSON por análise: a busca por id usa a chave
+    primária e as listagens usam índices por (usuário, data), (veredito,
+    data) e data, todas em O(log n). Também serve de destino do
+    `AnalysisWriter`: cada lote é gravado em uma única transação.
+    """
+
+    def __init__(self, path=ANALYSIS_DB_PATH):
+        self.path = path
+        self.list_max_limit = ANALYSIS_LIST_MAX_LIMIT
+        self._local = threading.local()
+        self.stats = {
+            "written": 0,
+            "reads": 0,
+            "queries": 0,
+        }
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analyses (
+                    analysis_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    created_at REAL NOT NULL,
+                    is_fraud INTEGER NOT NULL,
+                    confidence REAL NOT NULL,
+                    result TEXT NOT NULL,
+                    details TEXT
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(analyses)")}
+            if "details" not in columns:
+                # Bancos criados antes do histórico completo das análises
+                conn.execute("ALTER TABLE analyses ADD COLUMN details TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_user ON analyses (user_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_fraud ON analyses (is_fraud, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def write_batch(self, records, replace=True):
+        """Grava os registros ({analysis_id, created_at, user_id, result, details}) em uma transação.
+
+        `details` é opcional e guarda o restante do histórico da análise
+        (consulta, análise da mensagem e dos links).
+
+        Com `replace=False`, registros já existentes são mantidos (usado na
+        migração, para que ela possa ser repetida). Retorna quantos foram gravados.
+        """
+        rows = [
+            (
+                record["analysis_id"],
+                record.get("user_id"),
+                record.get("created_at") or time.time(),
+                1 if record["result"].get("is_fraud") else 0,
+                float(record["result"].get("confidence", 0.0)),
+                json.dumps(record["result"], ensure_ascii=False),
+                json.dumps(record["details"], ensure_ascii=False, default=str)
+                if record.get("details") is not None else None,
+            )
+            for record in records
+        ]
+        conn = self._connect()
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with conn:
+            cursor = conn.executemany(
+                f"{verb} INTO analyses (analysis_id, user_id, created_at, is_fraud, confidence, result, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        self.stats["written"] += cursor.rowcount
+        return cursor.rowcount
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get(self, analysis_id):
+        """Registro da análise ou None."""
+        self.stats["reads"] += 1
+        row = self._connect().execute(
+            "SELECT analysis_id, user_id, created_at, result FROM analyses WHERE analysis_id = ?",
+            (analysis_id,),
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def get_details(self, analysis_id):
+        """Histórico completo da análise ({query, result, message_analysis, link_analyses}) ou None."""
+        self.stats["reads"] += 1
+        row = self._connect().execute(
+            "SELECT result, details FROM analyses WHERE analysis_id = ?",
+            (analysis_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        result, details = row
+        return dict(json.loads(details) if details else {}, result=json.loads(result))
+
+    def list(self, user_id=None, since=None, until=None, is_fraud=None, limit=50, cursor=None):
+        """Análises mais recentes primeiro, filtradas por usuário, período e veredito.
+
+        `since`/`until` são timestamps (segundos). Para paginar, passe em
+        `cursor` o `encode_cursor` do último item da página anterior: a
+        ordem é (created_at, analysis_id), então análises com o mesmo
+        `created_at` não são puladas nem repetidas entre páginas.
+        """
+        self.stats["queries"] += 1
+        conditions = []
+        params = []
+        if user_id is not None:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+        if is_fraud is not None:
+            conditions.append("is_fraud = ?")
+            params.append(1 if is_fraud else 0)
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("created_at < ?")
+            params.append(until)
+        if cursor is not None:
+            created_at, analysis_id = decode_cursor(cursor)
+            conditions.append("(created_at < ? OR (created_at = ? AND analysis_id < ?))")
+            params.extend((created_at, created_at, analysis_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(max(1, min(limit, self.list_max_limit)))
+        rows = self._connect().execute(
+            f"SELECT analysis_id, user_id, created_at, result FROM analyses {where} "
+            "ORDER BY created_at DESC, analysis_id DESC LIMIT ?",
+            params,
+        ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    async def get_async(self, analysis_id):
+        try:
+            return await asyncio.to_thread(self.get, analysis_id)
+        except sqlite3.Error as e:
+            safe_print(f"Erro ao ler análise do disco: {e}")
+            return None
+
+    async def get_details_async(self, analysis_id):
+        try:
+            return await asyncio.to_thread(self.get_details, analysis_id)
+        except sqlite3.Error as e:
+            safe_print(f"Erro ao ler histórico da análise do disco: {e}")
+            return None
+
+    async def list_async(self, **filters):
+        return await asyncio.to_thread(self.list, **filters)
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def get_status(self):
+        return {"type": "sqlite", "path": self.path}
+
+    def get_stats(self):
+        return dict(self.stats, path=self.path)
+
+    @staticmethod
+    def _row_to_record(row):
+        analysis_id, user_id, created_at, result = row
+        return {
+            "analysis_id": analysis_id,
+            "user_id": user_id,
+            "created_at": created_at,
+            "result": json.loads(result),
+        }
+
+
+# Instância única do processo
+analysis_store = AnalysisStore()
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from datetime import datetime
+from utils import safe_print
+from analysis_store import analysis_store
+
+# "sqlite" grava no banco indexado (data/analyses.db); "jsonl" também em segmentos só de acréscimo
+ANALYSIS_SINK = os.getenv("ANALYSIS_SINK", "sqlite")
+ANALYSIS_LOG_DIR = os.getenv("ANALYSIS_LOG_DIR", "analysis_results")
+ANALYSIS_SEGMENT_MAX_BYTES = int(os.getenv("ANALYSIS_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+ANALYSIS_WRITER_QUEUE_SIZE = int(os.getenv("ANALYSIS_WRITER_QUEUE_SIZE", "10000"))
+ANALYSIS_WRITER_BATCH_SIZE = int(os.getenv("ANALYSIS_WRITER_BATCH_SIZE", "500"))
+
+LATENCY_SAMPLES = 1000
+
+
+def _latency_summary(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {"samples": 0, "avg_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    return {
+        "samples": len(ordered),
+        "avg_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class JsonlSegmentSink:
+    """Grava os registros em segmentos JSONL (um objeto por linha) só de acréscimo.
+
+    Cada lote é escrito de uma vez e sincronizado com o disco (fsync) antes de
+    ser dado como gravado. O segmento é trocado ao passar de `max_bytes`; o
+    nome inclui o PID para que vários workers não escrevam no mesmo arquivo.
+
+    Com `index`, o lote é gravado também nele depois do fsync, para que o
+    histórico, o feedback e `GET /analyses` continuem encontrando as análises.
+    """
+
+    def __init__(self, directory=ANALYSIS_LOG_DIR, max_bytes=ANALYSIS_SEGMENT_MAX_BYTES, index=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index = index
+        self._file = None
+        self._segments = 0
+        self.path = None
+
+    def write_batch(self, records):
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self._rotate()
+        data = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records
+        )
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self.index is not None:
+            self.index.write_batch(records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.index is not None:
+            self.index.close()
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._segments += 1
+        self.path = os.path.join(
+            self.directory, f"analyses_{timestamp}_{os.getpid()}_{self._segments}.jsonl"
+        )
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def get_status(self):
+        return {
+            "type": "jsonl",
+            "segment": self.path,
+            "index": self.index.get_status() if self.index is not None else None,
+        }
+
+
+def create_sink(kind=ANALYSIS_SINK):
+    """Destino das análises gravadas, conforme `ANALYSIS_SINK`."""
+    if kind == "jsonl":
+        # O banco continua sendo gravado: as consultas por id e as listagens dependem dele
+        return JsonlSegmentSink(index=analysis_store)
+    return analysis_store
+
+
+class AnalysisWriter:
+    """Persiste os resultados das análises fora do event loop.
+
+    As requisições apenas enfileiram o registro (sem esperar pelo disco). Uma
+    tarefa em segundo plano junta tudo o que estiver na fila em um lote e o
+    grava em uma thread com uma única transação (SQLite) ou uma única escrita
+    e um único fsync (JSONL) — group commit. A fila é limitada: se o disco
+    não acompanhar, novos registros são descartados e contabilizados, em vez
+    de bloquear as requisições.
+    """
+
+    def __init__(self, sink=None, queue_size=ANALYSIS_WRITER_QUEUE_SIZE, batch_size=ANALYSIS_WRITER_BATCH_SIZE):
+        self.sink = sink or create_sink()
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._queue = None
+        self._task = None
+        self._write_times = deque(maxlen=LATENCY_SAMPLES)  # duração de cada gravação de lote
+        self._flush_delays = deque(maxlen=LATENCY_SAMPLES)  # do enfileiramento do registro mais antigo até o fsync
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "write_errors": 0,
+            "lost": 0,
+            "max_batch": 0,
+        }
+
+    def start(self):
+        """Inicia a tarefa de gravação em segundo plano."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Grava tudo o que ainda está na fila e encerra a tarefa."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        await asyncio.to_thread(self.sink.close)
+        safe_print("Gravação de análises encerrada (%s registros gravados)", self.stats["written"])
+
+    def submit(self, record):
+        """Enfileira o registro sem bloquear; retorna False se foi descartado."""
+        if self._task is None or self._task.done():
+            self.start()
+        try:
+            self._queue.put_nowait((time.monotonic(), record))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            safe_print("Fila de gravação cheia; análise %s não será persistida", record.get("analysis_id"))
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch):
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self.sink.write_batch, [record for _, record in batch])
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            self.stats["lost"] += len(batch)
+            safe_print(f"Erro ao gravar {len(batch)} análises: {e}")
+            return
+        finished = time.monotonic()
+        self._write_times.append(finished - started)
+        self._flush_delays.append(finished - batch[0][0])
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+    def get_stats(self):
+        """Contadores, ocupação da fila e latência dos lotes gravados."""
+        return dict(
+            self.stats,
+            queued=self._queue.qsize() if self._queue is not None else 0,
+            queue_size=self.queue_size,
+            avg_batch=round(self.stats["written"] / self.stats["batches"], 2) if self.stats["batches"] else 0.0,
+            write_latency=_latency_summary(self._write_times),
+            flush_latency=_latency_summary(self._flush_delays),
+            sink=self.sink.get_status(),
+        )
+
+
+# Gravador compartilhado por todo o processo
+analysis_writer = AnalysisWriter()
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import hashlib
+from utils import safe_print
+from config import BLACKLISTS_PATH, get_blacklists, parse_blacklists
+from domain_index import DomainIndex
+from reputation_db import REPUTATION_DB_PATH, ReputationDB
+
+BLACKLIST_RELOAD_INTERVAL = float(os.getenv("BLACKLIST_RELOAD_INTERVAL", "30"))
+
+
+class BlacklistRegistry:
+    """Mantém o índice de blacklists atual e o recarrega quando o arquivo muda.
+
+    O arquivo é verificado periodicamente (mtime e tamanho). Quando muda, um
+    novo índice é construído em uma thread, fora do event loop, e só então
+    substitui o anterior com uma única atribuição: quem já leu `index` continua
+    usando o índice antigo, completo, até o fim da requisição.
+
+    O artefato binário gerado por `ingest_feeds.py`, quando existe, é
+    acompanhado da mesma forma e exposto em `reputation`.
+    """
+
+    def __init__(self, path=BLACKLISTS_PATH, interval=BLACKLIST_RELOAD_INTERVAL,
+                 reputation_path=REPUTATION_DB_PATH):
+        self.path = path
+        self.interval = interval
+        self.reputation_path = reputation_path
+        self.index = None
+        self.reputation = None
+        self._reputation_signature = None
+        self.version = 0
+        self.checksum = None
+        self.loaded_at = None
+        self.last_reload_seconds = None
+        self.last_error = None
+        self._signature = None
+        self._task = None
+        self.stats = {
+            "reloads": 0,
+            "reload_errors": 0,
+        }
+
+    def ensure_loaded(self):
+        """Carga inicial síncrona (cria o arquivo de exemplo se não existir).
+
+        Um arquivo mal formatado interrompe a inicialização em vez de ser
+        substituído pelas listas de exemplo.
+        """
+        if self.index is None:
+            blacklists = get_blacklists(self.path)
+            started = time.perf_counter()
+            index = DomainIndex.from_blacklists(blacklists)
+            self._swap(index, self._file_signature(), self._file_checksum(), started)
+            self._open_reputation(self._file_signature(self.reputation_path))
+        return self.index
+
+    def match(self, domain, url=None):
+        """Consulta as blacklists e, em seguida, o artefato de reputação (domínio e URL)."""
+        index, reputation = self.index, self.reputation
+        match = index.match(domain) if index is not None else None
+        if match is None and reputation is not None:
+            match = reputation.match(domain)
+            if match is None and url:
+                match = reputation.match_url(url)
+        return match
+
+    def start(self):
+        """Inicia a verificação periódica do arquivo."""
+        self.ensure_loaded()
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def reload_if_changed(self):
+        """Reconstrói o índice se o arquivo mudou desde a última carga."""
+        reputation_signature = self._file_signature(self.reputation_path)
+        if reputation_signature != self._reputation_signature:
+            await asyncio.to_thread(self._open_reputation, reputation_signature)
+
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        return await self.reload()
+
+    async def reload(self):
+        """Reconstrói o índice a partir do arquivo e o troca atomicamente."""
+        signature = self._file_signature()
+        started = time.perf_counter()
+        try:
+            index, checksum = await asyncio.to_thread(self._build)
+        except Exception as e:
+            # Mantém o índice atual; um arquivo em edição pode estar incompleto
+            self.stats["reload_errors"] += 1
+            self.last_error = str(e)
+            self._signature = signature
+            safe_print(f"Erro ao recarregar blacklists, mantendo versão {self.version}: {e}")
+            return False
+
+        if checksum == self.checksum:
+            self._signature = signature
+            return False
+
+        self._swap(index, signature, checksum, started)
+        self.stats["reloads"] += 1
+        safe_print(
+            "Blacklists recarregadas: versão %s, %s entradas em %.3fs",
+            self.version, len(index), self.last_reload_seconds,
+        )
+        return True
+
+    def _build(self):
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        blacklists = parse_blacklists(raw)
+        return DomainIndex.from_blacklists(blacklists), self._checksum(raw)
+
+    def _swap(self, index, signature, checksum, started):
+        self.index = index
+        self.version += 1
+        self.checksum = checksum
+        self._signature = signature
+        self.loaded_at = time.time()
+        self.last_reload_seconds = time.perf_counter() - started
+        self.last_error = None
+
+    def _open_reputation(self, signature):
+        # O artefato antigo não é fechado explicitamente: requisições em
+        # andamento podem ainda usá-lo, e o mmap é liberado pelo coletor.
+        self._reputation_signature = signature
+        if signature is None:
+            self.reputation = None
+            return
+        try:
+            self.reputation = ReputationDB(self.reputation_path)
+            safe_print(
+                "Artefato de reputação carregado: %s entradas", len(self.reputation)
+            )
+        except (OSError, ValueError) as e:
+            safe_print(f"Erro ao abrir artefato de reputação: {e}")
+
+    def _file_signature(self, path=None):
+        try:
+            stat = os.stat(path or self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _file_checksum(self):
+        try:
+            with open(self.path, "rb") as f:
+                return self._checksum(f.read())
+        except OSError:
+            return None
+
+    @staticmethod
+    def _checksum(raw):
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                safe_print(f"Erro na verificação de blacklists: {e}")
+
+    def get_status(self):
+        return dict(
+            self.stats,
+            version=self.version,
+            checksum=self.checksum,
+            entries=len(self.index) if self.index is not None else 0,
+            categories=dict(self.index.categories) if self.index is not None else {},
+            loaded_at=self.loaded_at,
+            last_reload_seconds=round(self.last_reload_seconds, 4) if self.last_reload_seconds is not None else None,
+            last_error=self.last_error,
+            reputation=self.reputation.get_status() if self.reputation is not None else None,
+        )
+
+
+# Instância única do processo
+blacklist_registry = BlacklistRegistry()
@@ -0,0 +1,120 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def estimate_size(value):
+    """Estimativa do tamanho em bytes de um valor serializável em JSON."""
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class TTLCache:
+    """Cache LRU com expiração por tempo e limites de entradas e de bytes.
+
+    Pensado para ser compartilhado por todo o processo: as operações são
+    protegidas por um lock para permitir o uso também a partir de threads.
+    `on_evict(chave, valor)`, se informado, é chamado quando uma entrada sai
+    do cache por expiração ou por falta de espaço, para que índices
+    auxiliares possam ser atualizados.
+    """
+
+    def __init__(self, name, ttl, max_entries=None, max_bytes=None, on_evict=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._data = OrderedDict()  # chave -> (expira_em, tamanho, valor)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    def get(self, key, default=None):
+        """Retorna o valor em cache ou `default` se ausente ou expirado."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.stats["misses"] += 1
+                return default
+
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats["expired"] += 1
+                if self.on_evict:
+                    self.on_evict(key, value)
+                self.stats["misses"] += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Armazena o valor, removendo as entradas menos usadas se necessário."""
+        size = estimate_size(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # Valor maior que o próprio limite: não vale a pena armazenar
+            return
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, size, value)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self._remove(key)
+            return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        """Retorna contadores de uso e a ocupação atual do cache."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                entries=len(self._data),
+                bytes=self._bytes,
+                hit_ratio=round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            )
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            value = self._data[key][2]
+            self._remove(key)
+            self.stats["evictions"] += 1
+            if self.on_evict:
+                self.on_evict(key, value)
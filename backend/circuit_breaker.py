@@ -0,0 +1,114 @@
+import os
+import time
+from utils import safe_print
+
+# Falhas consecutivas que abrem o circuito e tempo até a próxima tentativa, em segundos
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RECOVERY_TIMEOUT = float(os.getenv("BREAKER_RECOVERY_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """A dependência está com o circuito aberto; use o fallback local."""
+
+    def __init__(self, name):
+        super().__init__(f"Circuito aberto para {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Disjuntor de uma dependência externa (Gemini, SerpAPI, VirusTotal).
+
+    Após `failure_threshold` falhas consecutivas o circuito abre e as
+    chamadas falham imediatamente, sem esperar pela dependência. Passado
+    `recovery_timeout`, uma única chamada de teste é liberada (meio aberto):
+    se tiver sucesso o circuito fecha; se falhar, volta a abrir. Se a
+    chamada de teste não terminar (cancelada pelo prazo da requisição), outra
+    é liberada após mais um `recovery_timeout`.
+    """
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None):
+        prefix = f"BREAKER_{name.upper()}_"
+        self.name = name
+        self.failure_threshold = failure_threshold or int(
+            os.getenv(prefix + "FAILURE_THRESHOLD", str(BREAKER_FAILURE_THRESHOLD))
+        )
+        self.recovery_timeout = recovery_timeout or float(
+            os.getenv(prefix + "RECOVERY_TIMEOUT", str(BREAKER_RECOVERY_TIMEOUT))
+        )
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._last_failure = None
+        self.stats = {
+            "successes": 0,
+            "failures": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+
+    def allow(self):
+        """Verdadeiro se a chamada pode ser feita agora."""
+        if self.state == CLOSED:
+            return True
+        if time.monotonic() - self._opened_at >= self.recovery_timeout:
+            # Liberar uma chamada de teste e aguardar mais um intervalo pela próxima
+            self.state = HALF_OPEN
+            self._opened_at = time.monotonic()
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            safe_print(f"Circuito de {self.name} fechado")
+            self.state = CLOSED
+
+    def record_failure(self, error=None):
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        if error is not None:
+            self._last_failure = str(error) or error.__class__.__name__
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            safe_print(
+                f"Circuito de {self.name} aberto após {self.consecutive_failures} falhas "
+                f"(nova tentativa em {self.recovery_timeout}s)"
+            )
+
+    def get_status(self):
+        retry_in = None
+        if self.state != CLOSED:
+            retry_in = round(max(0.0, self._opened_at + self.recovery_timeout - time.monotonic()), 2)
+        return dict(
+            self.stats,
+            state=self.state,
+            consecutive_failures=self.consecutive_failures,
+            failure_threshold=self.failure_threshold,
+            recovery_timeout=self.recovery_timeout,
+            retry_in_seconds=retry_in,
+            last_failure=self._last_failure,
+        )
+
+
+_breakers = {}
+
+def get_breaker(name):
+    """Disjuntor compartilhado da dependência `name`, criado sob demanda."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def get_breakers_status():
+    return {name: breaker.get_status() for name, breaker in _breakers.items()}
@@ -2,6 +2,7 @@ import os
 import json
 from google.generativeai import configure
 from dotenv import load_dotenv
+from utils import logger
 
 def setup_api():
     """Configura as credenciais de API necessárias."""
@@ -12,18 +13,18 @@ def setup_api():
     if gemini_api_key:
         configure(api_key=gemini_api_key)
     else:
-        print("Aviso: API key do Google Gemini não encontrada. Algumas funcionalidades podem não funcionar corretamente.")
+        logger.warning("API key do Google Gemini não encontrada. Algumas funcionalidades podem não funcionar corretamente.")
         # Não levanta exceção para permitir inicialização mesmo sem API key
     
     # Configuração da API de segurança (VirusTotal)
     vt_api_key = os.getenv("VIRUSTOTAL_API_KEY", "")
     if not vt_api_key:
-        print("Aviso: API key do VirusTotal não encontrada. A validação de links será limitada.")
+        logger.warning("API key do VirusTotal não encontrada. A validação de links será limitada.")
     
     # Configuração da API de busca (SerpAPI)
     serpapi_api_key = os.getenv("SERPAPI_API_KEY", "")
     if not serpapi_api_key:
-        print("Aviso: API key da SerpAPI não encontrada. A pesquisa na web será limitada.")
+        logger.warning("API key da SerpAPI não encontrada. A pesquisa na web será limitada.")
 
 def get_api_key(service):
     """Retorna a chave de API para o serviço especificado."""
@@ -34,19 +35,42 @@ def get_api_key(service):
     }
     return keys.get(service, "")
 
-def get_blacklists():
-    """Carrega listas de sites maliciosos conhecidos."""
+# Número máximo de mensagens aceitas em POST /analyze/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+BLACKLISTS_PATH = os.getenv("BLACKLISTS_PATH", "data/blacklists.json")
+
+def parse_blacklists(raw):
+    """Interpreta o conteúdo do arquivo de blacklists, validando o formato."""
+    blacklists = json.loads(raw)
+    if not isinstance(blacklists, dict):
+        raise ValueError("O arquivo de blacklists deve conter um objeto {categoria: [domínios]}")
+    for category, domains in blacklists.items():
+        if not isinstance(domains, list) or not all(isinstance(domain, str) for domain in domains):
+            raise ValueError(f"A categoria '{category}' das blacklists deve ser uma lista de domínios (strings)")
+    return blacklists
+
+def load_blacklists(path=BLACKLISTS_PATH):
+    """Lê as listas de sites maliciosos, propagando erros de leitura ou formato."""
+    with open(path, "rb") as f:
+        return parse_blacklists(f.read())
+
+def get_blacklists(path=BLACKLISTS_PATH):
+    """Carrega listas de sites maliciosos conhecidos.
+
+    Cria o arquivo de exemplo apenas se ele não existir; um arquivo
+    ilegível ou mal formatado levanta o erro em vez de ser sobrescrito.
+    """
     try:
-        with open("data/blacklists.json", "r") as f:
-            return json.load(f)
-    except:
+        return load_blacklists(path)
+    except FileNotFoundError:
         # Criar arquivo de exemplo se não existir
-        os.makedirs("data", exist_ok=True)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
         example_blacklists = {
             "phishing": ["phishing-example.com"],
             "malware": ["malware-example.com"],
             "scam": ["scam-example.com"]
         }
-        with open("data/blacklists.json", "w") as f:
+        with open(path, "w") as f:
             json.dump(example_blacklists, f, indent=2)
         return example_blacklists
\ No newline at end of file
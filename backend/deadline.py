@@ -0,0 +1,71 @@
+import os
+import time
+import asyncio
+import contextvars
+from contextlib import contextmanager
+
+# Prazo total de uma análise, em segundos, compartilhado por todas as etapas
+ANALYSIS_DEADLINE = float(os.getenv("ANALYSIS_DEADLINE", "20"))
+
+# Instante (time.monotonic) em que a requisição atual expira; None = sem prazo.
+# Tarefas criadas durante a requisição herdam o valor (contextvars).
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """O prazo da requisição se esgotou antes de a etapa começar ou terminar."""
+
+
+@contextmanager
+def deadline_scope(seconds):
+    """Define o prazo da requisição para o bloco.
+
+    Um prazo já definido por quem chamou nunca é estendido. Com `seconds=None`
+    o bloco roda sem prazo, o que é usado por tarefas de segundo plano
+    disparadas durante uma requisição.
+    """
+    if seconds is None:
+        expires_at = None
+    else:
+        expires_at = time.monotonic() + seconds
+        current = _deadline.get()
+        if current is not None:
+            expires_at = min(expires_at, current)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Segundos restantes até o prazo da requisição, ou None se não houver prazo."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return max(0.0, expires_at - time.monotonic())
+
+
+def stage_timeout(limit=None):
+    """Tempo máximo de uma etapa: o menor entre `limit` e o que resta do prazo."""
+    left = remaining()
+    if left is None:
+        return limit
+    return left if limit is None else min(limit, left)
+
+
+async def run_with_deadline(awaitable, limit=None):
+    """Aguarda `awaitable` até o prazo da etapa; levanta DeadlineExceeded ao expirar."""
+    timeout = stage_timeout(limit)
+    if timeout is None:
+        return await awaitable
+    if timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        elif isinstance(awaitable, asyncio.Future):
+            awaitable.cancel()
+        raise DeadlineExceeded("Prazo da requisição esgotado")
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Etapa excedeu o prazo de {timeout:.1f}s")
@@ -0,0 +1,88 @@
+from utils import normalize_url
+
+
+def normalize_domain(value):
+    """Normaliza um domínio ou URL para o formato usado no índice.
+
+    Remove protocolo, caminho, porta, credenciais, ponto final e o prefixo
+    `www.`, e converte nomes internacionalizados para IDNA (punycode).
+    """
+    host = normalize_url(value)
+    host = host.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+    host = host.rsplit("@", 1)[-1]
+    if host.startswith("["):
+        # Endereço IPv6 literal
+        return host.split("]", 1)[0] + "]"
+    host = host.split(":", 1)[0].strip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    return host
+
+
+def reverse_labels(domain):
+    """`login.exemplo.com` -> `com.exemplo.login`."""
+    return ".".join(reversed(domain.split(".")))
+
+
+class DomainIndex:
+    """Índice de reputação de domínios com correspondência por sufixo.
+
+    Cada regra é armazenada em um dicionário indexado pelos rótulos do domínio
+    em ordem inversa. Uma regra `exemplo.com` casa com `exemplo.com` e com
+    qualquer subdomínio (`login.exemplo.com`), e a consulta custa um acesso ao
+    dicionário por rótulo do domínio consultado, independente do tamanho das
+    listas.
+    """
+
+    def __init__(self):
+        self._rules = {}  # rótulos invertidos -> (categoria, regra original)
+        self.categories = {}
+
+    @classmethod
+    def from_blacklists(cls, blacklists):
+        """Compila o dicionário {categoria: [domínios]} de `data/blacklists.json`."""
+        index = cls()
+        for category, domains in blacklists.items():
+            for rule in domains:
+                index.add(rule, category)
+        return index
+
+    def add(self, rule, category):
+        domain = normalize_domain(rule)
+        if domain.startswith("*."):
+            domain = domain[2:]
+        if not domain:
+            return
+        key = reverse_labels(domain)
+        if key not in self._rules:
+            self.categories[category] = self.categories.get(category, 0) + 1
+        # Em caso de duplicidade prevalece a primeira categoria carregada
+        self._rules.setdefault(key, (category, rule))
+
+    def match(self, domain):
+        """Retorna a regra mais específica que cobre o domínio, ou None.
+
+        O resultado informa a categoria, a regra da lista e o sufixo casado.
+        """
+        domain = normalize_domain(domain)
+        if not domain:
+            return None
+        labels = domain.split(".")
+        for start in range(len(labels)):
+            suffix = labels[start:]
+            hit = self._rules.get(".".join(reversed(suffix)))
+            if hit is not None:
+                category, rule = hit
+                return {
+                    "category": category,
+                    "rule": rule,
+                    "matched_suffix": ".".join(suffix),
+                }
+        return None
+
+    def __len__(self):
+        return len(self._rules)
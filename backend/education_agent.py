@@ -1,23 +1,36 @@
+import os
 import re
 import asyncio
 from google.generativeai import GenerativeModel
 from utils import safe_print
 from web_search import WebSearcher
+from llm_scheduler import llm_scheduler, PRIORITY_EDUCATION, PRIORITY_ENRICHMENT
+from deadline import run_with_deadline
+from cache import TTLCache
+
+# Conteúdo educativo gerado pela IA, por tipo de golpe
+EDUCATION_CACHE_TTL = int(os.getenv("EDUCATION_CACHE_TTL", str(24 * 3600)))
+EDUCATION_CACHE_MAX_ENTRIES = int(os.getenv("EDUCATION_CACHE_MAX_ENTRIES", "200"))
 
 class EducationAgent:
     def __init__(self, model_name="gemini-2.0-flash"):  # Modelo atualizado
         self.model = GenerativeModel(model_name)
+        self.llm_scheduler = llm_scheduler
         self.web_searcher = WebSearcher()
-        self.content_cache = {}  # Cache para conteúdo educativo
+        # Cache para conteúdo educativo; só guarda textos gerados pela IA, nunca o fallback
+        self.content_cache = TTLCache(
+            "education", EDUCATION_CACHE_TTL, max_entries=EDUCATION_CACHE_MAX_ENTRIES
+        )
     
     async def process(self, input_data):
         try:
             analysis_summary = input_data.get("analysis_summary", "golpes financeiros online")
             
             # Verificar cache
-            if analysis_summary in self.content_cache:
+            cached = self.content_cache.get(analysis_summary)
+            if cached is not None:
                 safe_print(f"Usando conteúdo educativo em cache para: {analysis_summary}")
-                return self.content_cache[analysis_summary]
+                return cached
             
             # Buscar informações atualizadas na web
             search_task = asyncio.create_task(
@@ -48,12 +61,14 @@ class EducationAgent:
             - Dica 5
             """
             
-            base_response_task = asyncio.create_task(self.model.generate_content_async(base_prompt))
+            base_response_task = asyncio.create_task(
+                self.llm_scheduler.generate(self.model, base_prompt, priority=PRIORITY_EDUCATION)
+            )
             
             # Esperar pelos resultados das buscas
             search_results = []
             try:
-                search_results = await asyncio.wait_for(search_task, timeout=5.0)
+                search_results = await run_with_deadline(search_task, 5.0)
                 safe_print(f"Obtidos {len(search_results)} resultados de busca para conteúdo educativo")
             except asyncio.TimeoutError:
                 safe_print("Timeout na busca de informações educativas")
@@ -70,9 +85,13 @@ class EducationAgent:
             
             # Esperar pela resposta base
             base_text = ""
+            # Só o texto gerado pela IA vai para o cache: o fallback de um timeout ou
+            # erro ficaria fixo para este tipo de golpe
+            from_llm = False
             try:
-                base_response = await asyncio.wait_for(base_response_task, timeout=10.0)
-                base_text = base_response.text
+                base_response = await run_with_deadline(base_response_task, 10.0)
+                base_text = base_response.text or ""
+                from_llm = bool(base_text.strip())
             except asyncio.TimeoutError:
                 safe_print("Timeout na geração de conteúdo educativo base")
             except Exception as e:
@@ -116,7 +135,9 @@ class EducationAgent:
                     - Dica 5
                     """
                     
-                    enriched_response = await self.model.generate_content_async(enrichment_prompt)
+                    enriched_response = await self.llm_scheduler.generate(
+                        self.model, enrichment_prompt, priority=PRIORITY_ENRICHMENT
+                    )
                     if enriched_response.text and len(enriched_response.text) > 50:
                         final_text = enriched_response.text
                 except Exception as e:
@@ -162,7 +183,8 @@ class EducationAgent:
                 "educational_text": educational_text,
                 "tips": tips,
             }
-            self.content_cache[analysis_summary] = result
+            if from_llm:
+                self.content_cache.set(analysis_summary, result)
             
             return result
 
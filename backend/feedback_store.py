@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from utils import safe_print, normalize_url
+from analysis_store import ANALYSIS_DB_PATH
+
+# Avaliações concordantes, de análises diferentes, para confirmar o rótulo de uma mensagem ou link
+FEEDBACK_MIN_CONFIRMATIONS = int(os.getenv("FEEDBACK_MIN_CONFIRMATIONS", "2"))
+
+SCAM = "scam"
+SAFE = "safe"
+# feedback_type que confirmam (True) ou contestam (False) o veredito da análise
+FEEDBACK_AGREEMENT = {
+    "correct": True,
+    "accurate": True,
+    "confirmed": True,
+    "incorrect": False,
+    "inaccurate": False,
+    "wrong": False,
+}
+# feedback_type que já informam o rótulo da mensagem
+FEEDBACK_LABELS = {
+    "scam": SCAM,
+    "fraud": SCAM,
+    "golpe": SCAM,
+    "safe": SAFE,
+    "legit": SAFE,
+    "seguro": SAFE,
+}
+LINK_PATTERN = re.compile(r'(https?://[^\s]+)')
+
+
+def feedback_label(feedback_type, is_fraud):
+    """Rótulo (SCAM ou SAFE) indicado pela avaliação, ou None se ela não indicar nenhum."""
+    kind = feedback_type.strip().lower()
+    if kind in FEEDBACK_LABELS:
+        return FEEDBACK_LABELS[kind]
+    agrees = FEEDBACK_AGREEMENT.get(kind)
+    if agrees is None:
+        return None
+    return SCAM if bool(is_fraud) == agrees else SAFE
+
+
+def message_fingerprint(message):
+    """Impressão digital da mensagem, indiferente a maiúsculas e espaços."""
+    text = " ".join(message.casefold().split())
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _resolve(votes, min_confirmations):
+    """(rótulo, confirmações) vencedor dos votos {analysis_id: rótulo}, ou None."""
+    counts = {}
+    for label in votes.values():
+        counts[label] = counts.get(label, 0) + 1
+    label, count = max(counts.items(), key=lambda item: item[1], default=(None, 0))
+    if count < min_confirmations or count <= len(votes) - count:
+        return None
+    return label, count
+
+
+class FeedbackStore:
+    """Avaliações dos usuários e tabela em memória dos rótulos confirmados.
+
+    As avaliações são gravadas no banco das análises (tabela `feedback`,
+    ligada às análises por `analysis_id`). As que confirmam ou contestam o
+    veredito viram votos para a impressão digital da mensagem e para os
+    links que ela contém; um rótulo é confirmado quando atinge
+    `min_confirmations` votos de análises diferentes e supera os votos
+    contrários. A tabela é atualizada a cada avaliação (apenas as entradas
+    afetadas) e recarregada do disco na inicialização.
+
+    Só o rótulo de golpe entra na tabela. Qualquer cliente pode criar
+    análises e avaliá-las, então votos "seguro" não podem dispensar a
+    análise completa de uma mensagem; eles apenas contam contra a
+    confirmação como golpe. Itens duplicados de um lote compartilham o
+    `analysis_id` da primeira ocorrência, e suas avaliações contam como um
+    único voto.
+    """
+
+    def __init__(self, path=ANALYSIS_DB_PATH, min_confirmations=FEEDBACK_MIN_CONFIRMATIONS):
+        self.path = path
+        self.min_confirmations = max(1, min_confirmations)
+        self._local = threading.local()
+        self._message_votes = {}  # impressão digital -> {analysis_id: rótulo}
+        self._url_votes = {}      # URL normalizada -> {analysis_id: rótulo}
+        self._messages = {}       # impressão digital -> confirmações como golpe
+        self._urls = {}           # URL normalizada -> confirmações como golpe
+        self.stats = {
+            "received": 0,
+            "labeled": 0,
+            "preloaded": 0,
+            "write_errors": 0,
+            "lookups": 0,
+            "message_hits": 0,
+            "url_hits": 0,
+        }
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS feedback (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    analysis_id TEXT NOT NULL,
+                    feedback_type TEXT NOT NULL,
+                    comment TEXT,
+                    label TEXT,
+                    fingerprint TEXT,
+                    urls TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_analysis ON feedback (analysis_id)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def preload(self):
+        """Reconstrói a tabela de rótulos a partir das avaliações gravadas."""
+        rows = self._connect().execute(
+            "SELECT analysis_id, label, fingerprint, urls FROM feedback "
+            "WHERE label IS NOT NULL AND fingerprint IS NOT NULL ORDER BY id"
+        ).fetchall()
+        for analysis_id, label, fingerprint, urls in rows:
+            self._apply(analysis_id, label, fingerprint, json.loads(urls or "[]"))
+        self.stats["preloaded"] = len(rows)
+        safe_print(
+            "Avaliações carregadas do disco: %s (%s mensagens e %s links confirmados)",
+            len(rows), len(self._messages), len(self._urls),
+        )
+        return len(rows)
+
+    def _insert(self, row):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO feedback (analysis_id, feedback_type, comment, label, fingerprint, urls, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            row,
+        )
+        conn.commit()
+
+    async def record(self, analysis_id, feedback_type, comment=None, analysis=None):
+        """Grava a avaliação e atualiza a tabela se ela indicar um rótulo.
+
+        `analysis` é o histórico da análise avaliada ({query, result, ...}),
+        de onde vêm o veredito, a mensagem e os links. Retorna o rótulo
+        indicado pela avaliação, ou None.
+        """
+        label = fingerprint = None
+        urls = []
+        if analysis:
+            label = feedback_label(feedback_type, analysis.get("result", {}).get("is_fraud"))
+            message = (analysis.get("query") or {}).get("message") or ""
+            if message:
+                fingerprint = message_fingerprint(message)
+                urls = sorted({normalize_url(link) for link in LINK_PATTERN.findall(message)})
+        self.stats["received"] += 1
+        try:
+            await asyncio.to_thread(self._insert, (
+                analysis_id, feedback_type, comment, label, fingerprint, json.dumps(urls), time.time(),
+            ))
+        except sqlite3.Error as e:
+            self.stats["write_errors"] += 1
+            safe_print(f"Erro ao gravar avaliação em disco: {e}")
+        if label and fingerprint:
+            self._apply(analysis_id, label, fingerprint, urls)
+            self.stats["labeled"] += 1
+        return label
+
+    def _apply(self, analysis_id, label, fingerprint, urls):
+        # A avaliação mais recente de uma análise substitui as anteriores
+        votes = self._message_votes.setdefault(fingerprint, {})
+        votes[analysis_id] = label
+        resolved = _resolve(votes, self.min_confirmations)
+        if resolved and resolved[0] == SCAM:
+            self._messages[fingerprint] = resolved[1]
+        else:
+            self._messages.pop(fingerprint, None)
+        for url in urls:
+            votes = self._url_votes.setdefault(url, {})
+            votes[analysis_id] = label
+            resolved = _resolve(votes, self.min_confirmations)
+            if resolved and resolved[0] == SCAM:
+                self._urls[url] = resolved[1]
+            else:
+                self._urls.pop(url, None)
+
+    def lookup(self, message, links=()):
+        """Rótulo de golpe confirmado da mensagem ou de um dos seus links, sem acesso a disco ou rede.
+
+        Retorna {"label", "confirmations", "matched"} ("message" ou "url"), ou None.
+        """
+        self.stats["lookups"] += 1
+        if self._messages:
+            confirmations = self._messages.get(message_fingerprint(message))
+            if confirmations:
+                self.stats["message_hits"] += 1
+                return {"label": SCAM, "confirmations": confirmations, "matched": "message"}
+        if self._urls:
+            for link in links:
+                confirmations = self._urls.get(normalize_url(link))
+                if confirmations:
+                    self.stats["url_hits"] += 1
+                    return {"label": SCAM, "confirmations": confirmations, "matched": "url"}
+        return None
+
+    def get_stats(self):
+        return dict(
+            self.stats,
+            confirmed_messages=len(self._messages),
+            confirmed_urls=len(self._urls),
+            min_confirmations=self.min_confirmations,
+        )
+
+
+# Instância única do processo
+feedback_store = FeedbackStore()
@@ -0,0 +1,98 @@
+import os
+import asyncio
+import aiohttp
+from utils import safe_print
+from deadline import stage_timeout, remaining, DeadlineExceeded
+
+# Limites do pool de conexões compartilhado (configuráveis via ambiente)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_TOTAL_TIMEOUT = float(os.getenv("HTTP_TOTAL_TIMEOUT", "15"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+
+class HttpClient:
+    """Pool único de conexões HTTP reutilizado por todos os agentes.
+
+    Aberto na inicialização da aplicação e fechado no desligamento, evitando
+    um novo handshake TCP+TLS a cada chamada para SerpAPI e VirusTotal.
+    """
+
+    def __init__(self):
+        self._session = None
+
+    async def start(self):
+        """Cria a sessão compartilhada, caso ainda não exista."""
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT,
+            sock_connect=HTTP_CONNECT_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        safe_print(
+            "Pool HTTP iniciado (limite=%s, por host=%s)",
+            HTTP_POOL_LIMIT,
+            HTTP_POOL_LIMIT_PER_HOST,
+        )
+        return self._session
+
+    async def get_session(self):
+        """Retorna a sessão compartilhada, criando-a sob demanda.
+
+        A criação sob demanda cobre o uso dos agentes fora da aplicação FastAPI
+        (scripts e testes manuais); no servidor a sessão já vem aberta.
+        """
+        if self._session is None or self._session.closed:
+            return await self.start()
+        return self._session
+
+    async def close(self):
+        """Fecha a sessão e libera as conexões mantidas no pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            safe_print("Pool HTTP encerrado")
+        self._session = None
+
+
+def request_timeout(limit=HTTP_TOTAL_TIMEOUT):
+    """Timeout de uma requisição limitado ao que resta do prazo da análise."""
+    total = stage_timeout(limit)
+    if total is not None and total <= 0:
+        raise DeadlineExceeded("Prazo da requisição esgotado")
+    return aiohttp.ClientTimeout(total=total, sock_connect=HTTP_CONNECT_TIMEOUT)
+
+
+def is_deadline_timeout(error):
+    """Verdadeiro se `error` é o estouro do prazo da análise, e não uma falha do serviço.
+
+    Quando `request_timeout` encurta o timeout para o que resta do prazo, é
+    esse limite que estoura e o prazo já está esgotado no momento do erro;
+    um timeout completo estoura com o prazo ainda em aberto.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return True
+    if not isinstance(error, asyncio.TimeoutError):
+        return False
+    left = remaining()
+    # Tolerância para a resolução dos temporizadores do event loop
+    return left is not None and left <= 0.05
+
+
+def is_upstream_failure(status):
+    """Respostas HTTP que indicam falha do serviço (429 e 5xx), e não erro da requisição."""
+    return status == 429 or status >= 500
+
+
+# Instância única do processo
+http_client = HttpClient()
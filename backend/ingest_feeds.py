@@ -0,0 +1,217 @@
+"""Gera o artefato binário de reputação a partir de feeds de ameaças.
+
+Uso:
+    python ingest_feeds.py --feed phishing:feeds/openphish.txt \\
+                           --feed malware:feeds/urlhaus.csv \\
+                           --feed data/blacklists.json \\
+                           --output data/reputation.bin
+
+Formatos aceitos (pela extensão do arquivo):
+    .txt/.list  um domínio ou URL por linha; linhas iniciadas por # são ignoradas
+    .csv        coluna `url`, `domain` ou `host` (ou a indicada em --csv-column);
+                o cabeçalho pode estar em um comentário (`# id,url,...`, como
+                no URLhaus). Sem cabeçalho reconhecido, usa a primeira coluna;
+                uma coluna indicada em --csv-column e ausente é um erro
+    .json       lista de strings, lista de objetos com `url`/`domain`, ou o
+                formato de `data/blacklists.json` ({categoria: [domínios]})
+
+Entradas de URL com caminho (`https://github.com/usuario/payload`) bloqueiam
+apenas aquele URL; só domínios e URLs sem caminho bloqueiam o host e seus
+subdomínios. Assim uma entrada em uma hospedagem compartilhada não marca o
+próprio github.com.
+
+Quando um domínio aparece em mais de um feed, prevalece a categoria do
+primeiro feed informado.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+from itertools import chain
+from utils import normalize_url, extract_domain
+from domain_index import normalize_domain
+from reputation_db import REPUTATION_DB_PATH, build_reputation_db, domain_hash, url_key, url_hash
+
+DEFAULT_CATEGORY = "malicious"
+URL_COLUMNS = ("url", "domain", "host", "hostname")
+
+
+def feed_domain(value):
+    """Normaliza uma entrada de feed (URL ou domínio) para o domínio indexado."""
+    value = value.strip().strip('"').strip()
+    if not value or value.startswith("#"):
+        return ""
+    url = normalize_url(value)
+    domain = extract_domain(f"http://{url}")
+    return normalize_domain(domain)
+
+
+def feed_entry(value):
+    """Normaliza uma entrada de feed em ("domain", domínio) ou ("url", URL); None se vazia.
+
+    Só URLs com caminho viram entradas de URL; os demais bloqueiam o domínio.
+    """
+    value = value.strip().strip('"').strip()
+    domain = feed_domain(value)
+    if not domain:
+        return None
+    _, _, path = url_key(value).partition("/")
+    if path:
+        return "url", url_key(value)
+    return "domain", domain
+
+
+def read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            yield line
+
+
+def _column_index(header, wanted):
+    names = [name.strip().lower() for name in header]
+    return next((names.index(name) for name in wanted if name in names), None)
+
+
+def read_csv(path, column=None):
+    """Valores da coluna de URL/domínio de um feed CSV.
+
+    Levanta ValueError se a coluna `column` não estiver no cabeçalho.
+    """
+    comment = None
+
+    def data_lines(f):
+        nonlocal comment
+        for line in f:
+            if line.startswith("#"):
+                # Último comentário antes dos dados: pode ser o cabeçalho (URLhaus)
+                comment = line[1:]
+                continue
+            yield line
+
+    with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        rows = csv.reader(data_lines(f))
+        first = next(rows, None)
+        if first is None:
+            return
+        wanted = [column.strip().lower()] if column else list(URL_COLUMNS)
+        index = _column_index(first, wanted)
+        pending = []
+        if index is None and comment is not None:
+            index = _column_index(next(csv.reader([comment]), []), wanted)
+            # Cabeçalho no comentário: a primeira linha já é dado
+            pending = [first]
+        if index is None:
+            if column:
+                raise ValueError(f"Coluna '{column}' não encontrada no cabeçalho de {path}")
+            # Sem cabeçalho reconhecido: a primeira linha também é dado
+            index = 0
+            pending = [first]
+        for row in chain(pending, rows):
+            if len(row) > index:
+                yield row[index]
+
+
+def read_json(path):
+    """Retorna pares (categoria ou None, valor) de um feed JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        for category, values in data.items():
+            for value in values:
+                yield category, value
+        return
+    for item in data:
+        if isinstance(item, str):
+            yield None, item
+        elif isinstance(item, dict):
+            value = next((item[key] for key in URL_COLUMNS if item.get(key)), "")
+            yield item.get("category"), value
+
+
+def iter_feed(path, category, csv_column=None):
+    """Gera (categoria, tipo, chave) de um arquivo de feed; tipo é "domain" ou "url"."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        pairs = read_json(path)
+    elif extension == ".csv":
+        pairs = ((None, value) for value in read_csv(path, csv_column))
+    else:
+        pairs = ((None, value) for value in read_text(path))
+
+    for item_category, value in pairs:
+        entry = feed_entry(str(value))
+        if entry:
+            yield (category or item_category or DEFAULT_CATEGORY,) + entry
+
+
+def parse_feed_argument(argument):
+    """`categoria:caminho` ou apenas `caminho`."""
+    category, separator, path = argument.partition(":")
+    if separator and not os.path.exists(argument):
+        return category, path
+    return None, argument
+
+
+def ingest(feeds, output, false_positive_rate=0.001, csv_column=None):
+    categories = []
+    category_ids = {}
+    entries = {}
+    total = 0
+    urls = set()
+
+    for category, path in feeds:
+        for entry_category, kind, key in iter_feed(path, category, csv_column):
+            total += 1
+            if entry_category not in category_ids:
+                if len(categories) >= 256:
+                    raise ValueError("O formato suporta no máximo 256 categorias")
+                category_ids[entry_category] = len(categories)
+                categories.append(entry_category)
+            if kind == "url":
+                urls.add(key)
+                entry_hash = url_hash(key)
+            else:
+                entry_hash = domain_hash(key)
+            entries.setdefault(entry_hash, category_ids[entry_category])
+
+    info = build_reputation_db(entries, output, categories, false_positive_rate)
+    info.update(read=total, duplicates=total - len(entries), categories=categories, urls=len(urls))
+    return info
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o artefato binário de reputação de domínios.")
+    parser.add_argument("--feed", action="append", required=True,
+                        help="Arquivo de feed, opcionalmente prefixado pela categoria (categoria:caminho)")
+    parser.add_argument("--output", default=REPUTATION_DB_PATH,
+                        help=f"Arquivo de saída (padrão: {REPUTATION_DB_PATH})")
+    parser.add_argument("--false-positive-rate", type=float, default=0.001,
+                        help="Taxa de falso positivo do filtro de Bloom (padrão: 0.001)")
+    parser.add_argument("--csv-column", default=None,
+                        help="Nome da coluna com o URL/domínio nos feeds CSV")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        info = ingest(
+            [parse_feed_argument(feed) for feed in args.feed],
+            args.output,
+            args.false_positive_rate,
+            args.csv_column,
+        )
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+    print(
+        f"{info['entries']} entradas únicas, {info['urls']} delas URLs "
+        f"({info['duplicates']} duplicadas de {info['read']} lidas) "
+        f"em {len(info['categories'])} categorias gravados em {args.output} "
+        f"({os.path.getsize(args.output)} bytes, {time.perf_counter() - started:.2f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,51 @@
 import os
-import re
-import aiohttp
+import time
+import base64
 import asyncio
 from utils import safe_print, normalize_url, extract_domain
+from http_client import http_client, request_timeout, is_deadline_timeout, is_upstream_failure
+from metrics import external_call
+from singleflight import SingleFlight
 from web_search import WebSearcher
-from config import get_api_key, get_blacklists
+from verdict_store import verdict_store
+from blacklist_registry import blacklist_registry
+from url_features import extract_url_features
+from typosquat import get_typosquat_detector
+from circuit_breaker import get_breaker
+from deadline import stage_timeout, DeadlineExceeded
+from config import get_api_key
+
+VT_API_BASE = "https://www.virustotal.com/api/v3"
+# "lookup_first" consulta o relatório existente antes de submeter; "scan" sempre submete
+VT_MODE = os.getenv("VT_MODE", "lookup_first")
+VT_REPORT_MAX_AGE = int(os.getenv("VT_REPORT_MAX_AGE", str(7 * 24 * 3600)))
+VT_POLL_INITIAL_DELAY = float(os.getenv("VT_POLL_INITIAL_DELAY", "1.0"))
+VT_POLL_MAX_DELAY = float(os.getenv("VT_POLL_MAX_DELAY", "4.0"))
+VT_POLL_DEADLINE = float(os.getenv("VT_POLL_DEADLINE", "15.0"))
+
+# Consultas concorrentes ao mesmo URL compartilham uma única chamada ao VirusTotal
+virustotal_flight = SingleFlight("virustotal")
+virustotal_breaker = get_breaker("virustotal")
 
 class LinkValidator:
     def __init__(self):
         self.api_key = get_api_key("virustotal")
-        self.blacklists = get_blacklists()
+        self.blacklist_registry = blacklist_registry
+        self.blacklist_registry.ensure_loaded()
         self.web_searcher = WebSearcher()
-        self.check_cache = {}  # Cache para evitar verificações duplicadas
+        self.typosquat_detector = get_typosquat_detector()
+        self.check_cache = verdict_store  # Vereditos persistidos para evitar verificações duplicadas
     
     async def process(self, input_data):
+        """Analisa um link.
+
+        Com `local_only`, apenas as verificações locais (encurtadores,
+        blacklists e características do URL) são feitas, sem VirusTotal nem
+        busca na web.
+        """
         try:
             link = input_data.get("link", "")
+            local_only = input_data.get("local_only", False)
             if not link:
                 return {
                     "analysis": "Nenhum link fornecido para análise.",
@@ -50,38 +80,32 @@ class LinkValidator:
                 recommendations.append("Use um serviço para expandir links encurtados antes de clicar.")
                 risk_score += 4
             
-            # Verificar na blacklist
-            in_blacklist = False
-            blacklist_type = ""
-            
-            for bl_type, domains in self.blacklists.items():
-                if domain in domains:
-                    in_blacklist = True
-                    blacklist_type = bl_type
-                    break
+            # Verificar na blacklist e nos feeds de reputação (inclui subdomínios)
+            blacklist_match = self.blacklist_registry.match(domain, link)
+            in_blacklist = blacklist_match is not None
             
             if in_blacklist:
-                explanations.append(f"Este site está em nossa lista de {blacklist_type}.")
+                explanations.append(f"Este site está em nossa lista de {blacklist_match['category']} ({blacklist_match['rule']}).")
                 recommendations.append("Não acesse este site sob nenhuma circunstância.")
                 risk_score += 6
             
             # Verificação no VirusTotal, se disponível API
             vt_result = {}
-            if self.api_key and not in_blacklist:
+            if self.api_key and not in_blacklist and not local_only:
                 vt_result = await self._check_virustotal(link)
                 if vt_result.get("malicious", 0) > 0:
                     explanations.append(f"Este link foi marcado como malicioso por {vt_result.get('malicious')} serviços de segurança.")
                     risk_score += min(vt_result.get("malicious", 0), 5)  # Máximo de 5 pontos
             
             # Pesquisa web para verificar se há relatos sobre este domínio
-            if not in_blacklist and risk_score < 7:
+            if not in_blacklist and not local_only and risk_score < 7:
                 scam_reports = await self.web_searcher.search_scam_reports(domain)
                 if len(scam_reports) > 2:  # Se encontrar mais de 2 relatórios
                     explanations.append("Encontramos relatórios online que podem indicar que este site está envolvido em golpes.")
                     risk_score += 2
             
             # Análise de características da URL
-            url_analysis = self._analyze_url_characteristics(link)
+            url_analysis = self._analyze_url_characteristics(link, input_data.get("url_features"))
             if url_analysis["suspicious"]:
                 explanations.append(url_analysis["explanation"])
                 risk_score += url_analysis["score"]
@@ -109,7 +133,8 @@ class LinkValidator:
                 "risk_score": risk_score,
                 "is_fraud": is_fraud,
                 "recommendations": recommendations,
-                "technical_details": vt_result
+                "technical_details": vt_result,
+                "blacklist_match": blacklist_match
             }
 
         except Exception as e:
@@ -125,61 +150,125 @@ class LinkValidator:
         try:
             # Verificar cache
             cache_key = normalize_url(url)
-            if cache_key in self.check_cache:
-                return self.check_cache[cache_key]
+            cached = await self.check_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
-            # API do VirusTotal
-            vt_api_url = "https://www.virustotal.com/api/v3/urls"
+            # VirusTotal instável: seguir apenas com as verificações locais
+            if not virustotal_breaker.allow():
+                return {"error": "VirusTotal temporariamente indisponível"}
             
-            # Primeiro, enviar URL para análise
-            headers = {
-                "x-apikey": self.api_key,
-                "Content-Type": "application/x-www-form-urlencoded"
+            return await virustotal_flight.do(
+                cache_key, lambda: self._query_virustotal(url, cache_key)
+            )
+        except Exception as e:
+            safe_print(f"Erro ao verificar URL no VirusTotal: {e}")
+            return {"error": str(e)}
+    
+    async def _query_virustotal(self, url, cache_key):
+        """Obtém o veredito do VirusTotal e armazena o resultado no cache.
+
+        No modo "lookup_first" busca primeiro o relatório já existente para o
+        URL e só submete uma nova análise se não houver relatório recente.
+        """
+        try:
+            headers = {"x-apikey": self.api_key}
+            session = await http_client.get_session()
+            
+            stats = None
+            with external_call("virustotal") as call:
+                if VT_MODE == "lookup_first":
+                    stats = await self._fetch_virustotal_report(session, headers, url)
+                if stats is None:
+                    stats = await self._scan_virustotal(session, headers, url)
+                if "error" in stats:
+                    call.outcome = "timeout" if "partial" in stats else "error"
+            if "error" in stats:
+                # Resultado parcial (prazo de polling) e erros 4xx da requisição não são falhas do VirusTotal
+                status = stats.get("status")
+                if "partial" not in stats and (status is None or is_upstream_failure(status)):
+                    virustotal_breaker.record_failure(stats["error"])
+                return stats
+            virustotal_breaker.record_success()
+            
+            result = {
+                "malicious": stats.get("malicious", 0),
+                "suspicious": stats.get("suspicious", 0),
+                "harmless": stats.get("harmless", 0),
+                "undetected": stats.get("undetected", 0)
             }
             
-            async with aiohttp.ClientSession() as session:
-                # Submeter URL para análise
-                async with session.post(vt_api_url, headers=headers, data={"url": url}) as response:
-                    if response.status != 200:
-                        return {"error": "Erro ao enviar URL para análise"}
-                    
-                    data = await response.json()
-                    analysis_id = data.get("data", {}).get("id", "")
-                    
-                    if not analysis_id:
-                        return {"error": "ID de análise não encontrado"}
-                    
-                    # Esperar alguns segundos para a análise ser concluída
-                    await asyncio.sleep(2)
-                    
-                    # Obter resultados
-                    result_url = f"{vt_api_url}/{analysis_id}"
-                    async with session.get(result_url, headers=headers) as result_response:
-                        if result_response.status != 200:
-                            return {"error": "Erro ao obter resultados da análise"}
-                        
-                        result_data = await result_response.json()
-                        
-                        # Processar resultados
-                        attributes = result_data.get("data", {}).get("attributes", {})
-                        stats = attributes.get("stats", {})
-                        
-                        result = {
-                            "malicious": stats.get("malicious", 0),
-                            "suspicious": stats.get("suspicious", 0),
-                            "harmless": stats.get("harmless", 0),
-                            "undetected": stats.get("undetected", 0)
-                        }
-                        
-                        # Armazenar no cache
-                        self.check_cache[cache_key] = result
-                        return result
-        
+            # Armazenar no cache
+            await self.check_cache.put(cache_key, result)
+            return result
+    
+        except DeadlineExceeded as e:
+            return {"error": str(e)}
         except Exception as e:
             safe_print(f"Erro ao verificar URL no VirusTotal: {e}")
-            return {"error": str(e)}
+            # Timeout encurtado pelo prazo da análise não é falha do VirusTotal
+            if not is_deadline_timeout(e):
+                virustotal_breaker.record_failure(e)
+            return {"error": str(e) or e.__class__.__name__}
     
-    def _analyze_url_characteristics(self, url):
+    async def _fetch_virustotal_report(self, session, headers, url):
+        """Busca o relatório existente do URL; retorna None se não houver um recente.
+
+        Outras respostas de erro (429, 401, 5xx) retornam {"error", "status"}:
+        submeter uma nova análise gastaria cota justamente quando o
+        VirusTotal limita ou falha.
+        """
+        url_id = base64.urlsafe_b64encode(url.encode()).decode().strip("=")
+        async with session.get(f"{VT_API_BASE}/urls/{url_id}", headers=headers, timeout=request_timeout()) as response:
+            if response.status == 404:
+                return None
+            if response.status != 200:
+                safe_print(f"Erro ao consultar relatório do VirusTotal: {response.status}")
+                return {"error": "Erro ao consultar relatório do VirusTotal", "status": response.status}
+            data = await response.json()
+        
+        attributes = data.get("data", {}).get("attributes", {})
+        stats = attributes.get("last_analysis_stats")
+        last_analysis = attributes.get("last_analysis_date", 0)
+        if not stats or time.time() - last_analysis > VT_REPORT_MAX_AGE:
+            return None
+        return stats
+    
+    async def _scan_virustotal(self, session, headers, url):
+        """Submete o URL para análise e consulta o resultado com backoff até o prazo."""
+        async with session.post(f"{VT_API_BASE}/urls", headers=headers, data={"url": url},
+                                timeout=request_timeout()) as response:
+            if response.status != 200:
+                return {"error": "Erro ao enviar URL para análise", "status": response.status}
+            data = await response.json()
+        
+        analysis_id = data.get("data", {}).get("id", "")
+        if not analysis_id:
+            return {"error": "ID de análise não encontrado"}
+        
+        deadline = time.monotonic() + stage_timeout(VT_POLL_DEADLINE)
+        delay = VT_POLL_INITIAL_DELAY
+        attributes = {}
+        while True:
+            await asyncio.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            async with session.get(f"{VT_API_BASE}/analyses/{analysis_id}", headers=headers,
+                                   timeout=request_timeout()) as result_response:
+                if result_response.status != 200:
+                    return {"error": "Erro ao obter resultados da análise", "status": result_response.status}
+                result_data = await result_response.json()
+            
+            attributes = result_data.get("data", {}).get("attributes", {})
+            if attributes.get("status") == "completed":
+                return attributes.get("stats", {})
+            if time.monotonic() >= deadline:
+                break
+            delay = min(delay * 2, VT_POLL_MAX_DELAY)
+        
+        # Prazo esgotado: resultado parcial não é armazenado como veredito
+        safe_print(f"Análise do VirusTotal não concluída no prazo para: {url}")
+        return {"error": "Análise do VirusTotal não concluída no prazo", "partial": attributes.get("stats", {})}
+    
+    def _analyze_url_characteristics(self, url, features=None):
         """Analisa características da URL que podem indicar phishing."""
         result = {
             "suspicious": False,
@@ -187,46 +276,41 @@ class LinkValidator:
             "score": 0,
             "recommendations": []
         }
+        if features is None:
+            features = extract_url_features(url)
         
         # Verifica se a URL contém números em excesso ou caracteres estranhos
-        num_count = len(re.findall(r'\d', url))
-        if num_count > 10:
+        if features["digit_count"] > 10:
             result["suspicious"] = True
             result["explanation"] += "A URL contém muitos números, o que é incomum para sites legítimos. "
             result["score"] += 2
         
-        # Verifica presença de palavras de instituições financeiras combinadas com domínios suspeitos
-        financial_terms = ["banco", "bank", "caixa", "santander", "bradesco", "itau", "nubank", "inter"]
-        domain = extract_domain(url).lower()
-        
-        for term in financial_terms:
-            if term in url.lower() and term not in domain:
-                result["suspicious"] = True
-                result["explanation"] += f"A URL contém a palavra '{term}', mas não está no domínio oficial. Pode ser uma tentativa de phishing. "
-                result["score"] += 4
-                result["recommendations"].append("Bancos legítimos usam apenas seus domínios oficiais. Acesse o site digitando o endereço diretamente no navegador.")
-                break
-        
-        # Verifica se o domínio parece uma imitação de domínio legítimo
-        common_domains = {
-            "google": "google.com",
-            "facebook": "facebook.com",
-            "whatsapp": "whatsapp.com",
-            "instagram": "instagram.com",
-            "microsoft": "microsoft.com",
-            "apple": "apple.com"
-        }
+        # Verifica presença de palavras de instituições financeiras fora do domínio
+        for term in features["financial_terms_outside_host"][:1]:
+            result["suspicious"] = True
+            result["explanation"] += f"A URL contém a palavra '{term}', mas não está no domínio oficial. Pode ser uma tentativa de phishing. "
+            result["score"] += 4
+            result["recommendations"].append("Bancos legítimos usam apenas seus domínios oficiais. Acesse o site digitando o endereço diretamente no navegador.")
         
-        for brand, official_domain in common_domains.items():
-            if brand in domain and official_domain not in domain:
-                result["suspicious"] = True
-                result["explanation"] += f"Esta URL parece imitar o site da {brand}, mas não é o domínio oficial ({official_domain}). "
+        # Verifica se o domínio imita um domínio protegido (bancos, gov.br, PIX),
+        # inclusive com erros de digitação e caracteres confundíveis
+        for finding in self.typosquat_detector.check(features["host"])[:1]:
+            brand = finding["brand"]
+            official_domain = finding["protected_domain"]
+            result["suspicious"] = True
+            if finding["technique"] == "embedded":
+                result["explanation"] += f"Esta URL usa o nome {brand}, mas não é o domínio oficial ({official_domain}). "
                 result["score"] += 3
-                result["recommendations"].append(f"O site oficial da {brand} é {official_domain}. Acesse apenas este domínio.")
+            else:
+                result["explanation"] += f"O domínio '{finding['token']}' imita o site {brand}, trocando ou alterando caracteres do domínio oficial ({official_domain}). "
+                result["score"] += 4
+            result["recommendations"].append(f"O site oficial de {brand} é {official_domain}. Acesse apenas este domínio.")
         
-        # Verifica se a URL tem muitos subdomínios (possível técnica de confusão)
-        subdomain_count = domain.count(".")
-        if subdomain_count > 2:
+        # Verifica se a URL tem muitos subdomínios (possível técnica de confusão).
+        # A profundidade é contada a partir do domínio registrável, então
+        # `www.bb.com.br` e `login.caixa.gov.br` não são penalizados apenas
+        # pelo sufixo de dois níveis.
+        if features["subdomain_depth"] >= 2:
             result["suspicious"] = True
             result["explanation"] += "Esta URL tem uma estrutura de subdomínios complexa, o que pode ser uma tentativa de confundir o usuário. "
             result["score"] += 2
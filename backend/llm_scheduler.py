@@ -0,0 +1,227 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from utils import safe_print
+from circuit_breaker import get_breaker, CircuitOpenError
+from deadline import run_with_deadline, stage_timeout, DeadlineExceeded
+from metrics import span, external_call
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Orçamento de tokens por minuto (entrada + saída) de todas as chamadas ao Gemini; 0 desativa
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+# Tokens de saída reservados por chamada até que o uso real seja conhecido
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "800"))
+# Pausa nas novas chamadas após uma resposta 429 (cota excedida), em segundos
+LLM_RATE_LIMIT_BACKOFF = float(os.getenv("LLM_RATE_LIMIT_BACKOFF", "5.0"))
+# Tempo máximo de uma chamada ao Gemini, limitado também pelo prazo da análise
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "15"))
+
+CHARS_PER_TOKEN = 4
+BUDGET_WINDOW = 60.0
+WAIT_SAMPLES = 1000
+
+# Prioridades: valores menores são atendidos primeiro
+PRIORITY_INTERACTIVE = 0  # análise de mensagens (usuário aguardando)
+PRIORITY_EDUCATION = 1    # conteúdo educativo
+PRIORITY_ENRICHMENT = 2   # enriquecimento do conteúdo educativo
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_EDUCATION: "education",
+    PRIORITY_ENRICHMENT: "enrichment",
+}
+
+
+def estimate_tokens(prompt):
+    """Estimativa local (sem chamada à API) dos tokens de um prompt."""
+    return max(1, len(prompt) // CHARS_PER_TOKEN)
+
+
+def is_rate_limit_error(error):
+    """Verdadeiro para erros de cota do Gemini (HTTP 429 / ResourceExhausted)."""
+    return (
+        error.__class__.__name__ == "ResourceExhausted"
+        or getattr(error, "code", None) == 429
+        or "429" in str(error)
+    )
+
+
+class LLMScheduler:
+    """Fila única para todas as chamadas ao Gemini.
+
+    Limita o número de chamadas simultâneas e o consumo de tokens em uma
+    janela deslizante de um minuto, e atende os pedidos por prioridade (e,
+    na mesma prioridade, por ordem de chegada), de modo que a análise de
+    mensagens passa à frente do conteúdo educativo. Cada chamada reserva uma
+    estimativa de tokens, corrigida pelo uso informado na resposta.
+
+    A espera na fila e a chamada respeitam o prazo da análise, e com o
+    circuito do Gemini aberto as chamadas falham de imediato com
+    CircuitOpenError, levando os agentes aos seus fallbacks locais.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, tokens_per_minute=LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        self.breaker = get_breaker("gemini")
+        self._queue = []  # heap de (prioridade, sequência, futuro, tokens)
+        self._sequence = itertools.count()
+        self._active = 0
+        self._usage = deque()  # (instante, tokens) na janela do orçamento
+        self._window_tokens = 0
+        self._paused_until = 0.0
+        self._timer = None
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "cancelled": 0,
+            "max_queue_depth": 0,
+        }
+        self._waits = {name: deque(maxlen=WAIT_SAMPLES) for name in PRIORITY_NAMES.values()}
+
+    async def generate(self, model, prompt, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Executa `model.generate_content_async(prompt, **kwargs)` respeitando os limites."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.name)
+        tokens = estimate_tokens(prompt) + LLM_OUTPUT_TOKENS_ESTIMATE
+        with span("gemini_queue"):
+            reservation = await run_with_deadline(self._acquire(priority, tokens))
+        call_timeout = stage_timeout(LLM_CALL_TIMEOUT)
+        try:
+            with external_call("gemini"):
+                response = await run_with_deadline(
+                    model.generate_content_async(prompt, **kwargs), LLM_CALL_TIMEOUT
+                )
+        except Exception as e:
+            self.stats["errors"] += 1
+            # Estourar o que restava do prazo da análise não é falha do Gemini
+            if not isinstance(e, DeadlineExceeded) or call_timeout >= LLM_CALL_TIMEOUT:
+                self.breaker.record_failure(e)
+            if is_rate_limit_error(e):
+                self.stats["rate_limited"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + LLM_RATE_LIMIT_BACKOFF)
+                safe_print(f"Cota do Gemini excedida; novas chamadas pausadas por {LLM_RATE_LIMIT_BACKOFF}s")
+            raise
+        else:
+            self.stats["completed"] += 1
+            self.breaker.record_success()
+            usage = getattr(response, "usage_metadata", None)
+            used = getattr(usage, "total_token_count", None)
+            if used:
+                self._adjust(reservation, used)
+            return response
+        finally:
+            self._release()
+
+    async def _acquire(self, priority, tokens):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        enqueued_at = time.monotonic()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future, tokens))
+        self.stats["requests"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+        self._dispatch()
+        try:
+            reservation = await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Liberado no mesmo instante em que o chamador desistiu
+                self._release()
+            self.stats["cancelled"] += 1
+            raise
+        self._waits[PRIORITY_NAMES.get(priority, str(priority))].append(time.monotonic() - enqueued_at)
+        return reservation
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Libera os pedidos da frente da fila enquanto houver vaga e orçamento."""
+        now = time.monotonic()
+        self._expire_usage(now)
+        while self._queue and self._active < self.max_concurrency:
+            _, _, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._paused_until - now
+            if wait <= 0:
+                wait = self._budget_wait(tokens, now)
+            if wait > 0:
+                self._schedule(wait)
+                return
+            heapq.heappop(self._queue)
+            self._active += 1
+            reservation = [now, tokens]
+            self._usage.append(reservation)
+            self._window_tokens += tokens
+            future.set_result(reservation)
+
+    def _budget_wait(self, tokens, now):
+        """Segundos até o orçamento comportar `tokens` (0 se já comporta)."""
+        if not self.tokens_per_minute or not self._usage:
+            # Sem uso na janela, um pedido maior que o orçamento também é atendido
+            return 0.0
+        excess = self._window_tokens + tokens - self.tokens_per_minute
+        if excess <= 0:
+            return 0.0
+        for started, used in self._usage:
+            excess -= used
+            if excess <= 0:
+                return started + BUDGET_WINDOW - now
+        return self._usage[-1][0] + BUDGET_WINDOW - now
+
+    def _expire_usage(self, now):
+        while self._usage and self._usage[0][0] + BUDGET_WINDOW <= now:
+            _, used = self._usage.popleft()
+            self._window_tokens -= used
+
+    def _adjust(self, reservation, used):
+        """Substitui a estimativa reservada pelo uso real, se ainda estiver na janela."""
+        if reservation[0] + BUDGET_WINDOW > time.monotonic():
+            self._window_tokens += used - reservation[1]
+            reservation[1] = used
+
+    def _schedule(self, delay):
+        if self._timer is not None and not self._timer.cancelled():
+            self._timer.cancel()
+        loop = asyncio.get_running_loop()
+        self._timer = loop.call_later(delay, self._dispatch)
+
+    def get_stats(self):
+        """Profundidade da fila por prioridade, tempos de espera e uso do orçamento."""
+        self._expire_usage(time.monotonic())
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future, _ in self._queue:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                queued[name] = queued.get(name, 0) + 1
+        waits = {}
+        for name, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "samples": len(ordered),
+                "avg_seconds": round(sum(ordered) / len(ordered), 4) if ordered else 0.0,
+                "p95_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4) if ordered else 0.0,
+                "max_seconds": round(ordered[-1], 4) if ordered else 0.0,
+            }
+        return dict(
+            self.stats,
+            active=self._active,
+            max_concurrency=self.max_concurrency,
+            queue_depth=sum(queued.values()),
+            queued=queued,
+            wait_times=waits,
+            tokens_last_minute=self._window_tokens,
+            tokens_per_minute=self.tokens_per_minute,
+            paused_seconds=round(max(0.0, self._paused_until - time.monotonic()), 2),
+        )
+
+
+# Escalonador compartilhado por todo o processo
+llm_scheduler = LLMScheduler()
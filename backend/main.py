@@ -1,15 +1,36 @@
+import json
 import uvicorn
+import asyncio
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from manager import AgentManager
-from config import setup_api
+from config import setup_api, BATCH_MAX_ITEMS
+from http_client import http_client
+from web_search import search_flight, search_cache
+from link_validator import virustotal_flight
+from recent_scams import recent_scams_feed
+from verdict_store import verdict_store
+from message_cache import message_cache
+from llm_scheduler import llm_scheduler
+from circuit_breaker import get_breakers_status
+from analysis_writer import analysis_writer
+from analysis_store import analysis_store, encode_cursor
+from analysis_history import analysis_history
+from feedback_store import feedback_store
+from blacklist_registry import blacklist_registry
+from utils import safe_print, logger, get_logging_stats
+from metrics import CallbackMetric, render_metrics
 
 class UserQuery(BaseModel):
     message: str
     user_id: str
     device_info: Optional[Dict] = None
+    include_timings: bool = False  # incluir na resposta o tempo de cada etapa
 
 class EducationLink(BaseModel):
     title: str
@@ -24,6 +45,35 @@ class AnalysisResponse(BaseModel):
     education_links: List[EducationLink]
     educational_text: str
     education_tips: List[str]
+    decision_tier: Optional[str] = None  # "local" (sinais locais), "feedback" (rótulo confirmado) ou "full" (IA e serviços externos)
+    from_cache: Optional[bool] = None  # veredito da mensagem reaproveitado de uma cópia já analisada
+    timings: Optional[Dict] = None  # tempos por etapa, apenas com `include_timings`; trabalho compartilhado conta como espera
+
+class BatchQuery(BaseModel):
+    items: List[UserQuery]
+    concurrency: Optional[int] = None
+
+class BatchItemResult(BaseModel):
+    index: int
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    duplicate_of: Optional[int] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    unique_messages: int
+    unique_links: int
+
+class StoredAnalysis(BaseModel):
+    analysis_id: str
+    user_id: Optional[str] = None
+    created_at: datetime
+    result: AnalysisResponse
+
+class AnalysisList(BaseModel):
+    items: List[StoredAnalysis]
+    next_cursor: Optional[str] = None  # passe em `cursor` para obter a próxima página
 
 class Feedback(BaseModel):
     analysis_id: str
@@ -32,10 +82,82 @@ class Feedback(BaseModel):
 
 setup_api()
 
+# Contadores já mantidos pelos componentes, lidos a cada coleta de /metrics
+CallbackMetric(
+    "detector_cache_hits_total", "counter", "Acertos dos caches", ["cache"],
+    lambda: {
+        (search_cache.name,): search_cache.stats["hits"],
+        (message_cache.entries.name,): message_cache.stats["exact_hits"] + message_cache.stats["near_hits"],
+        ("virustotal",): verdict_store.memory.stats["hits"] + verdict_store.stats["disk_hits"],
+        ("analysis_history",): analysis_history.stats["memory_hits"] + analysis_history.stats["disk_hits"],
+        ("feedback",): feedback_store.stats["message_hits"] + feedback_store.stats["url_hits"],
+    },
+)
+CallbackMetric(
+    "detector_cache_misses_total", "counter", "Falhas dos caches", ["cache"],
+    lambda: {
+        (search_cache.name,): search_cache.stats["misses"],
+        (message_cache.entries.name,): message_cache.stats["misses"],
+        ("virustotal",): verdict_store.stats["disk_misses"],
+        ("analysis_history",): analysis_history.stats["misses"],
+        ("feedback",): feedback_store.stats["lookups"]
+        - feedback_store.stats["message_hits"] - feedback_store.stats["url_hits"],
+    },
+)
+CallbackMetric(
+    "detector_coalesced_calls_total", "counter", "Chamadas externas agrupadas com uma idêntica em andamento",
+    ["service"],
+    lambda: {(flight.name,): flight.stats["coalesced"] for flight in (search_flight, virustotal_flight)},
+)
+CallbackMetric(
+    "detector_upstream_errors_total", "counter", "Falhas de serviços externos (contadas pelos disjuntores)",
+    ["service"],
+    lambda: {(name,): status["failures"] for name, status in get_breakers_status().items()},
+)
+CallbackMetric(
+    "detector_circuit_rejections_total", "counter", "Chamadas recusadas com o circuito aberto", ["service"],
+    lambda: {(name,): status["rejected"] for name, status in get_breakers_status().items()},
+)
+CallbackMetric(
+    "detector_circuit_open", "gauge", "1 se o circuito do serviço está aberto ou meio aberto", ["service"],
+    lambda: {(name,): int(status["state"] != "closed") for name, status in get_breakers_status().items()},
+)
+CallbackMetric(
+    "detector_llm_queue_depth", "gauge", "Chamadas ao Gemini aguardando na fila", [],
+    lambda: {(): llm_scheduler.get_stats()["queue_depth"]},
+)
+CallbackMetric(
+    "detector_analysis_records_total", "counter", "Registros de análise por destino final", ["result"],
+    lambda: {(key,): analysis_writer.stats[key] for key in ("written", "dropped", "lost")},
+)
+CallbackMetric(
+    "detector_log_records_dropped_total", "counter", "Registros de log descartados com a fila cheia", [],
+    lambda: {(): get_logging_stats()["dropped"]},
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abre o pool HTTP compartilhado na inicialização e o fecha no desligamento
+    await http_client.start()
+    await asyncio.to_thread(verdict_store.preload)
+    await asyncio.to_thread(feedback_store.preload)
+    recent_scams_feed.start()
+    blacklist_registry.start()
+    analysis_writer.start()
+    try:
+        yield
+    finally:
+        await blacklist_registry.stop()
+        await recent_scams_feed.stop()
+        # Grava as análises ainda na fila antes de encerrar
+        await analysis_writer.stop()
+        await http_client.close()
+
 app = FastAPI(
     title="API Detector de Golpes",
     description="Backend para o sistema de detecção de golpes usando Agentes de IA",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -57,18 +179,126 @@ agent_manager = AgentManager()
 
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze_message_endpoint(query: UserQuery):
-    print(f"Recebida solicitação de análise para user_id: {query.user_id}")
+    safe_print("Recebida solicitação de análise para user_id: %s", query.user_id)
     try:
         result = await agent_manager.process_user_query(query.dict())
         return AnalysisResponse(**result)
     except Exception as e:
-        print(f"Erro na análise: {e}")
+        logger.error("Erro na análise: %s", e)
         raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao processar sua solicitação.")
 
+@app.post("/analyze/stream")
+async def analyze_stream_endpoint(query: UserQuery):
+    """Variante de /analyze que envia resultados parciais via Server-Sent Events."""
+    safe_print("Recebida solicitação de análise (streaming) para user_id: %s", query.user_id)
+    
+    async def event_stream():
+        async for event, data in agent_manager.stream_user_query(query.dict()):
+            payload = AnalysisResponse(**data).dict() if event == "result" else data
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/analyze/batch", response_model=BatchResponse)
+async def analyze_batch_endpoint(batch: BatchQuery):
+    if not batch.items:
+        raise HTTPException(status_code=422, detail="O lote deve conter ao menos uma mensagem.")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"O lote pode conter no máximo {BATCH_MAX_ITEMS} mensagens.")
+    safe_print("Recebido lote de %s mensagens para análise", len(batch.items))
+    try:
+        result = await agent_manager.process_batch(
+            [item.dict() for item in batch.items], batch.concurrency
+        )
+        return BatchResponse(**result)
+    except Exception as e:
+        logger.error("Erro na análise em lote: %s", e)
+        raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao processar o lote.")
+
 @app.post("/feedback")
 async def submit_feedback_endpoint(feedback_data: Feedback):
-    print(f"Feedback recebido: {feedback_data.dict()}")
+    analysis = await analysis_history.get_async(feedback_data.analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Análise não encontrada.")
+    await feedback_store.record(
+        feedback_data.analysis_id,
+        feedback_data.feedback_type,
+        feedback_data.comment,
+        analysis,
+    )
     return {"status": "success", "message": "Feedback recebido. Obrigado!"}
 
+def _stored_analysis(record):
+    return dict(record, created_at=datetime.fromtimestamp(record["created_at"], timezone.utc))
+
+def _timestamp(value):
+    return value.timestamp() if value is not None else None
+
+@app.get("/analyses/{analysis_id}", response_model=StoredAnalysis)
+async def get_analysis_endpoint(analysis_id: str):
+    record = await analysis_store.get_async(analysis_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Análise não encontrada.")
+    return _stored_analysis(record)
+
+@app.get("/analyses", response_model=AnalysisList)
+async def list_analyses_endpoint(
+    user_id: Optional[str] = None,
+    is_fraud: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    try:
+        records = await analysis_store.list_async(
+            user_id=user_id,
+            is_fraud=is_fraud,
+            since=_timestamp(since),
+            until=_timestamp(until),
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Erro ao listar análises: %s", e)
+        raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao listar as análises.")
+    items = [_stored_analysis(record) for record in records]
+    next_cursor = encode_cursor(records[-1]) if len(records) == max(1, min(limit, analysis_store.list_max_limit)) else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas no formato de texto do Prometheus."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/status")
+async def status_endpoint():
+    return {
+        "coalescing": {
+            search_flight.name: search_flight.get_stats(),
+            virustotal_flight.name: virustotal_flight.get_stats(),
+        },
+        "caches": {
+            search_cache.name: search_cache.get_stats(),
+            message_cache.entries.name: message_cache.get_stats(),
+        },
+        "llm_scheduler": llm_scheduler.get_stats(),
+        "circuit_breakers": get_breakers_status(),
+        "analysis_writer": analysis_writer.get_stats(),
+        "analysis_store": analysis_store.get_stats(),
+        "analysis_history": analysis_history.get_stats(),
+        "feedback": feedback_store.get_stats(),
+        "logging": get_logging_stats(),
+        "recent_scams_feed": recent_scams_feed.get_status(),
+        "virustotal_verdicts": verdict_store.get_stats(),
+        "blacklists": blacklist_registry.get_status(),
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
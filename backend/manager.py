@@ -1,4 +1,6 @@
+import os
 import re
+import time
 import asyncio
 import uuid
 import json
@@ -6,7 +8,37 @@ from message_analyzer import MessageAnalyzer
 from link_validator import LinkValidator
 from education_agent import EducationAgent
 from web_search import WebSearcher
-from utils import safe_print, save_analysis_result
+from recent_scams import recent_scams_feed
+from message_cache import message_cache
+from scam_rules import get_scam_rules
+from url_features import extract_url_features_batch
+from deadline import deadline_scope, ANALYSIS_DEADLINE
+from analysis_writer import analysis_writer
+from analysis_history import analysis_history
+from feedback_store import feedback_store
+from metrics import span, timed, timing_scope, get_timings, ANALYSES, ANALYSIS_ERRORS, FALLBACKS
+from utils import safe_print, log_stage, bind_analysis_id
+
+async def _ignore_event(event, data):
+    pass
+
+# Limite padrão de análises simultâneas em um lote
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# "tiered" decide localmente quando os sinais baratos são conclusivos; "full" sempre consulta IA e serviços externos
+DECISION_MODE = os.getenv("DECISION_MODE", "tiered")
+# Pontuação local (heurística ou links) a partir da qual a mensagem é considerada golpe sem etapas externas
+TIER_LOCAL_FRAUD_SCORE = int(os.getenv("TIER_LOCAL_FRAUD_SCORE", "8"))
+# Pontuação local até a qual uma mensagem sem links é considerada segura (-1 desativa)
+TIER_LOCAL_SAFE_SCORE = int(os.getenv("TIER_LOCAL_SAFE_SCORE", "-1"))
+
+def combine_risk_scores(message_risk, link_results):
+    """Pontuação final: a maior entre a mensagem e os links, com bônus se ambos tiverem algum risco."""
+    link_risk = max((res.get("risk_score", 0) for res in link_results), default=0)
+    final_risk_score = max(message_risk, link_risk)
+    if message_risk >= 3 and link_risk >= 3:
+        final_risk_score = min(final_risk_score + 1, 10)
+    return final_risk_score
 
 class AgentManager:
     def __init__(self):
@@ -14,80 +46,165 @@ class AgentManager:
         self.link_validator = LinkValidator()
         self.education_agent = EducationAgent()
         self.web_searcher = WebSearcher()
-        self.analysis_history = {}  # Armazena histórico de análises
+        self.recent_scams_feed = recent_scams_feed
+        self.message_cache = message_cache  # Vereditos de mensagens quase idênticas (campanhas)
+        self.scam_rules = get_scam_rules()
+        self.analysis_writer = analysis_writer  # Persistência em lote, fora do event loop
+        self.analysis_history = analysis_history  # Histórico das análises: recentes em memória, demais em disco
+        self.feedback_store = feedback_store  # Mensagens e links já rotulados pelas avaliações dos usuários
+    
+    async def process_user_query(self, query_data, link_cache=None, emit=None, deadline=ANALYSIS_DEADLINE):
+        """Analisa uma mensagem.
+
+        `link_cache` permite compartilhar a validação de links entre análises
+        (usado no processamento em lote): links repetidos aguardam a mesma tarefa.
+        `emit`, se informado, é uma corrotina `emit(evento, dados)` chamada com
+        os resultados parciais assim que cada etapa termina.
+        `deadline` é o prazo total da análise, em segundos: todas as etapas e
+        chamadas externas respeitam o tempo restante e, ao esgotá-lo, recorrem
+        aos seus fallbacks locais.
+        Com `include_timings` em `query_data`, a resposta inclui o tempo de
+        cada etapa e chamada externa (`timings`).
+        """
+        with deadline_scope(deadline), timing_scope(), span("analysis"):
+            return await self._run_analysis(query_data, link_cache, emit)
     
-    async def process_user_query(self, query_data):
+    async def _run_analysis(self, query_data, link_cache, emit):
+        emit = emit or _ignore_event
         try:
             message = query_data.get("message", "")
             user_id = query_data.get("user_id", "anonymous")
             device_info = query_data.get("device_info", {})
             
             analysis_id = str(uuid.uuid4())
-            safe_print(f"[{analysis_id}] Iniciando análise para usuário {user_id}")
+            bind_analysis_id(analysis_id)
+            log_stage("Iniciando análise para usuário %s", user_id)
 
-            # 1. Buscar informações gerais sobre golpes recentes
-            safe_print(f"[{analysis_id}] Buscando informações sobre golpes recentes")
-            recent_scams_search = asyncio.create_task(
-                self.web_searcher.search_async("golpes financeiros recentes Brasil")
-            )
-            
-            # 2. Analisar a mensagem
-            safe_print(f"[{analysis_id}] Analisando mensagem")
-            message_analysis_result = await self.message_analyzer.process({"message": message})
-            safe_print(f"[{analysis_id}] Análise de mensagem concluída")
-
-            # 3. Extrair e validar links
-            links_found = re.findall(r'(https?://[^\s]+)', message)
-            safe_print(f"[{analysis_id}] Encontrados {len(links_found)} links para validação")
+            # 1. Informações gerais sobre golpes recentes (snapshot atualizado em segundo plano)
+            recent_scams_info = self.recent_scams_feed.get_results()
             
-            link_analysis_results = []
+            # 2. Sinais locais (sem chamadas externas): heurística, blacklists e características dos links
+            with span("keywords"):
+                links_found = re.findall(r'(https?://[^\s]+)', message)
+                keyword_hits = self.scam_rules.scan(message)
+                heuristic_score = self.scam_rules.heuristic_score(keyword_hits)
+            local_link_results = []
+            url_features = None
             if links_found:
-                link_analysis_results = await asyncio.gather(
-                    *(self.link_validator.process({"link": link}) for link in links_found)
+                url_features = extract_url_features_batch(links_found)
+                local_link_results = await self._validate_links(
+                    links_found, link_cache, local_only=True, url_features=url_features
                 )
-                safe_print(f"[{analysis_id}] Validação de links concluída")
+            await emit("heuristic", {
+                "analysis_id": analysis_id,
+                "heuristic_score": heuristic_score,
+                "links_found": len(links_found),
+                "blacklist_hits": [
+                    dict(res["blacklist_match"], link=link)
+                    for link, res in zip(links_found, local_link_results)
+                    if res.get("blacklist_match")
+                ],
+            })
+            
+            # Mensagens (ou links) já confirmados pelas avaliações dos usuários dispensam as etapas externas
+            known_label = self.feedback_store.lookup(message, links_found)
+            if known_label:
+                decision_tier = "feedback"
+            else:
+                decision_tier = self._decision_tier(heuristic_score, links_found, local_link_results)
+            log_stage("Decisão pela camada %s (heurística: %s)", decision_tier, heuristic_score)
             
-            # 4. Esperar resultado da busca de golpes recentes
-            recent_scams_info = await recent_scams_search
-            safe_print(f"[{analysis_id}] Busca de golpes recentes concluída")
+            # 3. Analisar a mensagem e validar os links em paralelo (apenas se os sinais locais não bastarem)
+            cached_analysis, similarity = None, 0.0
+            if decision_tier == "full":
+                cached_analysis, similarity = self.message_cache.get(message)
+                if cached_analysis is not None:
+                    log_stage("Veredito da mensagem obtido do cache (similaridade: %s)", similarity)
+            
+            message_task = None
+            if decision_tier == "full" and cached_analysis is None:
+                log_stage("Analisando mensagem")
+                message_task = asyncio.create_task(
+                    timed("message_analysis", self.message_analyzer.process({"message": message}))
+                )
             
-            # 5. Calcular pontuação de risco final
+            log_stage("Encontrados %s links para validação", len(links_found))
+            link_analysis_results = local_link_results
+            try:
+                if links_found and decision_tier == "full":
+                    link_analysis_results = await self._validate_links(
+                        links_found, link_cache, url_features=url_features
+                    )
+                    log_stage("Validação de links concluída")
+                await emit("links", {
+                    "analysis_id": analysis_id,
+                    "links": [
+                        dict(link=link, risk_score=res.get("risk_score", 0), is_fraud=res.get("is_fraud", False),
+                             analysis=res.get("analysis", ""))
+                        for link, res in zip(links_found, link_analysis_results)
+                    ],
+                })
+            except BaseException:
+                if message_task:
+                    message_task.cancel()
+                raise
+            
+            if message_task is not None:
+                message_analysis_result = await message_task
+                if message_analysis_result.get("source") == "llm":
+                    self.message_cache.put(message, message_analysis_result)
+                else:
+                    FALLBACKS.inc(stage="message_analysis")
+            elif cached_analysis is not None:
+                message_analysis_result = dict(cached_analysis)
+            elif known_label:
+                message_analysis_result = self.message_analyzer.feedback_result(known_label)
+            else:
+                # O veredito local pode vir dos links (blacklist, características do URL):
+                # o texto segue a pontuação combinada e inclui os achados dos links
+                message_analysis_result = self.message_analyzer.local_result(
+                    message, keyword_hits, link_analysis_results,
+                    combine_risk_scores(heuristic_score, link_analysis_results),
+                )
+            from_cache = cached_analysis is not None
+            log_stage("Análise de mensagem concluída")
+            await emit("analysis", {
+                "analysis_id": analysis_id,
+                "risk_score": message_analysis_result.get("risk_score", 0),
+                "explanation": message_analysis_result.get("explanation", ""),
+                "recommendations": message_analysis_result.get("recommendations", []),
+                "decision_tier": decision_tier,
+                "from_cache": from_cache,
+            })
+            
+            # 4. Calcular pontuação de risco final
             # Pontuação da mensagem
             message_risk = message_analysis_result.get("risk_score", 0)
             
-            # Pontuação máxima dos links
-            link_risk = max((res.get("risk_score", 0) for res in link_analysis_results), default=0)
-            
-            # Combinar pontuações (priorizar a maior, mas considerar ambas)
-            final_risk_score = max(message_risk, link_risk)
-            if message_risk >= 3 and link_risk >= 3:
-                # Adicionar bônus se ambos tiverem algum risco
-                final_risk_score = min(final_risk_score + 1, 10)
+            # Combinar com a pontuação máxima dos links (priorizar a maior, mas considerar ambas)
+            final_risk_score = combine_risk_scores(message_risk, link_analysis_results)
             
             final_is_fraud = final_risk_score >= 5
-            safe_print(f"[{analysis_id}] Pontuação final: {final_risk_score}/10 (Fraude: {final_is_fraud})")
+            log_stage("Pontuação final: %s/10 (Fraude: %s)", final_risk_score, final_is_fraud)
             
-            # 6. Obter conteúdo educativo se for fraude ou risco médio
+            # 5. Obter conteúdo educativo se for fraude ou risco médio
             education_result = {
                 "educational_text": "",
                 "tips": []
             }
             
-            if final_risk_score >= 3:  # Gerar conteúdo educativo para risco médio ou alto
-                scam_type = "golpes financeiros"
-                
-                # Determinar tipo de golpe com base na análise
-                if "pix" in message.lower():
-                    scam_type += " com pix"
-                elif "banco" in message.lower() or "cartão" in message.lower() or "motoboy" in message.lower():
-                    scam_type += " bancários"
-                elif "prêmio" in message.lower() or "sorteio" in message.lower():
-                    scam_type += " de falsos prêmios"
-                elif "familiar" in message.lower() or "filho" in message.lower() or "filha" in message.lower() or "urgente" in message.lower() or "dinheiro" in message.lower():
-                    scam_type += " do falso familiar"
+            if final_risk_score >= 3 and decision_tier == "feedback":
+                # Mensagens já rotuladas pelos usuários não passam pelo agente de educação
+                scam_type = self.scam_rules.scam_type(keyword_hits)
+                education_result = self._default_education(scam_type)
+            elif final_risk_score >= 3:  # Gerar conteúdo educativo para risco médio ou alto
+                # Determinar tipo de golpe com base nas regras de data/scam_rules.json
+                scam_type = self.scam_rules.scam_type(keyword_hits)
                 
                 try:
-                    edu_result = await self.education_agent.process({"analysis_summary": scam_type})
+                    edu_result = await timed(
+                        "education", self.education_agent.process({"analysis_summary": scam_type})
+                    )
                     
                     # Garantir que education_result seja um dicionário
                     if isinstance(edu_result, dict):
@@ -103,22 +220,22 @@ class AgentManager:
                             ]
                         }
                     
-                    safe_print(f"[{analysis_id}] Conteúdo educativo gerado")
+                    log_stage("Conteúdo educativo gerado")
                 except Exception as e:
                     safe_print(f"Erro ao gerar conteúdo educativo: {e}")
+                    FALLBACKS.inc(stage="education")
                     # Fornecer conteúdo padrão em caso de erro
-                    education_result = {
-                        "educational_text": f"Tenha cuidado com {scam_type}. Sempre verifique a identidade de quem entra em contato com você.",
-                        "tips": [
-                            "Nunca compartilhe senhas ou códigos",
-                            "Desconfie de solicitações urgentes",
-                            "Entre em contato com a instituição pelos canais oficiais para confirmar"
-                        ]
-                    }
-            
-            # 7. Combinar links educativos de todas as fontes
+                    education_result = self._default_education(scam_type)
+            
+            await emit("education", {
+                "analysis_id": analysis_id,
+                "educational_text": education_result.get("educational_text", ""),
+                "tips": education_result.get("tips", []),
+            })
+            
+            # 6. Combinar links educativos de todas as fontes
             # Do analisador de mensagens
-            education_links = message_analysis_result.get("education_links", [])
+            education_links = list(message_analysis_result.get("education_links", []))
             
             # Da busca web recente
             for result in recent_scams_info[:2]:
@@ -139,7 +256,7 @@ class AgentManager:
             # Limitar a 5 links
             unique_education_links = unique_education_links[:5]
             
-            # 8. Criar resposta final
+            # 7. Criar resposta final
             response = {
                 "analysis_id": analysis_id,
                 "is_fraud": final_is_fraud,
@@ -148,25 +265,41 @@ class AgentManager:
                 "recommendations": message_analysis_result.get("recommendations", []),
                 "education_links": unique_education_links,
                 "educational_text": education_result.get("educational_text", ""),
-                "education_tips": education_result.get("tips", [])
+                "education_tips": education_result.get("tips", []),
+                "decision_tier": decision_tier,
+                "from_cache": from_cache
             }
             
-            # 9. Salvar resultado para referência futura
-            self.analysis_history[analysis_id] = {
+            # 8. Salvar resultado para referência futura
+            details = {
                 "query": query_data,
-                "result": response,
                 "message_analysis": message_analysis_result,
                 "link_analyses": link_analysis_results
             }
+            with span("persistence"):
+                self.analysis_history.add(analysis_id, dict(details, result=response))
+                
+                self.analysis_writer.submit({
+                    "analysis_id": analysis_id,
+                    "created_at": time.time(),
+                    "user_id": user_id,
+                    "result": response,
+                    "details": details,
+                })
+            log_stage("Análise concluída e enviada para gravação")
+            ANALYSES.inc(tier=decision_tier, is_fraud=str(final_is_fraud).lower())
             
-            save_analysis_result(response)
-            safe_print(f"[{analysis_id}] Análise concluída e salva")
+            if query_data.get("include_timings"):
+                # Após a gravação: os tempos não fazem parte do resultado persistido
+                response = dict(response, timings=get_timings())
             
+            await emit("result", response)
             return response
 
         except Exception as e:
             safe_print(f"Erro no AgentManager: {e}")
-            return {
+            ANALYSIS_ERRORS.inc()
+            response = {
                 "analysis_id": "erro",
                 "is_fraud": False,
                 "confidence": 0.0,
@@ -175,4 +308,150 @@ class AgentManager:
                 "education_links": [],
                 "educational_text": "Erro ao gerar conteúdo educativo.",
                 "education_tips": []
-            }
\ No newline at end of file
+            }
+            await emit("error", response)
+            return response
+    
+    async def stream_user_query(self, query_data):
+        """Gera (evento, dados) conforme cada etapa da análise termina.
+
+        Os eventos seguem a ordem: `heuristic` (pontuação heurística e
+        blacklists), `links`, `analysis` (explicação da IA), `education` e, por
+        fim, `result` com a resposta completa (ou `error`).
+        """
+        queue = asyncio.Queue()
+        
+        async def emit(event, data):
+            await queue.put((event, data))
+        
+        async def run():
+            try:
+                await self.process_user_query(query_data, emit=emit)
+            finally:
+                await queue.put(None)
+        
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            # Cliente desconectado: interromper a análise em andamento
+            if not task.done():
+                task.cancel()
+    
+    def _default_education(self, scam_type):
+        """Conteúdo educativo padrão, sem chamar o agente de educação."""
+        return {
+            "educational_text": f"Tenha cuidado com {scam_type}. Sempre verifique a identidade de quem entra em contato com você.",
+            "tips": [
+                "Nunca compartilhe senhas ou códigos",
+                "Desconfie de solicitações urgentes",
+                "Entre em contato com a instituição pelos canais oficiais para confirmar"
+            ]
+        }
+    
+    def _decision_tier(self, heuristic_score, links, local_link_results):
+        """Camada que decide a análise: "local" se os sinais baratos bastam, senão "full".
+
+        Uma mensagem é decidida localmente como golpe quando algum link está
+        em blacklist ou quando a heurística ou um link atinge
+        `TIER_LOCAL_FRAUD_SCORE`; e como segura quando não há links e a
+        heurística não passa de `TIER_LOCAL_SAFE_SCORE`.
+        """
+        if DECISION_MODE != "tiered":
+            return "full"
+        link_risk = max((res.get("risk_score", 0) for res in local_link_results), default=0)
+        if any(res.get("blacklist_match") for res in local_link_results):
+            return "local"
+        if max(heuristic_score, link_risk) >= TIER_LOCAL_FRAUD_SCORE:
+            return "local"
+        if not links and heuristic_score <= TIER_LOCAL_SAFE_SCORE:
+            return "local"
+        return "full"
+    
+    async def _validate_links(self, links, link_cache=None, local_only=False, url_features=None):
+        """Valida os links em paralelo, reaproveitando validações do `link_cache`.
+
+        Com `local_only`, faz apenas as verificações locais de cada link.
+        `url_features` (na ordem de `links`) reaproveita as características
+        já extraídas, para que a validação completa não as recalcule.
+        """
+        if link_cache is None:
+            link_cache = {}
+        if url_features is None:
+            url_features = extract_url_features_batch(links)
+        tasks = []
+        for link, features in zip(links, url_features):
+            task = link_cache.get((link, local_only))
+            if task is None:
+                task = asyncio.ensure_future(
+                    self.link_validator.process({"link": link, "url_features": features, "local_only": local_only})
+                )
+                link_cache[(link, local_only)] = task
+            tasks.append(task)
+        # Cada análise mede o tempo que aguardou a validação, ainda que iniciada por outra análise do lote;
+        # shield: o cancelamento de uma análise não interrompe a validação compartilhada
+        stage = "local_link_validation" if local_only else "link_validation"
+        return list(await asyncio.gather(*(timed(stage, asyncio.shield(task)) for task in tasks)))
+    
+    async def process_batch(self, queries, concurrency=None):
+        """Analisa um lote de mensagens com concorrência limitada.
+
+        Mensagens idênticas do mesmo usuário são analisadas uma única vez e
+        links repetidos são validados uma única vez em todo o lote. Retorna um item por consulta,
+        na ordem recebida, com o resultado ou o erro correspondente.
+        """
+        concurrency = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+        semaphore = asyncio.Semaphore(concurrency)
+        link_cache = {}
+        
+        # Agrupar consultas pelo usuário e pela mensagem (ignorando espaços nas bordas):
+        # cada análise é gravada em nome de um usuário, então usuários diferentes
+        # recebem análises próprias mesmo para a mesma mensagem
+        def dedupe_key(query):
+            return query.get("user_id", "anonymous"), query.get("message", "").strip()
+        
+        first_index = {}
+        for index, query in enumerate(queries):
+            first_index.setdefault(dedupe_key(query), index)
+        
+        async def run(index):
+            async with semaphore:
+                return await self.process_user_query(queries[index], link_cache=link_cache)
+        
+        unique_indexes = sorted(set(first_index.values()))
+        outcomes = await asyncio.gather(*(run(index) for index in unique_indexes), return_exceptions=True)
+        results_by_index = dict(zip(unique_indexes, outcomes))
+        
+        items = []
+        for index, query in enumerate(queries):
+            source = first_index[dedupe_key(query)]
+            outcome = results_by_index[source]
+            item = {
+                "index": index,
+                "result": None,
+                "error": None,
+                "duplicate_of": source if source != index else None,
+            }
+            if isinstance(outcome, Exception):
+                item["error"] = str(outcome) or outcome.__class__.__name__
+            elif outcome.get("analysis_id") == "erro":
+                item["error"] = outcome.get("explanation", "Erro ao processar a consulta.")
+            else:
+                item["result"] = outcome
+            items.append(item)
+        
+        unique_links = len({link for link, _ in link_cache})
+        safe_print(
+            "Lote processado: %s itens, %s mensagens únicas, %s links únicos",
+            len(queries), len(unique_indexes), unique_links,
+        )
+        return {
+            "results": items,
+            "total": len(queries),
+            "unique_messages": len(unique_indexes),
+            "unique_links": unique_links,
+        }
@@ -1,14 +1,91 @@
-import re
 import json
-import asyncio
 from google.generativeai import GenerativeModel
 from utils import safe_print
 from web_search import WebSearcher
+from scam_rules import get_scam_rules, HEURISTIC_PREFIX
+from llm_scheduler import llm_scheduler, PRIORITY_INTERACTIVE
+
+DEFAULT_EDUCATION_LINKS = [
+    {
+        "title": "Febraban - Cartilha de Segurança",
+        "url": "https://portal.febraban.org.br/pagina/3055/33/pt-br/cartilha"
+    },
+    {
+        "title": "Banco Central - Golpes Financeiros",
+        "url": "https://www.bcb.gov.br/estabilidadefinanceira/golpesefinanciamentos"
+    }
+]
+
+# Esquema da resposta estruturada da análise (subconjunto OpenAPI aceito pelo Gemini)
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "keywords": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "analysis": {"type": "STRING"},
+        "risk_score": {"type": "INTEGER"},
+        "explanation": {"type": "STRING"},
+        "recommendations": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["keywords", "analysis", "risk_score", "explanation", "recommendations"],
+}
+
+ANALYSIS_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": ANALYSIS_RESPONSE_SCHEMA,
+}
+
+MAX_KEYWORDS = 5
+
+
+def _string_list(data, field):
+    value = data[field]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Campo '{field}' deve ser uma lista de textos")
+    return [item.strip() for item in value if item.strip()]
+
+
+def parse_analysis_response(text):
+    """Valida a resposta JSON da análise e a normaliza.
+
+    Levanta ValueError se a resposta não for um objeto JSON com todos os
+    campos do esquema nos tipos esperados ou se a pontuação estiver fora do
+    intervalo de 0 a 10.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Resposta da análise não é um JSON válido: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Resposta da análise deve ser um objeto JSON")
+    missing = [field for field in ANALYSIS_RESPONSE_SCHEMA["required"] if field not in data]
+    if missing:
+        raise ValueError(f"Campos ausentes na resposta da análise: {', '.join(missing)}")
+
+    risk_score = data["risk_score"]
+    if isinstance(risk_score, float) and risk_score.is_integer():
+        risk_score = int(risk_score)
+    if isinstance(risk_score, bool) or not isinstance(risk_score, int) or not 0 <= risk_score <= 10:
+        raise ValueError(f"Pontuação de risco inválida: {data['risk_score']!r}")
+
+    for field in ("analysis", "explanation"):
+        if not isinstance(data[field], str) or not data[field].strip():
+            raise ValueError(f"Campo '{field}' deve ser um texto não vazio")
+
+    return {
+        "keywords": _string_list(data, "keywords")[:MAX_KEYWORDS],
+        "analysis": data["analysis"].strip(),
+        "risk_score": risk_score,
+        "explanation": data["explanation"].strip(),
+        "recommendations": _string_list(data, "recommendations"),
+    }
+
 
 class MessageAnalyzer:
     def __init__(self, model_name="gemini-2.0-flash"):  # Modelo atualizado
         self.model = GenerativeModel(model_name)
+        self.llm_scheduler = llm_scheduler
         self.web_searcher = WebSearcher()
+        self.scam_rules = get_scam_rules()
 
     async def process(self, input_data):
         try:
@@ -22,23 +99,7 @@ class MessageAnalyzer:
                     "education_links": []
                 }
 
-            # Extrair palavras-chave para busca
-            try:
-                keywords = await self._extract_keywords(message)
-                safe_print("Palavras-chave extraídas: %s", keywords)
-            except Exception as e:
-                safe_print("Erro ao extrair palavras-chave: %s", e)
-                keywords = []
-            
-            # Iniciar busca na web se temos palavras-chave
-            search_task = None
-            if keywords:
-                search_query = " ".join(keywords[:3]) + " golpe fraude"
-                search_task = asyncio.create_task(
-                    self.web_searcher.search_async(search_query)
-                )
-            
-            # Analisar a mensagem com a IA
+            # Analisar a mensagem com a IA: uma única chamada com saída estruturada (JSON)
             prompt = f"""
             Você é um agente especializado em detectar golpes financeiros em mensagens de texto.
             Analise a seguinte mensagem e determine se ela apresenta características
@@ -57,24 +118,20 @@ class MessageAnalyzer:
             6. **Ofertas irrealistas ou muito vantajosas:** Promete prêmios, descontos enormes, ou dinheiro fácil sem motivo claro?
             7. **Tom da mensagem:** É excessivamente informal, ameaçador, ou tenta criar pânico?
 
-            Com base na sua análise, forneça:
-            - Uma **análise detalhada** dos elementos suspeitos encontrados, citando trechos da mensagem se aplicável.
-            - Uma **pontuação de risco** de 0 a 10 (0. Sem risco aparente, 10. Risco altíssimo de golpe). Inclua apenas o número.
-            - Uma **explicação clara e simples** para um usuário leigo sobre por que a mensagem é ou não suspeita.
-            - **Recomendações específicas** sobre o que o usuário deve fazer (ex: não clicar em links, não responder, não fornecer dados, entrar em contato direto com a instituição pelo canal oficial). 
-
-            Formato da resposta:
-            ANÁLISE DETALHADA: ...
-            PONTUAÇÃO DE RISCO: [0-10]
-            EXPLICAÇÃO PARA O USUÁRIO: ...
-            RECOMENDAÇÕES:
-            - Recomendação 1
-            - Recomendação 2
+            Responda em JSON com os campos:
+            - "keywords": as 3-5 palavras-chave mais relevantes para pesquisar o possível golpe.
+            - "analysis": uma análise detalhada dos elementos suspeitos encontrados, citando trechos da mensagem se aplicável.
+            - "risk_score": pontuação de risco de 0 a 10 (0. Sem risco aparente, 10. Risco altíssimo de golpe).
+            - "explanation": uma explicação clara e simples para um usuário leigo sobre por que a mensagem é ou não suspeita.
+            - "recommendations": recomendações específicas sobre o que o usuário deve fazer (ex: não clicar em links, não responder, não fornecer dados, entrar em contato direto com a instituição pelo canal oficial).
             """
 
             try:
-                response = await self.model.generate_content_async(prompt)
-                response_text = response.text
+                response = await self.llm_scheduler.generate(
+                    self.model, prompt, priority=PRIORITY_INTERACTIVE,
+                    generation_config=ANALYSIS_GENERATION_CONFIG,
+                )
+                result = parse_analysis_response(response.text)
             except Exception as e:
                 safe_print(f"Erro na geração de conteúdo: {e}")
                 # Fornecer análise padrão baseada em heurísticas simples
@@ -88,108 +145,45 @@ class MessageAnalyzer:
                         "Contate diretamente sua instituição bancária pelos canais oficiais para verificar",
                         "Não clique em links recebidos por mensagem"
                     ],
-                    "education_links": []
+                    "education_links": [],
+                    "source": "heuristic"
                 }
             
-            # Processar o texto de resposta
-            analysis_detail = "Detalhes da análise não disponíveis."
-            risk_score = 0
-            explanation = ""
-            recommendations = ["Recomendação não disponível."]
+            keywords = result["keywords"]
+            safe_print("Palavras-chave extraídas: %s", keywords)
             
-            # Esperar por resultados da busca na web
+            # Buscar na web materiais sobre o golpe a partir das palavras-chave
             search_results = []
-            if search_task:
+            if keywords:
+                search_query = " ".join(keywords[:3]) + " golpe fraude"
                 try:
-                    search_results = await search_task
+                    search_results = await self.web_searcher.search_async(search_query)
                 except Exception as e:
                     safe_print(f"Erro na busca web: {e}")
             
-            # Extrair seções da resposta
-            sections = re.split(r'(ANÁLISE DETALHADA:|PONTUAÇÃO DE RISCO:|EXPLICAÇÃO PARA O USUÁRIO:|RECOMENDAÇÕES:)', response_text)
-            section_map = {}
-            current_section = None
-            for item in sections:
-                if item.strip() in ['ANÁLISE DETALHADA:', 'PONTUAÇÃO DE RISCO:', 'EXPLICAÇÃO PARA O USUÁRIO:', 'RECOMENDAÇÕES:']:
-                    current_section = item.strip()
-                    section_map[current_section] = ""
-                elif current_section is not None:
-                    section_map[current_section] += item
-
-            analysis_detail = section_map.get('ANÁLISE DETALHADA:', analysis_detail).strip()
-            score_text = section_map.get('PONTUAÇÃO DE RISCO:', '0').strip()
-            try:
-                score_match = re.search(r'\d+', score_text)
-                risk_score = int(score_match.group(0)) if score_match else 0
-                risk_score = max(0, min(10, risk_score))
-            except (ValueError, AttributeError):
-                # Se não conseguir extrair a pontuação, usar análise heurística
-                risk_score = self._heuristic_analysis(message)
-
-            explanation = section_map.get('EXPLICAÇÃO PARA O USUÁRIO:', "").strip()
-            if not explanation:
-                # Gerar explicação baseada na pontuação
-                if risk_score >= 7:
-                    explanation = "Esta mensagem apresenta fortes indícios de ser um golpe. Tenha muito cuidado."
-                elif risk_score >= 4:
-                    explanation = "Esta mensagem contém elementos suspeitos que podem indicar uma tentativa de golpe."
-                else:
-                    explanation = "Esta mensagem não apresenta sinais claros de golpe, mas sempre mantenha atenção."
-                
-            rec_text = section_map.get('RECOMENDAÇÕES:', '').strip()
-            recommendations = [item.strip('- ').strip() for item in rec_text.split('\n') if item.strip().startswith('- ')]
-            if not recommendations and rec_text:
-                recommendations = [rec_text]
-            
-            # Se ainda não tivermos recomendações, criar algumas genéricas
-            if not recommendations or recommendations == ["Recomendação não disponível."]:
-                if risk_score >= 7:
-                    recommendations = [
-                        "Não responda à mensagem",
-                        "Não compartilhe dados pessoais ou bancários",
-                        "Bloqueie o remetente",
-                        "Reporte a tentativa de golpe às autoridades"
-                    ]
-                elif risk_score >= 4:
-                    recommendations = [
-                        "Verifique a autenticidade da solicitação por canais oficiais",
-                        "Não compartilhe dados sensíveis",
-                        "Entre em contato diretamente com a instituição mencionada"
-                    ]
-                else:
-                    recommendations = [
-                        "Mantenha-se vigilante com comunicações não solicitadas",
-                        "Verifique sempre a identidade do remetente"
-                    ]
+            risk_score = result["risk_score"]
             
             # Criar links educativos usando resultados da busca
             education_links = []
-            for result in search_results[:3]:
+            for search_result in search_results[:3]:
                 education_links.append({
-                    "title": result.get("title", "Informação sobre golpes"),
-                    "url": result.get("link", "https://www.gov.br/pt-br")
+                    "title": search_result.get("title", "Informação sobre golpes"),
+                    "url": search_result.get("link", "https://www.gov.br/pt-br")
                 })
             
             # Adicionar links padrão se não tiver resultados
             if not education_links:
-                education_links = [
-                    {
-                        "title": "Febraban - Cartilha de Segurança",
-                        "url": "https://portal.febraban.org.br/pagina/3055/33/pt-br/cartilha"
-                    },
-                    {
-                        "title": "Banco Central - Golpes Financeiros",
-                        "url": "https://www.bcb.gov.br/estabilidadefinanceira/golpesefinanciamentos"
-                    }
-                ]
+                education_links = [dict(link) for link in DEFAULT_EDUCATION_LINKS]
 
             return {
-                "analysis": analysis_detail,
+                "analysis": result["analysis"],
                 "risk_score": risk_score,
-                "explanation": explanation,
-                "recommendations": recommendations,
+                "explanation": result["explanation"],
+                "recommendations": result["recommendations"] or self._default_recommendations(risk_score),
+                "keywords": keywords,
                 "education_links": education_links,
-                "web_search_results": search_results[:3] if search_results else []
+                "web_search_results": search_results[:3] if search_results else [],
+                "source": "llm"
             }
 
         except Exception as e:
@@ -202,91 +196,97 @@ class MessageAnalyzer:
                 "education_links": []
             }
     
-    def _heuristic_analysis(self, message):
-        """Análise heurística simples baseada em palavras-chave e padrões."""
-        message_lower = message.lower()
-        
-        # Pontuação inicial
-        score = 0
-        
-        # Sinais de urgência
-        urgency_words = ["urgente", "imediato", "agora", "rápido", "emergência", "imediatamente"]
-        for word in urgency_words:
-            if word in message_lower:
-                score += 2
-                break
-        
-        # Menções a bancos/cartões
-        bank_words = ["banco", "cartão", "senha", "pix", "transferência", "código", "atualização", "cadastro"]
-        for word in bank_words:
-            if word in message_lower:
-                score += 1
-        
-        # Menções a dinheiro
-        money_words = ["dinheiro", "reais", "r$", "pagamento", "transferir", "depósito"]
-        for word in money_words:
-            if word in message_lower:
-                score += 1
-        
-        # Golpe do familiar
-        family_words = ["filho", "filha", "mãe", "pai", "número novo", "mudei de número", "celular novo"]
-        for word in family_words:
-            if word in message_lower:
-                score += 3
-                break
-        
-        # Golpe do motoboy
-        if "motoboy" in message_lower and ("cartão" in message_lower or "buscar" in message_lower):
-            score += 4
-        
-        # Golpe de prêmios
-        prize_words = ["prêmio", "sorteio", "ganhou", "contemplado", "promoção"]
-        for word in prize_words:
-            if word in message_lower:
-                score += 3
-                break
-        
-        return min(score, 10)  # Limitar a 10
-    
-    async def _extract_keywords(self, text):
-        """Extrai palavras-chave relevantes para pesquisa."""
-        try:
-            # Usar o modelo para extrair palavras-chave
-            prompt = f"""
-            Extraia as 3-5 palavras-chave mais relevantes para identificar possíveis golpes no seguinte texto:
-            
-            "{text}"
-            
-            Formate sua resposta apenas como uma lista JSON de palavras-chave, sem comentários adicionais.
-            Exemplo: ["banco", "atualização", "urgente"]
-            """
-            
-            response = await self.model.generate_content_async(prompt)
-            response_text = response.text.strip()
-            
-            # Tentar extrair JSON da resposta
-            json_pattern = re.search(r'$$.*$$', response_text)
-            if json_pattern:
-                try:
-                    keywords = json.loads(json_pattern.group(0))
-                    return keywords
-                except json.JSONDecodeError:
-                    pass
-            
-            # Fallback: extrair palavras mais comuns
-            words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-            # Filtrar palavras comuns que não são úteis
-            stopwords = ["para", "como", "esse", "esta", "isso", "aqui", "voce", "você", "esta", "está", "muito"]
-            filtered_words = [w for w in words if w not in stopwords]
-            # Contar frequência
-            word_freq = {}
-            for word in filtered_words:
-                word_freq[word] = word_freq.get(word, 0) + 1
-            
-            # Obter as 5 palavras mais frequentes
-            sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-            return [word for word, _ in sorted_words[:5]]
-            
-        except Exception as e:
-            safe_print(f"Erro ao extrair palavras-chave: {e}")
-            return []
\ No newline at end of file
+    def local_result(self, message, hits=None, link_results=(), final_risk_score=None):
+        """Resultado no mesmo formato de `process`, calculado só com a heurística.
+
+        Usado quando os sinais locais já decidem a análise e as etapas caras
+        (IA e busca na web) não são executadas. `risk_score` é o da
+        heurística; a explicação e as recomendações seguem
+        `final_risk_score` (a pontuação combinada com os links, se
+        informada) e incluem os achados das validações locais dos links em
+        `link_results`.
+        """
+        if hits is None:
+            hits = self.scam_rules.scan(message)
+        risk_score = self._heuristic_analysis(message, hits)
+        if final_risk_score is None:
+            final_risk_score = risk_score
+        groups = sorted({
+            category[len(HEURISTIC_PREFIX):] for category in hits if category.startswith(HEURISTIC_PREFIX)
+        })
+        analysis = "Análise local por palavras-chave"
+        if groups:
+            analysis += f" (sinais encontrados: {', '.join(groups)})"
+        explanation = [self._default_explanation(final_risk_score)]
+        recommendations = []
+        for res in link_results:
+            if res.get("risk_score", 0) > 0:
+                explanation.append(res.get("analysis", "").strip())
+                recommendations.extend(res.get("recommendations", []))
+        recommendations.extend(self._default_recommendations(final_risk_score))
+        return {
+            "analysis": analysis + ".",
+            "risk_score": risk_score,
+            "explanation": " ".join(part for part in explanation if part),
+            "recommendations": list(dict.fromkeys(recommendations)),
+            "education_links": [dict(link) for link in DEFAULT_EDUCATION_LINKS],
+            "web_search_results": [],
+            "source": "heuristic"
+        }
+
+    def feedback_result(self, known):
+        """Resultado no mesmo formato de `process` para uma mensagem já confirmada como golpe pelos usuários.
+
+        `known` é o retorno de `FeedbackStore.lookup`.
+        """
+        confirmations = known["confirmations"]
+        risk_score = 9
+        if known["matched"] == "url":
+            explanation = f"Esta mensagem contém um link já confirmado como golpe por {confirmations} avaliações de usuários."
+        else:
+            explanation = f"Esta mensagem já foi confirmada como golpe por {confirmations} avaliações de usuários."
+        return {
+            "analysis": f"Rótulo confirmado por avaliações de usuários ({known['matched']}).",
+            "risk_score": risk_score,
+            "explanation": explanation,
+            "recommendations": self._default_recommendations(risk_score),
+            "education_links": [dict(link) for link in DEFAULT_EDUCATION_LINKS],
+            "web_search_results": [],
+            "source": "feedback"
+        }
+
+    def _default_explanation(self, risk_score):
+        if risk_score >= 7:
+            return "Esta mensagem apresenta fortes indícios de ser um golpe. Tenha muito cuidado."
+        if risk_score >= 4:
+            return "Esta mensagem contém elementos suspeitos que podem indicar uma tentativa de golpe."
+        return "Esta mensagem não apresenta sinais claros de golpe, mas sempre mantenha atenção."
+
+    def _default_recommendations(self, risk_score):
+        if risk_score >= 7:
+            return [
+                "Não responda à mensagem",
+                "Não compartilhe dados pessoais ou bancários",
+                "Bloqueie o remetente",
+                "Reporte a tentativa de golpe às autoridades"
+            ]
+        if risk_score >= 4:
+            return [
+                "Verifique a autenticidade da solicitação por canais oficiais",
+                "Não compartilhe dados sensíveis",
+                "Entre em contato diretamente com a instituição mencionada"
+            ]
+        return [
+            "Mantenha-se vigilante com comunicações não solicitadas",
+            "Verifique sempre a identidade do remetente"
+        ]
+
+    def _heuristic_analysis(self, message, hits=None):
+        """Análise heurística simples baseada em palavras-chave e padrões.
+
+        As listas de palavras ficam em `data/scam_rules.json` e são buscadas em
+        uma única passada; `hits` permite reaproveitar uma varredura já feita.
+        """
+        if hits is None:
+            hits = self.scam_rules.scan(message)
+        return self.scam_rules.heuristic_score(hits)
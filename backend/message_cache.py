@@ -0,0 +1,236 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from cache import TTLCache
+from scam_rules import get_scam_rules
+from utils import extract_domain
+
+MESSAGE_CACHE_TTL = int(os.getenv("MESSAGE_CACHE_TTL", str(6 * 3600)))
+MESSAGE_CACHE_MAX_ENTRIES = int(os.getenv("MESSAGE_CACHE_MAX_ENTRIES", "10000"))
+# Distância de Hamming máxima (em 64 bits) entre SimHashes para considerar duas mensagens quase idênticas
+MESSAGE_CACHE_MAX_DISTANCE = int(os.getenv("MESSAGE_CACHE_MAX_DISTANCE", "4"))
+# Mensagens com menos termos só reaproveitam vereditos de cópias exatas (após a normalização)
+MESSAGE_CACHE_MIN_TOKENS = int(os.getenv("MESSAGE_CACHE_MIN_TOKENS", "6"))
+
+SIMHASH_BITS = 64
+
+# Entidades que variam entre cópias de uma mesma campanha, na ordem de aplicação
+# Só o cumprimento ignora maiúsculas: o nome são até 3 palavras iniciadas por maiúscula
+GREETING_PATTERN = re.compile(
+    r"\b((?i:ol[aá]|oi|prezad[oa]|car[oa]|sr\.?|sra\.?|senhora?))[ ,]+([A-ZÀ-Ý][\wÀ-ÿ]+(?: [A-ZÀ-Ý][\wÀ-ÿ]+){0,2})\b"
+)
+ENTITY_PATTERNS = [
+    ("url", re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)),
+    ("email", re.compile(r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b")),
+    ("valor", re.compile(r"r\$\s*\d[\d.,]*", re.IGNORECASE)),
+    ("telefone", re.compile(r"(?:\+?55\s?)?(?:\(\d{2}\)|\b\d{2})[\s.-]?9?\d{4}[\s.-]?\d{4}\b")),
+    ("num", re.compile(r"\d[\d.,/-]*")),
+]
+TOKEN_PATTERN = re.compile(r"<\w+>|\w+")
+# Campos de texto do resultado que podem citar trechos da mensagem original
+TEXT_FIELDS = ("analysis", "explanation", "recommendations")
+
+
+def normalize_message(message):
+    """Forma canônica da mensagem, com nomes, valores, telefones e URLs mascarados."""
+    text = GREETING_PATTERN.sub(lambda match: f"{match.group(1)} <nome>", message)
+    for label, pattern in ENTITY_PATTERNS:
+        text = pattern.sub(f" <{label}> ", text)
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(TOKEN_PATTERN.findall(text))
+
+
+def extract_entities(message):
+    """Trechos variáveis da mensagem (nomes, links, telefones...) -> rótulo da entidade."""
+    entities = {match.group(2): "nome" for match in GREETING_PATTERN.finditer(message)}
+    for label, pattern in ENTITY_PATTERNS:
+        for match in pattern.finditer(message):
+            value = match.group(0).rstrip(".,;:")
+            if label != "num" or len(re.sub(r"\D", "", value)) >= 4:
+                entities.setdefault(value, label)
+    return entities
+
+
+def scrub_result(message, result):
+    """Cópia do resultado com os trechos variáveis da mensagem mascarados.
+
+    Evita que a explicação gerada para uma pessoa (que pode citar seu nome,
+    telefone ou link) seja mostrada a quem recebeu outra cópia da campanha.
+    """
+    entities = sorted(extract_entities(message).items(), key=lambda item: -len(item[0]))
+
+    def scrub(text):
+        for value, label in entities:
+            text = text.replace(value, f"[{label}]")
+        return text
+
+    scrubbed = dict(result)
+    for field in TEXT_FIELDS:
+        value = result.get(field)
+        if isinstance(value, str):
+            scrubbed[field] = scrub(value)
+        elif isinstance(value, list):
+            scrubbed[field] = [scrub(item) if isinstance(item, str) else item for item in value]
+    return scrubbed
+
+
+def message_signature(message, scam_rules):
+    """O que precisa coincidir para reaproveitar um veredito quase idêntico.
+
+    Termos das regras de golpe encontrados, quantidade de cada tipo de
+    entidade e domínios dos links: uma palavra-chave de golpe ou um link
+    novo mudam o veredito mesmo com o texto quase igual.
+    """
+    hits = scam_rules.scan(message)
+    terms = frozenset((category, term) for category, found in hits.items() for term, _ in found)
+    labels = tuple(sorted(label for label in extract_entities(message).values() if label != "nome"))
+    hosts = frozenset(
+        extract_domain(url if "://" in url else f"http://{url}").lower()
+        for url in ENTITY_PATTERNS[0][1].findall(message)
+    )
+    return terms, labels, hosts
+
+
+def simhash(tokens):
+    """SimHash de 64 bits dos termos e pares de termos consecutivos."""
+    features = list(tokens) + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    bits = [
+        format(int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"), "064b")
+        for feature in features
+    ]
+    # Cada bit do resultado é 1 se a maioria das características tem o bit ligado
+    half = len(bits) / 2
+    fingerprint = 0
+    for column in zip(*bits):
+        fingerprint = fingerprint << 1 | (column.count("1") > half)
+    return fingerprint
+
+
+class MessageVerdictCache:
+    """Cache de vereditos de mensagens por impressão digital.
+
+    Mensagens de uma mesma campanha costumam diferir apenas em nomes,
+    valores, telefones e links. A chave exata é o hash da mensagem
+    normalizada (com essas entidades mascaradas); para as demais variações,
+    o SimHash da mensagem é dividido em `max_distance + 1` faixas indexadas:
+    duas impressões a até `max_distance` bits de distância têm ao menos uma
+    faixa idêntica, de modo que a busca examina apenas os candidatos que
+    compartilham alguma faixa. Um candidato próximo só é reaproveitado se a
+    assinatura da mensagem (`message_signature`) for a mesma.
+    """
+
+    def __init__(self, ttl=MESSAGE_CACHE_TTL, max_entries=MESSAGE_CACHE_MAX_ENTRIES,
+                 max_distance=MESSAGE_CACHE_MAX_DISTANCE, min_tokens=MESSAGE_CACHE_MIN_TOKENS,
+                 scam_rules=None):
+        self.max_distance = max(0, min(max_distance, 15))
+        self._scam_rules = scam_rules
+        self.min_tokens = min_tokens
+        self.bands = self.max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.bands
+        self.entries = TTLCache("message_verdicts", ttl, max_entries=max_entries, on_evict=self._unindex)
+        self._bands = {}  # (faixa, valor) -> {chave}
+        self._lock = threading.Lock()
+        self.stats = {
+            "exact_hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+        }
+
+    def fingerprint(self, message):
+        """(chave exata, SimHash ou None se a mensagem for curta demais)."""
+        normalized = normalize_message(message)
+        key = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+        tokens = normalized.split()
+        return key, simhash(tokens) if len(tokens) >= self.min_tokens else None
+
+    def signature(self, message):
+        if self._scam_rules is None:
+            self._scam_rules = get_scam_rules()
+        return message_signature(message, self._scam_rules)
+
+    def get(self, message):
+        """Retorna (resultado, similaridade) do veredito em cache, ou (None, 0.0)."""
+        key, fingerprint = self.fingerprint(message)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.stats["exact_hits"] += 1
+                return entry["result"], 1.0
+
+            if fingerprint is not None:
+                candidates = {}
+                for band in self._band_keys(fingerprint):
+                    for candidate_key, candidate in self._bands.get(band, {}).items():
+                        distance = bin(candidate ^ fingerprint).count("1")
+                        if distance <= self.max_distance:
+                            candidates[candidate_key] = distance
+                signature = self.signature(message) if candidates else None
+                for candidate_key, distance in sorted(candidates.items(), key=lambda item: item[1]):
+                    entry = self.entries.get(candidate_key)
+                    if entry is not None and entry["signature"] == signature:
+                        self.stats["near_hits"] += 1
+                        return entry["result"], round(1 - distance / SIMHASH_BITS, 4)
+
+            self.stats["misses"] += 1
+            return None, 0.0
+
+    def put(self, message, result):
+        """Armazena o resultado da análise, com os trechos variáveis da mensagem mascarados."""
+        key, fingerprint = self.fingerprint(message)
+        result = scrub_result(message, result)
+        with self._lock:
+            previous = self.entries.pop(key)
+            if previous is not None:
+                self._unindex(key, previous)
+            self.entries.set(key, {
+                "fingerprint": fingerprint,
+                "signature": self.signature(message) if fingerprint is not None else None,
+                "result": result,
+            })
+            if fingerprint is not None:
+                for band in self._band_keys(fingerprint):
+                    self._bands.setdefault(band, {})[key] = fingerprint
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._bands.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["exact_hits"] + self.stats["near_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+            entries = self.entries.get_stats()
+            return dict(
+                self.stats,
+                entries=entries["entries"],
+                expired=entries["expired"],
+                evictions=entries["evictions"],
+                indexed_bands=len(self._bands),
+                max_distance=self.max_distance,
+                ttl=self.entries.ttl,
+                hit_ratio=round(hits / lookups, 4) if lookups else 0.0,
+            )
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(band, fingerprint >> (band * self.band_bits) & mask) for band in range(self.bands)]
+
+    def _unindex(self, key, value):
+        """Remove a chave do índice de faixas (também chamado pelo cache ao expirar ou remover)."""
+        fingerprint = value["fingerprint"]
+        if fingerprint is None:
+            return
+        for band in self._band_keys(fingerprint):
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._bands[band]
+
+
+# Cache compartilhado por todo o processo
+message_cache = MessageVerdictCache()
@@ -0,0 +1,236 @@
+import os
+import time
+import bisect
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+METRICS_LATENCY_BUCKETS = tuple(
+    float(value) for value in os.getenv(
+        "METRICS_LATENCY_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,20"
+    ).split(",")
+)
+
+# Tempos da requisição atual: (início, {nome do trecho: [segundos somados, ocorrências]})
+_timings = contextvars.ContextVar("timings", default=None)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico, com um valor por combinação de rótulos."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem por combinação de rótulos."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=METRICS_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # rótulos -> [contagem por bucket..., soma, contagem]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        result = []
+        for key, state in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                result.append((self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative))
+            result.append((self.name + "_sum", key, (), state[-2]))
+            result.append((self.name + "_count", key, (), state[-1]))
+        return result
+
+
+class CallbackMetric:
+    """Métrica lida no momento da coleta, a partir dos contadores já mantidos por outro componente.
+
+    `callback()` retorna {tupla de valores dos rótulos: valor}.
+    """
+
+    def __init__(self, name, kind, help_text, labelnames, callback):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        _registry.append(self)
+
+    def samples(self):
+        return [(self.name, tuple(str(value) for value in key), (), value)
+                for key, value in self.callback().items()]
+
+
+def render_metrics():
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, extra, value in metric.samples():
+            lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "detector_stage_seconds", "Duração de cada etapa da análise, em segundos", ["stage"]
+)
+EXTERNAL_CALL_SECONDS = Histogram(
+    "detector_external_call_seconds", "Duração das chamadas a serviços externos, em segundos",
+    ["service", "outcome"]
+)
+ANALYSES = Counter("detector_analyses_total", "Análises concluídas por camada de decisão e veredito",
+                   ["tier", "is_fraud"])
+ANALYSIS_ERRORS = Counter("detector_analysis_errors_total", "Análises interrompidas por erro")
+FALLBACKS = Counter("detector_fallbacks_total", "Fallbacks locais usados no lugar de uma etapa externa",
+                    ["stage"])
+
+
+@contextmanager
+def timing_scope():
+    """Coleta os tempos dos trechos executados no bloco (e nas tarefas criadas nele)."""
+    token = _timings.set((time.perf_counter(), {}))
+    try:
+        yield
+    finally:
+        _timings.reset(token)
+
+
+def _record(name, elapsed):
+    scope = _timings.get()
+    if scope is not None:
+        entry = scope[1].setdefault(name, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+
+
+def get_timings():
+    """Tempos da requisição atual: {"total_ms", "spans": {trecho: {"ms", "count"}}}.
+
+    O tempo de um trecho é a soma das suas ocorrências; trechos executados
+    em paralelo (mensagem e links, por exemplo) se sobrepõem. Trabalho
+    compartilhado entre análises (links repetidos em um lote, chamadas
+    agrupadas pelo SingleFlight) conta, por dentro, para a análise que o
+    iniciou; as demais registram no mesmo trecho apenas o tempo que
+    aguardaram.
+    """
+    scope = _timings.get()
+    if scope is None:
+        return None
+    started, spans = scope
+    return {
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+        "spans": {
+            name: {"ms": round(total * 1000, 3), "count": count}
+            for name, (total, count) in spans.items()
+        },
+    }
+
+
+class _Span:
+    def __init__(self, histogram, name, labels):
+        self.histogram = histogram
+        self.name = name
+        self.labels = labels
+        self.outcome = "ok"  # pode ser alterado dentro do bloco (ex.: resposta HTTP de erro)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        if exc_type is not None:
+            if issubclass(exc_type, asyncio.CancelledError):
+                self.outcome = "cancelled"
+            elif issubclass(exc_type, asyncio.TimeoutError):
+                self.outcome = "timeout"
+            else:
+                self.outcome = "error"
+        labels = dict(self.labels, outcome=self.outcome) if "outcome" in self.histogram.labelnames else self.labels
+        self.histogram.observe(elapsed, **labels)
+        _record(self.name, elapsed)
+        return False
+
+
+def span(stage):
+    """Mede uma etapa da análise (histograma `detector_stage_seconds` e tempos da requisição)."""
+    return _Span(STAGE_SECONDS, stage, {"stage": stage})
+
+
+def external_call(service):
+    """Mede uma chamada a um serviço externo; marque `outcome = "error"` em respostas de erro."""
+    return _Span(EXTERNAL_CALL_SECONDS, service, {"service": service})
+
+
+@contextmanager
+def waiting(name):
+    """Soma ao trecho `name` da requisição atual o tempo aguardando um resultado
+    iniciado por outra requisição, sem registrá-lo de novo nos histogramas."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+async def timed(stage, awaitable):
+    """Aguarda `awaitable` dentro de `span(stage)`; útil para tarefas criadas com create_task."""
+    with span(stage):
+        return await awaitable
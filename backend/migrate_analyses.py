@@ -0,0 +1,122 @@
+"""Importa as análises gravadas em arquivos para o banco indexado.
+
+Uso:
+    python migrate_analyses.py --source analysis_results --db data/analyses.db
+
+Formatos importados do diretório de origem:
+    <analysis_id>_<AAAAmmdd_HHMMSS>.json  um resultado por arquivo (formato antigo);
+                                          a data vem do nome do arquivo
+    *.jsonl                               segmentos do gravador de análises, um
+                                          registro {analysis_id, created_at,
+                                          user_id, result} por linha
+
+Análises já presentes no banco são mantidas, então a migração pode ser
+repetida sem duplicar registros.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from analysis_store import ANALYSIS_DB_PATH, AnalysisStore
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def file_created_at(path):
+    """Data da análise a partir do nome `<id>_<AAAAmmdd>_<HHMMSS>.json`, ou do arquivo."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return datetime.strptime(name[-15:], TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        return os.path.getmtime(path)
+
+
+def read_json_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    yield {
+        "analysis_id": result["analysis_id"],
+        "user_id": None,
+        "created_at": file_created_at(path),
+        "result": result,
+    }
+
+
+def read_jsonl_segment(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_records(source, counts):
+    """Registros de todos os arquivos do diretório, em ordem de nome."""
+    for name in sorted(os.listdir(source)):
+        path = os.path.join(source, name)
+        if name.endswith(".json"):
+            reader = read_json_file
+        elif name.endswith(".jsonl"):
+            reader = read_jsonl_segment
+        else:
+            continue
+        counts["files"] += 1
+        try:
+            for record in reader(path):
+                if not record.get("analysis_id") or not isinstance(record.get("result"), dict):
+                    counts["errors"] += 1
+                    continue
+                counts["read"] += 1
+                yield record
+        except (OSError, ValueError, KeyError) as e:
+            counts["errors"] += 1
+            print(f"Erro ao ler {path}: {e}")
+
+
+def migrate(source, db_path, batch_size=1000):
+    """Importa `source` para o banco em `db_path`; retorna as contagens."""
+    store = AnalysisStore(db_path)
+    counts = {"files": 0, "read": 0, "imported": 0, "errors": 0}
+    batch = []
+    try:
+        for record in iter_records(source, counts):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                counts["imported"] += store.write_batch(batch, replace=False)
+                batch = []
+        if batch:
+            counts["imported"] += store.write_batch(batch, replace=False)
+    finally:
+        store.close()
+    counts["existing"] = counts["read"] - counts["imported"]
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa as análises em arquivo para o banco indexado.")
+    parser.add_argument("--source", default="analysis_results",
+                        help="Diretório com os arquivos .json/.jsonl (padrão: analysis_results)")
+    parser.add_argument("--db", default=ANALYSIS_DB_PATH,
+                        help=f"Banco de destino (padrão: {ANALYSIS_DB_PATH})")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="Registros gravados por transação (padrão: 1000)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source):
+        print(f"Diretório não encontrado: {args.source}")
+        return 1
+
+    started = time.perf_counter()
+    counts = migrate(args.source, args.db, max(1, args.batch_size))
+    print(
+        f"{counts['imported']} análises importadas ({counts['existing']} já existentes, "
+        f"{counts['errors']} com erro) de {counts['files']} arquivos para {args.db} "
+        f"({time.perf_counter() - started:.2f}s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
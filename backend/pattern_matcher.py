@@ -0,0 +1,75 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """Autômato de Aho-Corasick para busca de vários termos em uma só passada.
+
+    Cada termo é associado a um rótulo (categoria). A busca percorre o texto
+    uma única vez e devolve todas as ocorrências, inclusive sobrepostas, com
+    a posição inicial de cada uma.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]  # estado -> [(termo, rótulo)]
+        self._built = False
+
+    def add(self, term, label):
+        if self._built:
+            raise RuntimeError("Não é possível adicionar termos após compilar o autômato")
+        if not term:
+            return
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((term, label))
+
+    def build(self):
+        """Compila o autômato; deve ser chamado após os `add`.
+
+        Além das transições de falha, calcula a tabela de transições completa
+        (um DFA) para os caracteres presentes nos termos, de modo que a busca
+        faz um único acesso a dicionário por caractere do texto.
+        """
+        delta = [dict(transitions) for transitions in self._goto]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail_state = self._fail[state]
+            # Transições ausentes seguem as do estado de falha (já resolvido na BFS)
+            for char, target in delta[fail_state].items():
+                delta[state].setdefault(char, target)
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                if state:
+                    self._fail[next_state] = delta[fail_state].get(char, 0)
+                # Herda as saídas do estado de falha (termos que são sufixos)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+        self._delta = delta
+        self._built = True
+        return self
+
+    def finditer(self, text):
+        """Gera (posição_inicial, termo, rótulo) para cada ocorrência no texto."""
+        delta, output = self._delta, self._output
+        state = 0
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if output[state]:
+                for term, label in output[state]:
+                    yield position - len(term) + 1, term, label
+
+    def search(self, text):
+        """Agrupa as ocorrências por rótulo: {rótulo: [(termo, posição), ...]}."""
+        hits = {}
+        for start, term, label in self.finditer(text):
+            hits.setdefault(label, []).append((term, start))
+        return hits
@@ -0,0 +1,133 @@
+import os
+import time
+import random
+import asyncio
+from utils import safe_print
+from web_search import WebSearcher
+from deadline import deadline_scope
+
+RECENT_SCAMS_QUERY = "golpes financeiros recentes Brasil"
+RECENT_SCAMS_REFRESH_INTERVAL = float(os.getenv("RECENT_SCAMS_REFRESH_INTERVAL", "900"))
+RECENT_SCAMS_REFRESH_JITTER = float(os.getenv("RECENT_SCAMS_REFRESH_JITTER", "0.1"))
+# Após uma atualização com erro, as requisições esperam este intervalo (com o mesmo jitter) antes de tentar de novo
+RECENT_SCAMS_RETRY_INTERVAL = float(os.getenv("RECENT_SCAMS_RETRY_INTERVAL", "60"))
+
+
+class RecentScamsFeed:
+    """Mantém em memória o resultado da busca sobre golpes recentes.
+
+    A busca é a mesma para todos os usuários, então é atualizada em segundo
+    plano em intervalos com jitter; as requisições apenas leem o último
+    snapshot, sem esperar pela SerpAPI. Depois de uma atualização com erro,
+    as requisições não disparam outra antes de `retry_interval`.
+    """
+
+    def __init__(self, query=RECENT_SCAMS_QUERY, interval=RECENT_SCAMS_REFRESH_INTERVAL,
+                 jitter=RECENT_SCAMS_REFRESH_JITTER, retry_interval=RECENT_SCAMS_RETRY_INTERVAL):
+        self.query = query
+        self.interval = interval
+        self.jitter = jitter  # fração do intervalo
+        self.retry_interval = retry_interval
+        self.web_searcher = WebSearcher()
+        self._results = None
+        self._fetched_at = None  # time.time() do último snapshot
+        self._retry_at = None  # time.time() a partir do qual uma nova tentativa é permitida após um erro
+        self._refresh_task = None
+        self._loop_task = None
+        self.stats = {
+            "refreshes": 0,
+            "refresh_errors": 0,
+        }
+
+    def start(self):
+        """Inicia o laço de atualização em segundo plano."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Interrompe o laço de atualização e qualquer atualização em andamento."""
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._loop_task = None
+        self._refresh_task = None
+
+    def get_results(self):
+        """Retorna o último snapshot sem bloquear.
+
+        Enquanto ainda não houver snapshot (ou se ele estiver vencido), dispara
+        uma atualização em segundo plano e devolve o snapshot atual ou os
+        resultados de fallback. Logo após um erro, a atualização é adiada.
+        """
+        age = self.get_age()
+        backing_off = self._retry_at is not None and time.time() < self._retry_at
+        if (age is None or age > self.interval * (1 + self.jitter)) and not backing_off:
+            self.refresh_in_background()
+        if self._results is None:
+            return self.web_searcher._fallback_search(self.query)
+        return self._results
+
+    def get_age(self):
+        """Idade do snapshot em segundos, ou None se ainda não houver um."""
+        if self._fetched_at is None:
+            return None
+        return time.time() - self._fetched_at
+
+    def refresh_in_background(self):
+        """Dispara uma atualização, a menos que já exista uma em andamento."""
+        if self._refresh_task is None or self._refresh_task.done():
+            try:
+                self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+            except RuntimeError:
+                # Fora de um event loop não há como atualizar em segundo plano
+                pass
+        return self._refresh_task
+
+    async def refresh(self):
+        """Consulta a busca e substitui o snapshot atual.
+
+        Se a SerpAPI falhar, o snapshot anterior é mantido: os resultados de
+        fallback nunca o substituem.
+        """
+        try:
+            # Disparada durante uma análise, a atualização não herda o prazo dela
+            with deadline_scope(None):
+                results = await self.web_searcher.search_async(self.query, use_cache=False, fallback=False)
+            self._results = results
+            self._fetched_at = time.time()
+            self._retry_at = None
+            self.stats["refreshes"] += 1
+            safe_print("Feed de golpes recentes atualizado (%s resultados)", len(results))
+        except Exception as e:
+            # Mantém o snapshot anterior, ainda que vencido
+            self.stats["refresh_errors"] += 1
+            self._retry_at = time.time() + self._jittered(self.retry_interval)
+            safe_print(f"Erro ao atualizar feed de golpes recentes: {e}")
+
+    async def _run(self):
+        while True:
+            await self.refresh_in_background()
+            await asyncio.sleep(self._jittered(self.interval))
+
+    def _jittered(self, seconds):
+        """`seconds` com o jitter do feed (mínimo de 1 segundo)."""
+        return max(seconds * (1 + random.uniform(-self.jitter, self.jitter)), 1.0)
+
+    def get_status(self):
+        """Estado do feed para monitoramento."""
+        age = self.get_age()
+        return dict(
+            self.stats,
+            age_seconds=round(age, 1) if age is not None else None,
+            refreshing=self._refresh_task is not None and not self._refresh_task.done(),
+            results=len(self._results) if self._results is not None else 0,
+            retry_in_seconds=round(max(self._retry_at - time.time(), 0.0), 1) if self._retry_at is not None else None,
+        )
+
+
+# Instância única do processo
+recent_scams_feed = RecentScamsFeed()
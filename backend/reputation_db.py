@@ -0,0 +1,213 @@
+import os
+import sys
+import math
+import mmap
+import time
+import struct
+import bisect
+import hashlib
+from utils import normalize_url
+from domain_index import normalize_domain, reverse_labels
+
+REPUTATION_DB_PATH = os.getenv("REPUTATION_DB_PATH", "data/reputation.bin")
+
+# Layout do arquivo (little-endian):
+#   cabeçalho | tabela de categorias | filtro de Bloom | hashes (u64 ordenados) | categorias (u8)
+MAGIC = b"IGREPDB1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQIIddQQQQ")
+# magic, versão, nº categorias, nº registros, bits do Bloom, nº hashes do Bloom,
+# reservado, criado_em, taxa de falso positivo, offsets: categorias, Bloom, hashes, categorias dos registros
+
+
+def domain_hash(domain):
+    """Par de hashes de 64 bits do domínio (em rótulos invertidos)."""
+    digest = hashlib.blake2b(reverse_labels(domain).encode("utf-8"), digest_size=16).digest()
+    return struct.unpack("<QQ", digest)
+
+
+def url_key(url):
+    """URL normalizado (sem protocolo, `www.` e fragmento) usado nas entradas por URL."""
+    return normalize_url(url.split("#", 1)[0])
+
+
+def url_hash(url):
+    """Par de hashes de 64 bits de um URL; o prefixo o separa dos hashes de domínio."""
+    digest = hashlib.blake2b(f"url:{url_key(url)}".encode("utf-8"), digest_size=16).digest()
+    return struct.unpack("<QQ", digest)
+
+
+def _bloom_positions(h1, h2, num_bits, num_hashes):
+    # Double hashing (Kirsch-Mitzenmacher): k posições a partir de dois hashes
+    return [(h1 + i * h2) % num_bits for i in range(num_hashes)]
+
+
+def _align(offset, size=8):
+    return (offset + size - 1) // size * size
+
+
+def build_reputation_db(entries, path, categories, false_positive_rate=0.001):
+    """Grava o artefato binário a partir de {hash_do_domínio: índice_da_categoria}.
+
+    `entries` mapeia o par retornado por `domain_hash` para o índice da
+    categoria em `categories`. O arquivo é escrito em um temporário e trocado
+    com `os.replace`, de modo que leitores nunca veem um arquivo pela metade.
+    """
+    count = len(entries)
+    num_bits = max(64, int(math.ceil(-max(count, 1) * math.log(false_positive_rate) / (math.log(2) ** 2))))
+    num_bits = _align(num_bits, 64)
+    num_hashes = max(1, int(round(num_bits / max(count, 1) * math.log(2))))
+
+    bloom = bytearray(num_bits // 8)
+    records = sorted((h1, h2, category) for (h1, h2), category in entries.items())
+    for h1, h2, _ in records:
+        for bit in _bloom_positions(h1, h2, num_bits, num_hashes):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+
+    category_table = b"".join(
+        struct.pack("<H", len(name.encode("utf-8"))) + name.encode("utf-8") for name in categories
+    )
+    categories_offset = HEADER.size
+    bloom_offset = _align(categories_offset + len(category_table))
+    hashes_offset = _align(bloom_offset + len(bloom))
+    record_categories_offset = hashes_offset + 8 * count
+
+    tmp_path = f"{path}.tmp"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, len(categories), count, num_bits, num_hashes, 0,
+            time.time(), false_positive_rate,
+            categories_offset, bloom_offset, hashes_offset, record_categories_offset,
+        ))
+        f.write(category_table)
+        f.write(b"\0" * (bloom_offset - categories_offset - len(category_table)))
+        f.write(bloom)
+        f.write(b"\0" * (hashes_offset - bloom_offset - len(bloom)))
+        f.write(struct.pack(f"<{count}Q", *(h1 for h1, _, _ in records)))
+        f.write(bytes(category for _, _, category in records))
+    os.replace(tmp_path, path)
+    return {"entries": count, "bloom_bits": num_bits, "bloom_hashes": num_hashes}
+
+
+class ReputationDB:
+    """Leitor do artefato binário de reputação, mapeado em memória.
+
+    Nenhum objeto Python é criado por entrada: uma consulta negativa custa
+    algumas sondagens no filtro de Bloom, e uma positiva uma busca binária
+    sobre os hashes ordenados. Cada sufixo do domínio consultado é testado,
+    então uma entrada também cobre seus subdomínios, como no `DomainIndex`.
+    Entradas de URL com caminho (`github.com/usuario/payload`) ficam em
+    hashes próprios e só casam com o mesmo URL, em `match_url`, sem
+    bloquear o host inteiro.
+    """
+
+    def __init__(self, path=REPUTATION_DB_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, num_categories, self.count, self.num_bits, self.num_hashes, _,
+         self.built_at, self.false_positive_rate, categories_offset, self._bloom_offset,
+         hashes_offset, self._record_categories_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Arquivo de reputação inválido ou de versão incompatível: {path}")
+
+        self.categories = []
+        offset = categories_offset
+        for _ in range(num_categories):
+            (length,) = struct.unpack_from("<H", self._mm, offset)
+            self.categories.append(self._mm[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+
+        hashes = memoryview(self._mm)[hashes_offset:hashes_offset + 8 * self.count]
+        if sys.byteorder == "little":
+            self._hashes = hashes.cast("Q")
+        else:
+            self._hashes = _UnpackedHashes(hashes)
+        self.stats = {
+            "lookups": 0,
+            "bloom_rejects": 0,
+            "hits": 0,
+        }
+
+    def _might_contain(self, h1, h2):
+        mm = self._mm
+        base = self._bloom_offset
+        for bit in _bloom_positions(h1, h2, self.num_bits, self.num_hashes):
+            if not mm[base + (bit >> 3)] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _lookup(self, h1, h2):
+        if not self._might_contain(h1, h2):
+            self.stats["bloom_rejects"] += 1
+            return None
+        position = bisect.bisect_left(self._hashes, h1)
+        if position < self.count and self._hashes[position] == h1:
+            return self.categories[self._mm[self._record_categories_offset + position]]
+        return None
+
+    def match(self, domain):
+        """Retorna a categoria do sufixo mais específico presente, ou None."""
+        domain = normalize_domain(domain)
+        if not domain:
+            return None
+        self.stats["lookups"] += 1
+        labels = domain.split(".")
+        for start in range(len(labels)):
+            suffix = ".".join(labels[start:])
+            category = self._lookup(*domain_hash(suffix))
+            if category is not None:
+                self.stats["hits"] += 1
+                return {
+                    "category": category,
+                    "rule": suffix,
+                    "matched_suffix": suffix,
+                }
+        return None
+
+    def match_url(self, url):
+        """Retorna a categoria de uma entrada para exatamente este URL, ou None."""
+        key = url_key(url)
+        if not key:
+            return None
+        self.stats["lookups"] += 1
+        category = self._lookup(*url_hash(key))
+        if category is None:
+            return None
+        self.stats["hits"] += 1
+        return {
+            "category": category,
+            "rule": key,
+            "matched_url": key,
+        }
+
+    def __len__(self):
+        return self.count
+
+    def get_status(self):
+        return dict(
+            self.stats,
+            path=self.path,
+            entries=self.count,
+            categories=list(self.categories),
+            bloom_bits=self.num_bits,
+            bloom_hashes=self.num_hashes,
+            built_at=self.built_at,
+        )
+
+
+class _UnpackedHashes:
+    """Acesso aos hashes em plataformas big-endian (sem `memoryview.cast`)."""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __len__(self):
+        return len(self._view) // 8
+
+    def __getitem__(self, position):
+        return struct.unpack_from("<Q", self._view, position * 8)[0]
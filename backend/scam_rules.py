@@ -0,0 +1,85 @@
+import os
+import json
+from pattern_matcher import AhoCorasick
+
+SCAM_RULES_PATH = os.getenv("SCAM_RULES_PATH", "data/scam_rules.json")
+
+HEURISTIC_PREFIX = "heuristic:"
+SCAM_TYPE_PREFIX = "scam_type:"
+
+
+class ScamRules:
+    """Regras de palavras-chave compiladas em um único autômato.
+
+    Os grupos da heurística e as regras de tipo de golpe ficam no mesmo
+    autômato, então uma passada sobre a mensagem fornece tudo o que a
+    pontuação heurística e a classificação do tipo de golpe precisam.
+    """
+
+    def __init__(self, rules):
+        heuristic = rules.get("heuristic", {})
+        scam_types = rules.get("scam_types", {})
+        self.max_score = heuristic.get("max_score", 10)
+        self.groups = heuristic.get("groups", [])
+        self.combinations = heuristic.get("combinations", [])
+        self.scam_type_base = scam_types.get("base", "golpes financeiros")
+        self.scam_type_rules = scam_types.get("rules", [])
+
+        self.matcher = AhoCorasick()
+        for group in self.groups:
+            for term in group["terms"]:
+                self.matcher.add(term.lower(), HEURISTIC_PREFIX + group["name"])
+        for rule in self.scam_type_rules:
+            for term in rule["terms"]:
+                self.matcher.add(term.lower(), SCAM_TYPE_PREFIX + rule["name"])
+        self.matcher.build()
+
+    @classmethod
+    def load(cls, path=SCAM_RULES_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def scan(self, message):
+        """Percorre a mensagem uma vez: {categoria: [(termo, posição), ...]}."""
+        return self.matcher.search(message.lower())
+
+    def heuristic_score(self, hits):
+        """Pontuação de 0 a `max_score` a partir das ocorrências de `scan`.
+
+        Grupos no modo "any" pontuam uma vez se qualquer termo ocorrer; no
+        modo "each" pontuam uma vez por termo distinto encontrado.
+        """
+        score = 0
+        matched_groups = set()
+        for group in self.groups:
+            group_hits = hits.get(HEURISTIC_PREFIX + group["name"])
+            if not group_hits:
+                continue
+            matched_groups.add(group["name"])
+            if group.get("mode", "any") == "each":
+                score += group["score"] * len({term for term, _ in group_hits})
+            else:
+                score += group["score"]
+
+        for combination in self.combinations:
+            if all(name in matched_groups for name in combination["requires"]):
+                score += combination["score"]
+
+        return min(score, self.max_score)
+
+    def scam_type(self, hits):
+        """Tipo de golpe: a primeira regra, na ordem do arquivo, com ocorrências."""
+        for rule in self.scam_type_rules:
+            if hits.get(SCAM_TYPE_PREFIX + rule["name"]):
+                return f"{self.scam_type_base} {rule['suffix']}"
+        return self.scam_type_base
+
+
+_scam_rules = None
+
+def get_scam_rules():
+    """Regras compiladas, carregadas uma única vez por processo."""
+    global _scam_rules
+    if _scam_rules is None:
+        _scam_rules = ScamRules.load()
+    return _scam_rules
@@ -0,0 +1,49 @@
+import asyncio
+from metrics import waiting
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes idênticas em uma única execução.
+
+    Enquanto a primeira chamada para uma chave estiver em andamento, as
+    chamadas seguintes com a mesma chave aguardam o mesmo futuro em vez de
+    repetir a requisição externa.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._in_flight = {}
+        self.stats = {
+            "calls": 0,
+            "executed": 0,
+            "coalesced": 0,
+        }
+
+    async def do(self, key, coro_factory):
+        """Executa `coro_factory()` uma única vez por chave em andamento."""
+        self.stats["calls"] += 1
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            # O tempo da chamada fica com quem a iniciou; aqui conta apenas a espera
+            with waiting(self.name):
+                # shield: o cancelamento de um chamador não cancela os demais
+                return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(coro_factory())
+        self._in_flight[key] = future
+        self.stats["executed"] += 1
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Marca a exceção como consumida caso todos os chamadores tenham desistido
+        if not future.cancelled():
+            future.exception()
+
+    def get_stats(self):
+        """Retorna os contadores e o número de chamadas em andamento."""
+        return dict(self.stats, in_flight=len(self._in_flight))
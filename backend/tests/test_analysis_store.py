@@ -0,0 +1,39 @@
+import pytest
+from analysis_store import AnalysisStore, encode_cursor, decode_cursor
+
+
+def make_store(tmp_path):
+    store = AnalysisStore(str(tmp_path / "analyses.db"))
+    records = [
+        {"analysis_id": f"a{index:02d}", "created_at": 1700000000.123456 + index // 3,
+         "result": {"is_fraud": index % 2 == 0, "confidence": 0.5}}
+        for index in range(10)
+    ]
+    store.write_batch(records)
+    return store
+
+
+def test_cursor_pagination_does_not_skip_or_repeat_ties(tmp_path):
+    store = make_store(tmp_path)
+    seen = []
+    cursor = None
+    while True:
+        page = store.list(limit=2, cursor=cursor)
+        seen.extend(record["analysis_id"] for record in page)
+        if len(page) < 2:
+            break
+        cursor = encode_cursor(page[-1])
+    assert seen == sorted((f"a{index:02d}" for index in range(10)),
+                          key=lambda analysis_id: (int(analysis_id[1:]) // 3, analysis_id), reverse=True)
+
+
+def test_cursor_round_trip_keeps_exact_timestamp(tmp_path):
+    store = make_store(tmp_path)
+    record = store.list(limit=1)[0]
+    assert decode_cursor(encode_cursor(record)) == (record["created_at"], record["analysis_id"])
+
+
+def test_invalid_cursor_raises_value_error(tmp_path):
+    store = make_store(tmp_path)
+    with pytest.raises(ValueError):
+        store.list(cursor="não-é-um-cursor")
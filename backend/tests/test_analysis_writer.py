@@ -0,0 +1,24 @@
+import json
+import asyncio
+from analysis_store import AnalysisStore
+from analysis_writer import AnalysisWriter, JsonlSegmentSink
+
+
+def test_jsonl_sink_keeps_analyses_queryable(tmp_path):
+    store = AnalysisStore(str(tmp_path / "analyses.db"))
+    sink = JsonlSegmentSink(directory=str(tmp_path / "segments"), index=store)
+    writer = AnalysisWriter(sink=sink)
+    record = {"analysis_id": "a1", "user_id": "ana", "created_at": 1700000000.0,
+              "result": {"is_fraud": True, "confidence": 0.9}}
+
+    async def scenario():
+        writer.start()
+        writer.submit(record)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    with open(sink.path, encoding="utf-8") as f:
+        assert [json.loads(line)["analysis_id"] for line in f] == ["a1"]
+    assert store.get("a1")["user_id"] == "ana"
+    assert [item["analysis_id"] for item in store.list(user_id="ana")] == ["a1"]
+    assert writer.get_stats()["sink"]["index"]["type"] == "sqlite"
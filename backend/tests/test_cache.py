@@ -0,0 +1,38 @@
+import cache
+from cache import TTLCache
+
+
+def test_expired_entry_is_a_miss_and_notifies(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    evicted = []
+    ttl_cache = TTLCache("teste", ttl=10, on_evict=lambda key, value: evicted.append((key, value)))
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2, ttl=60)
+    now[0] += 11
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("b") == 2
+    assert evicted == [("a", 1)]
+    assert ttl_cache.get_stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    evicted = []
+    ttl_cache = TTLCache("teste", ttl=60, max_entries=2, on_evict=lambda key, value: evicted.append(key))
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert evicted == ["b"]
+    assert ttl_cache.get("a") == 1 and ttl_cache.get("c") == 3
+    assert ttl_cache.stats["evictions"] == 1
+
+
+def test_byte_limit_evicts_and_skips_oversized_values():
+    ttl_cache = TTLCache("teste", ttl=60, max_bytes=20)
+    ttl_cache.set("a", "x" * 12)
+    ttl_cache.set("b", "y" * 12)
+    assert len(ttl_cache) == 1 and ttl_cache.get("b") == "y" * 12
+    ttl_cache.set("c", "z" * 50)
+    assert ttl_cache.get("c") is None
+    assert ttl_cache.get_stats()["bytes"] <= 20
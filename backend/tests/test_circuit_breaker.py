@@ -0,0 +1,38 @@
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+def test_breaker_opens_half_opens_and_closes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("teste", failure_threshold=3, recovery_timeout=30)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure(RuntimeError("falhou"))
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.get_status()["last_failure"] == "falhou"
+
+    now[0] += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Apenas uma chamada de teste por intervalo
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+    assert breaker.stats["opened"] == 1 and breaker.stats["rejected"] == 2
+
+
+def test_failed_probe_reopens_the_circuit(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("teste", failure_threshold=1, recovery_timeout=10)
+    breaker.record_failure()
+    now[0] += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.get_status()["retry_in_seconds"] == 10
+    assert breaker.stats["opened"] == 2
@@ -0,0 +1,37 @@
+import json
+import pytest
+from config import get_blacklists, parse_blacklists
+
+
+def test_missing_file_creates_example_lists(tmp_path):
+    path = tmp_path / "blacklists.json"
+    blacklists = get_blacklists(str(path))
+    assert "phishing" in blacklists
+    assert json.loads(path.read_text()) == blacklists
+
+
+@pytest.mark.parametrize("content", ["{invalido", "[\"phishing.com\"]", "{\"phishing\": \"phishing.com\"}"])
+def test_malformed_file_raises_and_is_kept(tmp_path, content):
+    path = tmp_path / "blacklists.json"
+    path.write_text(content)
+    with pytest.raises(ValueError):
+        get_blacklists(str(path))
+    assert path.read_text() == content
+
+
+def test_categories_must_be_lists_of_strings():
+    assert parse_blacklists('{"phishing": ["phishing.com"]}') == {"phishing": ["phishing.com"]}
+    with pytest.raises(ValueError):
+        parse_blacklists('{"phishing": ["phishing.com", 42]}')
+
+
+def test_setup_api_logs_missing_keys(monkeypatch, caplog):
+    import config
+    monkeypatch.setattr(config, "load_dotenv", lambda: None)
+    for name in ("GEMINI_API_KEY", "VIRUSTOTAL_API_KEY", "SERPAPI_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    with caplog.at_level("WARNING", logger="detector"):
+        config.setup_api()
+    warnings = [record.getMessage() for record in caplog.records if record.levelname == "WARNING"]
+    assert len(warnings) == 3
+    assert any("VirusTotal" in message for message in warnings)
@@ -0,0 +1,25 @@
+from domain_index import DomainIndex, normalize_domain
+
+
+def test_rule_matches_domain_and_subdomains_only():
+    index = DomainIndex.from_blacklists({"phishing": ["exemplo.com"]})
+    assert index.match("https://login.exemplo.com/entrar")["matched_suffix"] == "exemplo.com"
+    assert index.match("exemplo.com")["category"] == "phishing"
+    assert index.match("outroexemplo.com") is None
+    assert index.match("exemplo.com.br") is None
+
+
+def test_most_specific_rule_wins_and_first_category_is_kept():
+    index = DomainIndex.from_blacklists({
+        "malware": ["*.exemplo.com", "conta.exemplo.com"],
+        "phishing": ["exemplo.com"],
+    })
+    assert len(index) == 2
+    assert index.match("exemplo.com")["category"] == "malware"
+    assert index.match("a.conta.exemplo.com")["rule"] == "conta.exemplo.com"
+
+
+def test_normalize_domain():
+    assert normalize_domain("https://user@WWW.Exemplo.com:8080/caminho?x=1") == "exemplo.com"
+    assert normalize_domain("http://[::1]:80/") == "[::1]"
+    assert normalize_domain("pão.com.br") == "xn--po-sia.com.br"
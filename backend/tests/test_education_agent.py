@@ -0,0 +1,52 @@
+import asyncio
+from types import SimpleNamespace
+from education_agent import EducationAgent
+
+LLM_TEXT = """TEXTO EDUCATIVO: O golpe do PIX usa mensagens urgentes.
+
+DICAS DE SEGURANÇA:
+- Confirme a chave PIX
+- Desconfie de urgência
+"""
+
+
+class FakeScheduler:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+
+    async def generate(self, model, prompt, priority=None):
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text=self.response)
+
+
+async def no_results(query, **kwargs):
+    return []
+
+
+def make_agent(scheduler):
+    agent = EducationAgent()
+    agent.llm_scheduler = scheduler
+    agent.web_searcher = SimpleNamespace(search_async=no_results)
+    return agent
+
+
+def test_llm_content_is_cached():
+    agent = make_agent(FakeScheduler(response=LLM_TEXT))
+    result = asyncio.run(agent.process({"analysis_summary": "golpe do PIX"}))
+    assert result["tips"] == ["Confirme a chave PIX", "Desconfie de urgência"]
+    assert agent.content_cache.get("golpe do PIX") == result
+
+
+def test_fallback_content_is_not_cached():
+    agent = make_agent(FakeScheduler(error=RuntimeError("Gemini indisponível")))
+    result = asyncio.run(agent.process({"analysis_summary": "golpe do PIX"}))
+    assert "golpe do PIX" in result["educational_text"]
+    assert agent.content_cache.get("golpe do PIX") is None
+
+
+def test_timeout_content_is_not_cached():
+    agent = make_agent(FakeScheduler(error=asyncio.TimeoutError()))
+    asyncio.run(agent.process({"analysis_summary": "golpe do PIX"}))
+    assert len(agent.content_cache) == 0
@@ -0,0 +1,34 @@
+import asyncio
+from feedback_store import FeedbackStore
+
+MESSAGE = "Seu cartão foi bloqueado, acesse http://banco-seguro.xyz/login"
+
+
+def vote(store, analysis_id, feedback_type, is_fraud=True):
+    analysis = {"query": {"message": MESSAGE}, "result": {"is_fraud": is_fraud}}
+    return asyncio.run(store.record(analysis_id, feedback_type, analysis=analysis))
+
+
+def test_scam_label_is_confirmed_after_min_confirmations(tmp_path):
+    store = FeedbackStore(str(tmp_path / "analyses.db"), min_confirmations=2)
+    vote(store, "a1", "correct")
+    assert store.lookup(MESSAGE) is None
+    vote(store, "a2", "scam")
+    assert store.lookup(MESSAGE) == {"label": "scam", "confirmations": 2, "matched": "message"}
+    assert store.lookup("outra mensagem", ["http://banco-seguro.xyz/login"])["matched"] == "url"
+
+
+def test_safe_votes_never_skip_the_analysis(tmp_path):
+    store = FeedbackStore(str(tmp_path / "analyses.db"), min_confirmations=2)
+    for analysis_id in ("a1", "a2", "a3"):
+        assert vote(store, analysis_id, "incorrect") == "safe"
+    assert store.lookup(MESSAGE) is None
+
+
+def test_safe_votes_count_against_scam_confirmation(tmp_path):
+    store = FeedbackStore(str(tmp_path / "analyses.db"), min_confirmations=2)
+    vote(store, "a1", "scam")
+    vote(store, "a2", "scam")
+    vote(store, "a3", "safe")
+    vote(store, "a4", "safe")
+    assert store.lookup(MESSAGE) is None
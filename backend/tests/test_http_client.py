@@ -0,0 +1,25 @@
+import time
+import asyncio
+from deadline import deadline_scope, DeadlineExceeded
+from http_client import is_deadline_timeout, is_upstream_failure
+
+
+def test_timeout_after_deadline_is_not_a_service_failure():
+    with deadline_scope(0.01):
+        time.sleep(0.02)
+        assert is_deadline_timeout(asyncio.TimeoutError())
+        assert is_deadline_timeout(DeadlineExceeded())
+
+
+def test_timeout_with_deadline_left_is_a_service_failure():
+    assert not is_deadline_timeout(asyncio.TimeoutError())
+    with deadline_scope(10):
+        assert not is_deadline_timeout(asyncio.TimeoutError())
+        assert not is_deadline_timeout(ValueError("resposta inválida"))
+
+
+def test_only_rate_limit_and_server_errors_are_upstream_failures():
+    assert is_upstream_failure(429)
+    assert is_upstream_failure(503)
+    assert not is_upstream_failure(400)
+    assert not is_upstream_failure(404)
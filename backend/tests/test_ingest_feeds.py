@@ -0,0 +1,58 @@
+import pytest
+from ingest_feeds import ingest, read_csv
+from reputation_db import ReputationDB
+
+URLHAUS_CSV = """################################################################
+# abuse.ch URLhaus Database Dump (CSV - recent URLs only)
+#
+# id,dateadded,url,url_status,last_online,threat,tags,urlhaus_link,reporter
+"1001","2024-05-01 10:00:00","http://bad-host.net/","online","","malware_download","","https://urlhaus.abuse.ch/url/1001/","x"
+"1002","2024-05-01 10:05:00","https://worse.org/payload.exe","online","","malware_download","","https://urlhaus.abuse.ch/url/1002/","x"
+"1003","2024-05-01 10:10:00","https://github.com/usuario/payload","online","","malware_download","","https://urlhaus.abuse.ch/url/1003/","x"
+"""
+
+
+@pytest.fixture
+def urlhaus(tmp_path):
+    path = tmp_path / "urlhaus.csv"
+    path.write_text(URLHAUS_CSV)
+    return str(path)
+
+
+def test_csv_header_in_comment_line_is_used(urlhaus):
+    assert list(read_csv(urlhaus)) == [
+        "http://bad-host.net/", "https://worse.org/payload.exe", "https://github.com/usuario/payload",
+    ]
+
+
+def test_missing_csv_column_is_an_error(urlhaus):
+    with pytest.raises(ValueError):
+        list(read_csv(urlhaus, "hostname"))
+
+
+def test_build_bloom_match_round_trip(tmp_path, urlhaus):
+    feed = tmp_path / "phishing.txt"
+    feed.write_text("# comentário\nphishing-site.com\nhttp://www.outro-golpe.net\n")
+    output = str(tmp_path / "reputation.bin")
+    info = ingest([("malware", urlhaus), ("phishing", str(feed))], output)
+    assert info["entries"] == 5 and info["urls"] == 2
+
+    db = ReputationDB(output)
+    assert db.categories == ["malware", "phishing"]
+    assert db.match("bad-host.net")["category"] == "malware"
+    assert db.match("login.phishing-site.com")["rule"] == "phishing-site.com"
+    assert db.match("outro-golpe.net")["category"] == "phishing"
+    assert db.match("example.com") is None
+    assert db.match("1001") is None
+
+
+def test_url_entries_do_not_block_the_whole_host(tmp_path, urlhaus):
+    output = str(tmp_path / "reputation.bin")
+    ingest([("malware", urlhaus)], output)
+    db = ReputationDB(output)
+    assert db.match("github.com") is None
+    assert db.match("raw.github.com") is None
+    assert db.match_url("https://github.com/usuario/payload")["category"] == "malware"
+    assert db.match_url("https://github.com/outro/projeto") is None
+    assert db.match("worse.org") is None
+    assert db.match_url("http://worse.org/payload.exe#x")["category"] == "malware"
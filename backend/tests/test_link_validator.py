@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+import link_validator
+from link_validator import LinkValidator, virustotal_breaker
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, status):
+        self.status = status
+        self.posts = 0
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.status)
+
+    def post(self, url, **kwargs):
+        self.posts += 1
+        return FakeResponse(200)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    holder = {}
+
+    async def get_session():
+        return holder["session"]
+
+    monkeypatch.setattr(link_validator.http_client, "get_session", get_session)
+    monkeypatch.setattr(link_validator, "VT_MODE", "lookup_first")
+    return holder
+
+
+@pytest.mark.parametrize("status, counts_as_failure", [(429, True), (503, True), (401, False)])
+def test_report_lookup_errors_do_not_submit_a_scan(session, status, counts_as_failure):
+    session["session"] = fake = FakeSession(status)
+    validator = LinkValidator()
+    validator.api_key = "chave"
+    failures = virustotal_breaker.stats["failures"]
+
+    result = asyncio.run(validator._query_virustotal("http://exemplo.xyz/a", "exemplo.xyz/a"))
+
+    assert result["status"] == status
+    assert fake.posts == 0
+    assert virustotal_breaker.stats["failures"] - failures == (1 if counts_as_failure else 0)
+    virustotal_breaker.record_success()
@@ -0,0 +1,58 @@
+import asyncio
+from llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_EDUCATION, PRIORITY_ENRICHMENT, BUDGET_WINDOW
+
+
+def test_queued_requests_are_served_by_priority_then_arrival():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1, tokens_per_minute=0)
+        order = []
+
+        async def request(name, priority):
+            await scheduler._acquire(priority, 1)
+            order.append(name)
+            await asyncio.sleep(0)
+            scheduler._release()
+
+        await scheduler._acquire(PRIORITY_INTERACTIVE, 1)
+        tasks = [
+            asyncio.create_task(request("enriquecimento", PRIORITY_ENRICHMENT)),
+            asyncio.create_task(request("educacao", PRIORITY_EDUCATION)),
+            asyncio.create_task(request("analise_1", PRIORITY_INTERACTIVE)),
+            asyncio.create_task(request("analise_2", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.get_stats()["queue_depth"] == 4
+        scheduler._release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["analise_1", "analise_2", "educacao", "enriquecimento"]
+
+
+def test_token_budget_holds_requests_until_the_window_frees_up():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=4, tokens_per_minute=1000)
+        first = await scheduler._acquire(PRIORITY_INTERACTIVE, 900)
+        waiting = asyncio.create_task(scheduler._acquire(PRIORITY_INTERACTIVE, 200))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        assert scheduler.get_stats()["tokens_last_minute"] == 900
+
+        # Uso real menor que a estimativa libera orçamento para o próximo pedido
+        scheduler._adjust(first, 500)
+        scheduler._dispatch()
+        await asyncio.wait_for(waiting, 1)
+        assert scheduler.get_stats()["tokens_last_minute"] == 700
+
+        blocked = asyncio.create_task(scheduler._acquire(PRIORITY_INTERACTIVE, 400))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        # Reservas que saem da janela de um minuto deixam de contar
+        for reservation in scheduler._usage:
+            reservation[0] -= BUDGET_WINDOW
+        scheduler._dispatch()
+        await asyncio.wait_for(blocked, 1)
+        assert scheduler.get_stats()["tokens_last_minute"] == 400
+        scheduler._timer.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,27 @@
+import asyncio
+from manager import AgentManager
+
+
+def test_batch_dedupes_identical_messages_per_user_only():
+    manager = AgentManager.__new__(AgentManager)
+    analyzed = []
+
+    async def process_user_query(query, link_cache=None):
+        analyzed.append(query["user_id"])
+        return {"analysis_id": f"id-{len(analyzed)}", "user_id": query["user_id"]}
+
+    manager.process_user_query = process_user_query
+    queries = [
+        {"message": "Seu PIX foi bloqueado", "user_id": "ana"},
+        {"message": " Seu PIX foi bloqueado ", "user_id": "ana"},
+        {"message": "Seu PIX foi bloqueado", "user_id": "bruno"},
+    ]
+    batch = asyncio.run(manager.process_batch(queries))
+
+    assert sorted(analyzed) == ["ana", "bruno"]
+    assert batch["unique_messages"] == 2
+    first, repeated, other_user = batch["results"]
+    assert repeated["duplicate_of"] == 0 and repeated["result"] is first["result"]
+    assert other_user["duplicate_of"] is None
+    assert other_user["result"]["user_id"] == "bruno"
+    assert other_user["result"]["analysis_id"] != first["result"]["analysis_id"]
@@ -0,0 +1,61 @@
+from scam_rules import ScamRules
+from message_cache import MessageVerdictCache, normalize_message
+
+SCAM_VERDICT = {
+    "analysis": "Golpe de cartão bloqueado.",
+    "risk_score": 10,
+    "explanation": "Mensagem típica de golpe.",
+    "recommendations": ["Não clique no link"],
+    "source": "llm",
+}
+
+
+def test_greeting_masks_only_capitalized_name():
+    assert normalize_message("Olá Maria Souza, seu cartão foi bloqueado") == "ola <nome> seu cartao foi bloqueado"
+    assert normalize_message("Olá cliente seu cartão foi bloqueado") == "ola cliente seu cartao foi bloqueado"
+
+
+def test_greeting_name_is_limited_to_three_words():
+    assert normalize_message("Oi João Pedro Alves Lima tudo bem") == "oi <nome> lima tudo bem"
+
+
+def test_different_messages_after_greeting_do_not_collide():
+    cache = MessageVerdictCache()
+    cache.put("Olá cliente seu cartão foi bloqueado clique no link agora", SCAM_VERDICT)
+
+    result, similarity = cache.get("Olá vamos almoçar amanhã no restaurante de sempre")
+
+    assert result is None
+    assert similarity == 0.0
+
+
+def test_same_campaign_with_different_names_still_hits():
+    cache = MessageVerdictCache()
+    cache.put("Olá Maria, seu cartão foi bloqueado, clique no link agora para regularizar", SCAM_VERDICT)
+
+    result, similarity = cache.get("Olá José, seu cartão foi bloqueado, clique no link agora para regularizar")
+
+    assert result is not None
+    assert similarity == 1.0
+
+
+def test_scam_keyword_prevents_near_duplicate_reuse():
+    rules = ScamRules({"heuristic": {"groups": [{"name": "bloqueio", "terms": ["bloqueado"], "score": 3}]}})
+    # Distância larga o bastante para as duas variações: só a assinatura as diferencia
+    cache = MessageVerdictCache(max_distance=10, scam_rules=rules)
+    benign = dict(SCAM_VERDICT, risk_score=1, explanation="Mensagem comum de loja.")
+    cache.put("Seu pedido foi entregue com sucesso, obrigado por comprar na nossa loja online hoje", benign)
+
+    result, _ = cache.get("Seu cartão foi bloqueado com sucesso, obrigado por comprar na nossa loja online hoje")
+    assert result is None
+
+    result, similarity = cache.get("Seu pedido foi entregue com sucesso, obrigado por comprar na nossa loja online ontem")
+    assert result is not None and similarity < 1.0
+
+
+def test_different_link_host_prevents_near_duplicate_reuse():
+    cache = MessageVerdictCache(max_distance=10, scam_rules=ScamRules({}))
+    cache.put("Confira as novidades da semana em nossa loja online http://loja.com.br/ofertas hoje", SCAM_VERDICT)
+
+    result, _ = cache.get("Confira as novidades da semana em nossa loja online http://loja-falsa.xyz/ofertas agora")
+    assert result is None
@@ -0,0 +1,54 @@
+import random
+from pattern_matcher import AhoCorasick
+from scam_rules import ScamRules, HEURISTIC_PREFIX, SCAM_TYPE_PREFIX
+
+
+def naive_search(terms, text):
+    hits = {}
+    for term, label in terms:
+        start = text.find(term)
+        while start != -1:
+            hits.setdefault(label, []).append((term, start))
+            start = text.find(term, start + 1)
+    return hits
+
+
+def normalized(hits):
+    return {label: sorted(found) for label, found in hits.items()}
+
+
+def test_matches_naive_search_on_random_texts():
+    rng = random.Random(7)
+    terms = [("".join(rng.choice("abc") for _ in range(rng.randint(1, 4))), f"r{i}") for i in range(15)]
+    matcher = AhoCorasick()
+    for term, label in terms:
+        matcher.add(term, label)
+    matcher.build()
+    for _ in range(200):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        assert normalized(matcher.search(text)) == normalized(naive_search(terms, text))
+
+
+def test_overlapping_and_suffix_terms_are_all_reported():
+    matcher = AhoCorasick()
+    for term in ("he", "she", "his", "hers"):
+        matcher.add(term, term)
+    matcher.build()
+    assert normalized(matcher.search("ushers")) == {"she": [("she", 1)], "he": [("he", 2)], "hers": [("hers", 2)]}
+
+
+def test_scam_rules_scan_matches_naive_search():
+    rules = ScamRules({
+        "heuristic": {"groups": [
+            {"name": "urgencia", "terms": ["urgente", "Agora"], "score": 2},
+            {"name": "dinheiro", "terms": ["pix", "transferência"], "score": 3, "mode": "each"},
+        ], "combinations": [{"requires": ["urgencia", "dinheiro"], "score": 1}]},
+        "scam_types": {"base": "golpes", "rules": [{"name": "pix", "terms": ["pix"], "suffix": "via PIX"}]},
+    })
+    terms = [(term.lower(), HEURISTIC_PREFIX + group["name"]) for group in rules.groups for term in group["terms"]]
+    terms += [(term, SCAM_TYPE_PREFIX + rule["name"]) for rule in rules.scam_type_rules for term in rule["terms"]]
+    message = "URGENTE: faça o PIX agora, outro pix ou transferência"
+    hits = rules.scan(message)
+    assert normalized(hits) == normalized(naive_search(terms, message.lower()))
+    assert rules.heuristic_score(hits) == 2 + 3 * 2 + 1
+    assert rules.scam_type(hits) == "golpes via PIX"
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from recent_scams import RecentScamsFeed
+from web_search import WebSearcher, SearchUnavailable
+
+SNAPSHOT = [{"title": "Golpe do PIX", "link": "https://example.com/pix", "snippet": ""}]
+
+
+def test_search_without_fallback_raises_when_serpapi_is_unavailable():
+    searcher = WebSearcher()
+    searcher.api_key = ""
+    with pytest.raises(SearchUnavailable):
+        asyncio.run(searcher.search_async("golpes recentes", use_cache=False, fallback=False))
+    assert asyncio.run(searcher.search_async("golpes recentes", use_cache=False)) == \
+        searcher._fallback_search("golpes recentes")
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    feed = RecentScamsFeed()
+    feed._results = SNAPSHOT
+    feed._fetched_at = 1.0
+    feed.web_searcher.api_key = ""
+    asyncio.run(feed.refresh())
+    assert feed.get_results() is SNAPSHOT
+    assert feed.stats["refresh_errors"] == 1
+    assert feed.stats["refreshes"] == 0
+
+
+def test_failed_refresh_backs_off_before_retrying():
+    async def scenario():
+        feed = RecentScamsFeed(retry_interval=60)
+        feed.web_searcher.api_key = ""
+        feed.get_results()
+        await feed._refresh_task
+        assert feed.stats["refresh_errors"] == 1
+        # Dentro do intervalo de espera as requisições não disparam nova atualização
+        feed.get_results()
+        assert feed._refresh_task.done()
+        feed._retry_at = 0.0
+        feed.get_results()
+        await feed._refresh_task
+        assert feed.stats["refresh_errors"] == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+import asyncio
+from metrics import timing_scope, get_timings, external_call
+from singleflight import SingleFlight
+
+
+def test_coalesced_callers_record_their_own_wait():
+    flight = SingleFlight("servico_teste")
+
+    async def call():
+        with external_call("servico_teste"):
+            await asyncio.sleep(0.05)
+        return "ok"
+
+    async def analysis(delay):
+        with timing_scope():
+            await asyncio.sleep(delay)
+            result = await flight.do("chave", call)
+            return result, get_timings()["spans"]
+
+    async def main():
+        return await asyncio.gather(analysis(0), analysis(0.01))
+
+    (first, first_spans), (second, second_spans) = asyncio.run(main())
+    assert first == second == "ok"
+    assert flight.stats["coalesced"] == 1
+    assert first_spans["servico_teste"]["count"] == 1
+    assert second_spans["servico_teste"]["count"] == 1
+    assert second_spans["servico_teste"]["ms"] > 0
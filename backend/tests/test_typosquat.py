@@ -0,0 +1,60 @@
+import pytest
+from typosquat import TyposquatDetector
+
+PROTECTED = [
+    {"domain": "bb.com.br", "brand": "Banco do Brasil", "aliases": ["bancodobrasil"]},
+    {"domain": "caixa.gov.br", "brand": "Caixa", "aliases": ["caixa"]},
+    {"domain": "bcb.gov.br", "brand": "Banco Central (PIX)", "aliases": ["pix"]},
+    {"domain": "gov.br", "brand": "gov.br", "aliases": ["govbr"]},
+    {"domain": "correios.com.br", "brand": "Correios"},
+    {"domain": "bradesco.com.br", "brand": "Bradesco"},
+    {"domain": "apple.com", "brand": "Apple"},
+    {"domain": "itau.com.br", "brand": "Itaú", "aliases": ["itau"]},
+    {"domain": "google.com", "brand": "Google"},
+    {"domain": "google.com.br", "brand": "Google"},
+]
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return TyposquatDetector(PROTECTED)
+
+
+@pytest.mark.parametrize("host", [
+    "cdc.gov",
+    "www.gov.uk",
+    "bb.example.org",
+    "pix.example.com",
+    "apply.com",
+    "pineapple.com",
+    "baixa.com.br",
+    "correio.com",
+])
+def test_ignores_public_suffix_short_labels_and_common_words(detector, host):
+    assert detector.check(host) == []
+
+
+@pytest.mark.parametrize("host, brand, technique", [
+    ("bb.net", "Banco do Brasil", "embedded"),
+    ("pix.com", "Banco Central (PIX)", "embedded"),
+    ("caixa-app.com", "Caixa", "embedded"),
+    ("аpple.com", "Apple", "homoglyph"),
+    ("bradescco.com", "Bradesco", "typo"),
+    ("seguranca-bradesco.xyz", "Bradesco", "embedded"),
+    ("govbr-pagamentos.com", "gov.br", "embedded"),
+    ("appleid-verify.com", "Apple", "embedded"),
+    ("itauseguranca.com", "Itaú", "embedded"),
+])
+def test_detects_impersonation(detector, host, brand, technique):
+    finding = detector.check(host)[0]
+    assert (finding["brand"], finding["technique"]) == (brand, technique)
+
+
+def test_short_labels_at_token_start_skip_common_words(detector):
+    assert detector.check("apples.com") == []
+    assert detector.check("caixas.com.br") == []
+
+
+def test_one_finding_per_brand(detector):
+    findings = detector.check("gooogle.com")
+    assert [(finding["brand"], finding["technique"]) for finding in findings] == [("Google", "typo")]
@@ -0,0 +1,16 @@
+import logging
+from utils import parse_sample_rates, DroppingQueueHandler
+
+
+def test_sample_rates_ignore_malformed_items():
+    assert parse_sample_rates("INFO=0.1,DEBUG=0") == {logging.INFO: 0.1, logging.DEBUG: 0.0}
+    assert parse_sample_rates("INFO=abc,NIVEL=0.5,WARNING=2,DEBUG") == {logging.WARNING: 1.0}
+    assert parse_sample_rates("") == {}
+
+
+def test_queue_handler_does_not_mutate_the_callers_record():
+    record = logging.LogRecord("detector", logging.INFO, __file__, 1, "valor %s", ("x",), None)
+    prepared = DroppingQueueHandler(None).prepare(record)
+    assert prepared is not record
+    assert prepared.msg == "valor x" and prepared.args is None
+    assert (record.msg, record.args) == ("valor %s", ("x",))
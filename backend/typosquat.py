@@ -0,0 +1,263 @@
+import os
+import json
+import unicodedata
+from pattern_matcher import AhoCorasick
+from domain_index import normalize_domain
+from url_features import get_public_suffix_list
+
+PROTECTED_DOMAINS_PATH = os.getenv("PROTECTED_DOMAINS_PATH", "data/protected_domains.json")
+
+# Caracteres confundíveis (homóglifos) normalizados para um mesmo "esqueleto".
+# A mesma dobra é aplicada aos domínios protegidos e aos consultados.
+CONFUSABLES = {
+    # Dígitos e símbolos usados no lugar de letras
+    "0": "o", "1": "l", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b",
+    "$": "s", "@": "a", "|": "l", "!": "l",
+    # i e l são visualmente próximos em muitas fontes
+    "i": "l",
+    # Cirílico
+    "а": "a", "в": "b", "е": "e", "к": "k", "м": "m", "н": "h", "о": "o",
+    "р": "p", "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "l",
+    "ј": "j", "ԁ": "d", "ԛ": "q", "ԝ": "w", "ӏ": "l",
+    # Grego
+    "α": "a", "β": "b", "ε": "e", "ι": "l", "κ": "k", "ν": "v", "ο": "o",
+    "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    # Latim estendido sem decomposição NFKD
+    "ı": "l", "ł": "l", "ø": "o", "đ": "d", "ɡ": "g",
+}
+# Sequências que imitam uma única letra
+CONFUSABLE_SEQUENCES = (("rn", "m"), ("vv", "w"))
+
+# Ordem de gravidade das técnicas de imitação
+SEVERITY = {"homoglyph": 0, "typo": 1, "embedded": 2}
+
+MIN_EMBEDDED_LENGTH = 6  # rótulos menores só casam como token inteiro ou no início de um token
+MIN_FUZZY_LENGTH = 4
+MIN_FUZZY_LABEL_LENGTH = 6  # rótulos protegidos menores (apple, caixa, itau) não casam por distância
+MAX_SHORT_LABEL_LENGTH = 3  # rótulos deste tamanho (bb, pix) só casam como rótulo registrável
+
+# Palavras comuns próximas de um rótulo protegido (a uma edição ou começando por ele);
+# não são tratadas como imitação
+COMMON_WORDS = frozenset({
+    "correio", "correia", "goggle", "goggles", "caixas", "caixinha", "apples", "applet", "applets",
+})
+
+
+def max_distance(length):
+    """Distância de edição tolerada de acordo com o tamanho do rótulo."""
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    if length < 8:
+        return 1
+    return 2
+
+
+def skeleton(text):
+    """Dobra o texto para sua forma visual: sem acentos e com homóglifos unificados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(
+        CONFUSABLES.get(char, char) for char in text if not unicodedata.combining(char)
+    )
+    for sequence, replacement in CONFUSABLE_SEQUENCES:
+        text = text.replace(sequence, replacement)
+    return text
+
+
+def to_unicode(host):
+    """Converte rótulos punycode (`xn--`) para Unicode antes da dobra."""
+    labels = []
+    for label in host.split("."):
+        if label.startswith("xn--"):
+            try:
+                label = label.encode("ascii").decode("idna")
+            except UnicodeError:
+                pass
+        labels.append(label)
+    return ".".join(labels)
+
+
+def edit_distance(a, b, limit):
+    """Distância de Damerau-Levenshtein (transposições adjacentes), limitada a `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(word, distance):
+    """Todas as variantes do termo com até `distance` caracteres removidos."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {
+            variant[:index] + variant[index + 1:]
+            for variant in frontier
+            for index in range(len(variant))
+        }
+        variants |= frontier
+    return variants
+
+
+class TyposquatDetector:
+    """Detecta domínios que imitam domínios protegidos (bancos, gov.br, PIX).
+
+    Usa um índice de remoção simétrica (symmetric delete): as variantes com
+    até N caracteres removidos de cada rótulo protegido são pré-calculadas, e
+    a consulta gera as remoções do rótulo suspeito e procura candidatos por
+    acesso direto ao dicionário, confirmando com a distância de edição. O
+    custo da consulta depende do tamanho do rótulo, não do número de
+    domínios protegidos. Rótulos protegidos contidos no domínio (como em
+    `bradesco-seguranca.xyz`) são encontrados por um autômato de Aho-Corasick.
+    O sufixo público do host é ignorado, rótulos curtos (`bb`, `pix`) só
+    casam quando são o próprio rótulo registrável e rótulos de até cinco
+    letras não casam por distância de edição, pois colidem com palavras
+    comuns (`apply`, `baixa`); eles casam, porém, no início de um token
+    (`appleid`, `itauseguranca`), exceto em `COMMON_WORDS`. Há no máximo
+    um achado por marca.
+    """
+
+    def __init__(self, protected):
+        self.protected = []
+        self._labels = []  # índice do domínio protegido -> [(rótulo, esqueleto)]
+        self._official = set()
+        self._delete_index = {}  # variante -> {índice do domínio protegido}
+        self._skeletons = {}  # esqueleto do rótulo -> {índice do domínio protegido}
+        self._embedded = AhoCorasick()
+
+        for entry in protected:
+            domain = normalize_domain(entry["domain"])
+            labels = entry.get("labels") or [domain.split(".")[0]] + entry.get("aliases", [])
+            position = len(self.protected)
+            self._official.add(domain)
+            self.protected.append({
+                "domain": domain,
+                "brand": entry.get("brand", domain),
+            })
+            self._labels.append([(label.lower(), skeleton(label)) for label in labels])
+            for label in labels:
+                folded = skeleton(label)
+                self._skeletons.setdefault(folded, set()).add(position)
+                if len(folded) >= MIN_FUZZY_LABEL_LENGTH:
+                    for variant in deletes(folded, max_distance(len(folded))):
+                        self._delete_index.setdefault(variant, set()).add(position)
+                if len(folded) >= MIN_EMBEDDED_LENGTH:
+                    self._embedded.add(folded, (position, folded))
+        self._embedded.build()
+        self._max_label_length = max(
+            (len(folded) for labels in self._labels for _, folded in labels), default=0
+        )
+        # Tamanhos dos rótulos que casam também no início de um token (`appleid`, `itauseguranca`)
+        self._prefix_lengths = sorted({
+            len(folded) for labels in self._labels for _, folded in labels
+            if MAX_SHORT_LABEL_LENGTH < len(folded) < MIN_EMBEDDED_LENGTH
+        })
+
+    @classmethod
+    def load(cls, path=PROTECTED_DOMAINS_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("domains", []))
+
+    def is_official(self, host):
+        """Verdadeiro se o host é um domínio protegido ou subdomínio de um."""
+        labels = host.split(".")
+        return any(".".join(labels[start:]) in self._official for start in range(len(labels)))
+
+    def check(self, host):
+        """Lista as imitações detectadas, da mais grave para a menos grave.
+
+        Cada item informa o domínio protegido, a marca, a técnica
+        (`homoglyph`, `typo` ou `embedded`), o trecho do host e a distância.
+        """
+        host = normalize_domain(host)
+        if not host or self.is_official(host):
+            return []
+
+        # O sufixo público (com.br, gov.uk) não faz parte do nome escolhido pelo dono do domínio
+        suffix = get_public_suffix_list().public_suffix(host)
+        if host == suffix:
+            return []
+        labels = to_unicode(host[:-len(suffix) - 1]).split(".")
+        registrable_label = labels[-1]
+        findings = {}
+
+        # Tokens do host: rótulos e partes separadas por hífen
+        tokens = set()
+        for label in labels:
+            tokens.add(label)
+            tokens.update(part for part in label.split("-") if part)
+
+        for token in tokens:
+            folded = skeleton(token)
+            if len(folded) > MAX_SHORT_LABEL_LENGTH or token == registrable_label:
+                for position in self._skeletons.get(folded, ()):
+                    # Mesmo esqueleto: a marca escrita literalmente ou com homóglifos
+                    verbatim = any(token == label for label, _ in self._labels[position])
+                    self._add(findings, position, "embedded" if verbatim else "homoglyph", token, 0)
+
+            if token not in COMMON_WORDS and "-" not in token:
+                # Rótulo curto no início do token: `apple` em `appleid`, `itau` em `itauseguranca`
+                # (rótulos com hífen são examinados pelas suas partes)
+                for length in self._prefix_lengths:
+                    if length >= len(folded):
+                        break
+                    for position in self._skeletons.get(folded[:length], ()):
+                        verbatim = any(token.startswith(label) for label, _ in self._labels[position])
+                        self._add(findings, position, "embedded" if verbatim else "homoglyph", token, 0)
+
+            distance_limit = max_distance(len(folded))
+            if (not distance_limit or token in COMMON_WORDS
+                    or len(folded) > self._max_label_length + distance_limit):
+                continue
+            candidates = set()
+            for variant in deletes(folded, distance_limit):
+                candidates.update(self._delete_index.get(variant, ()))
+            for position in candidates:
+                for _, protected_label in self._labels[position]:
+                    distance = edit_distance(folded, protected_label, distance_limit)
+                    if 0 < distance <= distance_limit:
+                        self._add(findings, position, "typo", token, distance)
+
+        # Rótulos protegidos contidos em qualquer parte do nome, fora do sufixo público
+        for _, _, (position, label) in self._embedded.finditer(skeleton(".".join(labels))):
+            self._add(findings, position, "embedded", label, 0)
+
+        return sorted(
+            findings.values(),
+            key=lambda item: (SEVERITY[item["technique"]], item["distance"]),
+        )
+
+    def _add(self, findings, position, technique, token, distance):
+        # Um achado por marca: google.com e google.com.br são a mesma imitação
+        entry = self.protected[position]
+        current = findings.get(entry["brand"])
+        if current is not None and (SEVERITY[current["technique"]], current["distance"]) <= (SEVERITY[technique], distance):
+            return
+        findings[entry["brand"]] = {
+            "protected_domain": entry["domain"],
+            "brand": entry["brand"],
+            "technique": technique,
+            "token": token,
+            "distance": distance,
+        }
+
+
+_typosquat_detector = None
+
+def get_typosquat_detector():
+    """Detector carregado uma única vez por processo."""
+    global _typosquat_detector
+    if _typosquat_detector is None:
+        _typosquat_detector = TyposquatDetector.load()
+    return _typosquat_detector
@@ -0,0 +1,147 @@
+import os
+import re
+import ipaddress
+from urllib.parse import urlsplit
+from domain_index import normalize_domain
+
+PUBLIC_SUFFIX_LIST_PATH = os.getenv("PUBLIC_SUFFIX_LIST_PATH", "data/public_suffix_list.dat")
+
+# Termos de instituições financeiras procurados no URL completo
+FINANCIAL_TERMS = ["banco", "bank", "caixa", "santander", "bradesco", "itau", "nubank", "inter"]
+FINANCIAL_TERMS_PATTERN = re.compile("|".join(re.escape(term) for term in FINANCIAL_TERMS))
+SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+
+
+def _to_ascii(domain):
+    try:
+        return domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return domain
+
+
+class PublicSuffixList:
+    """Lista de sufixos públicos no formato de publicsuffix.org.
+
+    Suporta regras simples, curingas (`*.ck`) e exceções (`!www.ck`), e
+    permite identificar o domínio registrável de um host, de modo que
+    `www.bb.com.br` tem `bb.com.br` como domínio registrável e apenas um
+    nível de subdomínio.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = set()
+        self.wildcards = set()
+        self.exceptions = set()
+        for rule in rules:
+            self.add_rule(rule)
+
+    @classmethod
+    def load(cls, path=PUBLIC_SUFFIX_LIST_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f)
+
+    def add_rule(self, line):
+        line = line.strip()
+        if not line or line.startswith("//"):
+            return
+        rule = line.split()[0].lower()
+        if rule.startswith("!"):
+            self.exceptions.add(_to_ascii(rule[1:]))
+        elif rule.startswith("*."):
+            self.wildcards.add(_to_ascii(rule[2:]))
+        else:
+            self.rules.add(_to_ascii(rule))
+
+    def public_suffix(self, host):
+        """Sufixo público mais longo aplicável ao host."""
+        labels = host.split(".")
+        for start in range(len(labels)):
+            candidate = ".".join(labels[start:])
+            if candidate in self.exceptions:
+                return ".".join(labels[start + 1:])
+            if start > 0 and candidate in self.wildcards:
+                return ".".join(labels[start - 1:])
+            if candidate in self.rules:
+                return candidate
+        # Regra implícita "*": o último rótulo é um sufixo público
+        return labels[-1]
+
+    def registrable_domain(self, host):
+        """Sufixo público mais um rótulo (ou "" se o host for o próprio sufixo)."""
+        suffix = self.public_suffix(host)
+        if host == suffix:
+            return ""
+        prefix = host[:-len(suffix) - 1]
+        return f"{prefix.rsplit('.', 1)[-1]}.{suffix}"
+
+
+_public_suffix_list = None
+
+def get_public_suffix_list():
+    """Lista carregada uma única vez por processo."""
+    global _public_suffix_list
+    if _public_suffix_list is None:
+        try:
+            _public_suffix_list = PublicSuffixList.load()
+        except OSError:
+            _public_suffix_list = PublicSuffixList()
+    return _public_suffix_list
+
+
+def extract_url_features(url, psl=None):
+    """Extrai, em uma passada, as características do URL usadas na análise."""
+    psl = psl or get_public_suffix_list()
+    url = url.strip()
+    url_lower = url.lower()
+    parsed = urlsplit(url if SCHEME_PATTERN.match(url) else f"http://{url}")
+    host = normalize_domain(parsed.netloc)
+
+    is_ip = False
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        is_ip = True
+    except ValueError:
+        pass
+
+    if is_ip or not host:
+        public_suffix = ""
+        registrable = host
+        subdomain = ""
+    else:
+        public_suffix = psl.public_suffix(host)
+        registrable = psl.registrable_domain(host) or host
+        subdomain = host[:-len(registrable)].rstrip(".")
+
+    digit_count = sum(char.isdigit() for char in url)
+    found_terms = set(FINANCIAL_TERMS_PATTERN.findall(url_lower))
+    financial_terms = [term for term in FINANCIAL_TERMS if term in found_terms]
+
+    return {
+        "url": url,
+        "host": host,
+        "is_ip": is_ip,
+        "public_suffix": public_suffix,
+        "registrable_domain": registrable,
+        "subdomain": subdomain,
+        "subdomain_depth": len(subdomain.split(".")) if subdomain else 0,
+        "length": len(url),
+        "digit_count": digit_count,
+        "digit_ratio": round(digit_count / len(url), 4) if url else 0.0,
+        "hyphen_count": host.count("-"),
+        "has_at_sign": "@" in parsed.netloc,
+        "is_punycode": "xn--" in host,
+        "path_depth": len([part for part in parsed.path.split("/") if part]),
+        "financial_terms": financial_terms,
+        # Termos presentes no URL mas fora do host (ex.: no caminho ou na query)
+        "financial_terms_outside_host": [term for term in financial_terms if term not in host],
+    }
+
+
+def extract_url_features_batch(urls):
+    """Extrai as características de vários URLs, calculando cada URL distinto uma vez."""
+    psl = get_public_suffix_list()
+    computed = {}
+    for url in urls:
+        if url not in computed:
+            computed[url] = extract_url_features(url, psl)
+    return [computed[url] for url in urls]
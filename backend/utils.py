@@ -1,18 +1,179 @@
 import os
-import logging
+import copy
 import json
-from datetime import datetime
-
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("detector.log"),
-        logging.StreamHandler()
-    ]
-)
+import zlib
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "detector.log")
+# Tamanho a partir do qual o arquivo de log é rotacionado e quantos arquivos antigos manter
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Registros aguardando gravação; com a fila cheia, novos registros são descartados
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fração dos logs de etapa gravada por nível, ex.: "INFO=0.1,DEBUG=0" (níveis omitidos: todos)
+LOG_STAGE_SAMPLE_RATES = os.getenv("LOG_STAGE_SAMPLE_RATES", "")
+
+# Análise em andamento, incluída em todos os registros feitos durante ela
+_analysis_id = contextvars.ContextVar("analysis_id", default=None)
+
+
+def parse_sample_rates(value):
+    """Converte "INFO=0.1,DEBUG=0" em {logging.INFO: 0.1, logging.DEBUG: 0.0}.
+
+    Itens mal formatados são ignorados com um aviso: o nível correspondente
+    continua com todos os registros gravados.
+    """
+    rates = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, rate = item.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        try:
+            if not isinstance(level, int):
+                raise ValueError(f"nível desconhecido '{name.strip()}'")
+            rates[level] = min(1.0, max(0.0, float(rate)))
+        except ValueError as e:
+            logging.getLogger("detector").warning(
+                "Item ignorado em LOG_STAGE_SAMPLE_RATES (%s): %s", item.strip(), e
+            )
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """Anexa o `analysis_id` atual ao registro, na thread de quem fez o log."""
+
+    def filter(self, record):
+        record.analysis_id = _analysis_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Grava apenas uma fração dos registros de cada nível.
+
+    A decisão usa o `analysis_id` quando houver, de modo que os registros
+    de uma mesma análise são todos gravados ou todos descartados.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        analysis_id = _analysis_id.get()
+        point = (zlib.crc32(analysis_id.encode()) % 10000) / 10000 if analysis_id else random.random()
+        if point < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila está cheia."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # A formatação fica para a thread de gravação; aqui só se resolvem os
+        # argumentos e a exceção, que podem não ser serializáveis depois.
+        # Cópia: o registro original ainda pode ser usado por outros handlers
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com o `analysis_id` quando houver."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        analysis_id = getattr(record, "analysis_id", None)
+        if analysis_id:
+            entry["analysis_id"] = analysis_id
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível do console, com o `analysis_id` entre colchetes."""
+
+    def format(self, record):
+        message = super().format(record)
+        analysis_id = getattr(record, "analysis_id", None)
+        return f"[{analysis_id}] {message}" if analysis_id else message
+
+
+def setup_logging():
+    """Envia os logs para uma fila; uma thread grava no arquivo (JSON, rotacionado) e no console.
+
+    Quem faz o log (inclusive corrotinas no event loop) apenas enfileira o
+    registro, sem esperar pelo disco ou pelo terminal.
+    """
+    file_handler = RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(TextFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    level = logging.getLevelName(LOG_LEVEL)
+    root.setLevel(level if isinstance(level, int) else logging.INFO)
+    root.addHandler(queue_handler)
+    listener.start()
+    if not isinstance(level, int):
+        logging.getLogger("detector").warning("LOG_LEVEL inválido (%s); usando INFO", LOG_LEVEL)
+    # Grava o que ainda estiver na fila ao encerrar o processo
+    atexit.register(listener.stop)
+    return queue_handler, listener
+
+
+_queue_handler, _listener = setup_logging()
 logger = logging.getLogger("detector")
+# Logs de cada etapa da análise (alto volume), sujeitos à amostragem
+stage_logger = logging.getLogger("detector.stage")
+_stage_sampling = SamplingFilter(parse_sample_rates(LOG_STAGE_SAMPLE_RATES))
+stage_logger.addFilter(_stage_sampling)
+
+
+def bind_analysis_id(analysis_id):
+    """Associa os próximos logs da tarefa atual (e das que ela criar) à análise."""
+    _analysis_id.set(analysis_id)
+
 
 def safe_print(message, *args):
     """Função para logging seguro com suporte a formatação."""
@@ -24,22 +185,22 @@ def safe_print(message, *args):
     except Exception as e:
         logger.error(f"Erro ao fazer log: {e}")
 
-def save_analysis_result(result, directory="analysis_results"):
-    """Salva o resultado da análise para referência futura."""
-    try:
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{directory}/{result['analysis_id']}_{timestamp}.json"
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-            
-        return filename
-    except Exception as e:
-        safe_print(f"Erro ao salvar resultado: {e}")
-        return None
+
+def log_stage(message, *args):
+    """Log de uma etapa da análise, gravado conforme `LOG_STAGE_SAMPLE_RATES`."""
+    stage_logger.info(message, *args)
+
+
+def get_logging_stats():
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "queue_size": LOG_QUEUE_SIZE,
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _stage_sampling.sampled_out,
+        "stage_sample_rates": {
+            logging.getLevelName(level): rate for level, rate in _stage_sampling.rates.items()
+        },
+    }
 
 def normalize_url(url):
     """Normaliza URLs para comparação."""
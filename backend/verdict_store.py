@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from utils import safe_print
+from cache import TTLCache
+
+VERDICT_DB_PATH = os.getenv("VERDICT_DB_PATH", "data/vt_verdicts.db")
+
+# Validade de cada classe de veredito, em segundos
+VERDICT_TTLS = {
+    "clean": int(os.getenv("VERDICT_TTL_CLEAN", str(24 * 3600))),
+    "suspicious": int(os.getenv("VERDICT_TTL_SUSPICIOUS", str(3 * 24 * 3600))),
+    "malicious": int(os.getenv("VERDICT_TTL_MALICIOUS", str(30 * 24 * 3600))),
+}
+VERDICT_MEMORY_MAX_ENTRIES = int(os.getenv("VERDICT_MEMORY_MAX_ENTRIES", "50000"))
+
+
+def classify_verdict(result):
+    """Classifica o resultado do VirusTotal em clean, suspicious ou malicious."""
+    if result.get("malicious", 0) > 0:
+        return "malicious"
+    if result.get("suspicious", 0) > 0:
+        return "suspicious"
+    return "clean"
+
+
+class VerdictStore:
+    """Armazena em disco (SQLite) os vereditos do VirusTotal por URL normalizada.
+
+    O banco usa WAL para que vários workers leiam ao mesmo tempo enquanto um
+    deles escreve. Na inicialização os vereditos válidos são carregados para
+    um cache em memória; consultas que não estão em memória caem no disco,
+    onde podem ter sido gravadas por outro worker.
+    """
+
+    def __init__(self, path=VERDICT_DB_PATH, ttls=None):
+        self.path = path
+        self.ttls = dict(VERDICT_TTLS, **(ttls or {}))
+        self.memory = TTLCache(
+            "virustotal",
+            ttl=max(self.ttls.values()),
+            max_entries=VERDICT_MEMORY_MAX_ENTRIES,
+        )
+        self._local = threading.local()
+        self.stats = {
+            "disk_hits": 0,
+            "disk_misses": 0,
+            "writes": 0,
+            "preloaded": 0,
+        }
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    url_key TEXT PRIMARY KEY,
+                    verdict TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    checked_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_expires ON verdicts (expires_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def preload(self):
+        """Remove vereditos vencidos e carrega os válidos para a memória."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (now,))
+        conn.commit()
+        rows = conn.execute(
+            "SELECT url_key, result, expires_at FROM verdicts ORDER BY checked_at"
+        ).fetchall()
+        for url_key, result, expires_at in rows:
+            self.memory.set(url_key, json.loads(result), ttl=expires_at - now)
+        self.stats["preloaded"] = len(rows)
+        safe_print("Vereditos do VirusTotal carregados do disco: %s", len(rows))
+        return len(rows)
+
+    def _read(self, url_key):
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT result, expires_at FROM verdicts WHERE url_key = ? AND expires_at > ?",
+            (url_key, now),
+        ).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1] - now
+
+    def _write(self, url_key, verdict, result, checked_at, expires_at):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO verdicts (url_key, verdict, result, checked_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (url_key, verdict, json.dumps(result), checked_at, expires_at),
+        )
+        conn.commit()
+
+    async def get(self, url_key):
+        """Retorna o veredito válido para a URL, consultando memória e disco."""
+        result = self.memory.get(url_key)
+        if result is not None:
+            return result
+
+        try:
+            result, remaining = await asyncio.to_thread(self._read, url_key)
+        except sqlite3.Error as e:
+            safe_print(f"Erro ao ler veredito do disco: {e}")
+            return None
+
+        if result is None:
+            self.stats["disk_misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self.memory.set(url_key, result, ttl=remaining)
+        return result
+
+    async def put(self, url_key, result):
+        """Grava o veredito com a validade correspondente à sua classe."""
+        verdict = classify_verdict(result)
+        ttl = self.ttls[verdict]
+        now = time.time()
+        self.memory.set(url_key, result, ttl=ttl)
+        try:
+            await asyncio.to_thread(self._write, url_key, verdict, result, now, now + ttl)
+            self.stats["writes"] += 1
+        except sqlite3.Error as e:
+            safe_print(f"Erro ao gravar veredito em disco: {e}")
+
+    def get_stats(self):
+        return dict(self.stats, memory=self.memory.get_stats())
+
+
+# Instância única do processo
+verdict_store = VerdictStore()
@@ -1,31 +1,83 @@
 import os
+import re
 import json
-import aiohttp
 import asyncio
+import unicodedata
 from utils import safe_print
+from http_client import http_client, request_timeout, is_deadline_timeout, is_upstream_failure
+from metrics import external_call
+from singleflight import SingleFlight
+from cache import TTLCache
+from circuit_breaker import get_breaker
+from deadline import DeadlineExceeded
+
+# Compartilhado entre todas as instâncias: buscas idênticas concorrentes
+# resultam em uma única chamada à SerpAPI
+search_flight = SingleFlight("serpapi")
+serpapi_breaker = get_breaker("serpapi")
+
+# Cache único do processo para os resultados de busca
+search_cache = TTLCache(
+    "serpapi",
+    ttl=int(os.getenv("SEARCH_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+)
+
+class SearchUnavailable(Exception):
+    """A SerpAPI não trouxe resultados (sem chave, circuito aberto, erro ou prazo esgotado)."""
+
+
+def canonicalize_query(query):
+    """Normaliza a consulta para que variações triviais usem a mesma chave."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return re.sub(r"\s+", " ", query).strip()
 
 class WebSearcher:
     def __init__(self):
         # API key para SerpAPI
         self.api_key = os.getenv("SERPAPI_API_KEY", "")
-        # Cache de resultados para evitar duplicação de buscas
-        self.search_cache = {}
+        # Cache de resultados compartilhado por todas as instâncias
+        self.search_cache = search_cache
         # Base URL para a SerpAPI
         self.base_url = "https://serpapi.com/search"
     
-    async def search_async(self, query, num_results=5):
-        """Realiza busca na web de forma assíncrona."""
+    async def search_async(self, query, num_results=5, use_cache=True, fallback=True):
+        """Realiza busca na web de forma assíncrona.
+
+        Com `use_cache=False` a consulta ignora o cache na leitura (o resultado
+        novo ainda é armazenado), o que permite atualizar entradas periódicas.
+        Se a SerpAPI não responder, retorna os resultados de fallback; com
+        `fallback=False` levanta SearchUnavailable, para que quem guarda os
+        resultados não troque um snapshot bom pelo fallback.
+        """
         # Verificar cache
-        cache_key = f"{query}_{num_results}"
-        if cache_key in self.search_cache:
+        cache_key = f"{canonicalize_query(query)}_{num_results}"
+        cached = self.search_cache.get(cache_key) if use_cache else None
+        if cached is not None:
             safe_print(f"Usando resultados em cache para: {query}")
-            return self.search_cache[cache_key]
+            return cached
         
-        # Se não tiver API key, retorna erro
-        if not self.api_key:
-            safe_print("API key da SerpAPI não configurada. Usando modo fallback.")
+        try:
+            # Se não tiver API key, retorna erro
+            if not self.api_key:
+                safe_print("API key da SerpAPI não configurada. Usando modo fallback.")
+                raise SearchUnavailable("API key da SerpAPI não configurada")
+            
+            # SerpAPI instável: responder de imediato com o fallback local
+            if not serpapi_breaker.allow():
+                raise SearchUnavailable("SerpAPI temporariamente indisponível")
+            
+            return await search_flight.do(
+                cache_key, lambda: self._fetch_results(query, num_results, cache_key)
+            )
+        except SearchUnavailable:
+            if not fallback:
+                raise
             return self._fallback_search(query)
-        
+    
+    async def _fetch_results(self, query, num_results, cache_key):
+        """Consulta a SerpAPI e armazena o resultado no cache; SearchUnavailable em caso de falha."""
         try:
             params = {
                 "api_key": self.api_key,
@@ -34,31 +86,43 @@ class WebSearcher:
                 "engine": "google"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Extrair resultados relevantes
-                        results = []
-                        
-                        if "organic_results" in data:
-                            for result in data["organic_results"][:num_results]:
-                                results.append({
-                                    "title": result.get("title", ""),
-                                    "link": result.get("link", ""),
-                                    "snippet": result.get("snippet", "")
-                                })
-                        
-                        # Armazenar no cache
-                        self.search_cache[cache_key] = results
-                        return results
-                    else:
+            session = await http_client.get_session()
+            with external_call("serpapi") as call:
+                async with session.get(self.base_url, params=params, timeout=request_timeout()) as response:
+                    if response.status != 200:
+                        call.outcome = "error"
                         safe_print(f"Erro na busca: {response.status}")
-                        return self._fallback_search(query)
+                        if is_upstream_failure(response.status):
+                            serpapi_breaker.record_failure(f"HTTP {response.status}")
+                        raise SearchUnavailable(f"HTTP {response.status}")
+                    data = await response.json()
+            serpapi_breaker.record_success()
+            # Extrair resultados relevantes
+            results = []
+            
+            if "organic_results" in data:
+                for result in data["organic_results"][:num_results]:
+                    results.append({
+                        "title": result.get("title", ""),
+                        "link": result.get("link", ""),
+                        "snippet": result.get("snippet", "")
+                    })
+            
+            # Armazenar no cache
+            self.search_cache.set(cache_key, results)
+            return results
         
+        except SearchUnavailable:
+            raise
+        except DeadlineExceeded as e:
+            # Sem tempo restante na análise: não é uma falha da SerpAPI
+            raise SearchUnavailable(str(e)) from e
         except Exception as e:
             safe_print(f"Erro ao buscar na web: {e}")
-            return self._fallback_search(query)
+            # Timeout encurtado pelo prazo da análise não é falha da SerpAPI
+            if not is_deadline_timeout(e):
+                serpapi_breaker.record_failure(e)
+            raise SearchUnavailable(str(e) or e.__class__.__name__) from e
     
     def _fallback_search(self, query):
         """Método de fallback para quando a API falha."""